@@ -0,0 +1,116 @@
+import threading
+import weakref
+
+from django.db import router, transaction
+
+from .identity_map import evict_objects
+from .timeline_version import bump_timeline_version, has_related_timeline_version
+
+_state = threading.local()
+
+
+class ApplyDeferredAppointmentStatus:
+
+    """An on_commit callback that applies the appointment
+    statuses deferred during a transaction.
+    """
+
+    def __init__(self, using=None):
+        self.using = using
+
+    def __call__(self):
+        apply_deferred_appointment_status(using=self.using)
+
+
+def get_state(using):
+    """Returns the thread's deferred state for a database, a dict
+    with the pending {visit_model_cls: set of appointment pks} and
+    a weak reference to the registered callback.
+    """
+    try:
+        states = _state.states
+    except AttributeError:
+        states = _state.states = {}
+    return states.setdefault(using, dict(pending={}, callback=None))
+
+
+def defer_appointment_status(visit, using=None):
+    """Sets the appointment status implied by the visit on its
+    appointment instance and defers the DB update until the
+    transaction commits.
+
+    Pending appointments are kept per transaction, keyed by
+    appointment, and flushed by a single on_commit callback, see
+    `apply_deferred_appointment_status`. If not in a
+    transaction, the update is applied immediately.
+    """
+    appointment = visit.appointment
+    using = using or router.db_for_write(appointment.__class__, instance=appointment)
+    appointment.appt_status = visit.get_appt_status()
+    state = get_state(using)
+    # Django drops the callback if the transaction or savepoint
+    # that registered it rolls back. Only a weak reference is
+    # kept, so a dropped callback is registered again.
+    registered = bool(state["callback"] and state["callback"]())
+    if not registered:
+        state["pending"].clear()
+    state["pending"].setdefault(visit.__class__, set()).add(appointment.pk)
+    if not registered:
+        callback = ApplyDeferredAppointmentStatus(using)
+        state["callback"] = weakref.ref(callback)
+        transaction.on_commit(callback, using=using)
+
+
+def apply_deferred_appointment_status(using=None):
+    """Updates the pending appointments with one query for their
+    visits and one UPDATE per model and status.
+
+    The status is read from the committed visit, so changes made
+    in a rolled back savepoint are not applied.
+
+    Note: `Appointment.save` is not called, so the appointment's
+    post_save receivers, e.g. its history, do not run.
+    """
+    state = get_state(using)
+    pending = dict(state["pending"])
+    state["pending"].clear()
+    state["callback"] = None
+    for visit_model_cls, appointment_pks in pending.items():
+        appointment_model_cls = visit_model_cls._meta.get_field(
+            "appointment"
+        ).related_model
+        visit = visit_model_cls()
+        batches = {}
+        for appointment_pk, reason in (
+            visit_model_cls._default_manager.using(using)
+            .filter(appointment_id__in=appointment_pks)
+            .order_by()
+            .values_list("appointment_id", "reason")
+        ):
+            batches.setdefault(visit.get_appt_status(reason=reason), []).append(
+                appointment_pk
+            )
+        for appt_status, pks in batches.items():
+            update_appointment_status(
+                appointment_model_cls, pks, appt_status, using=using
+            )
+
+
+def update_appointment_status(model_cls, pks, appt_status, using=None):
+    """Updates the status of the appointments, if changed, with
+    one UPDATE.
+
+    Note: `Appointment.save` is not called.
+    """
+    queryset = (
+        model_cls.objects.using(using)
+        .filter(pk__in=pks)
+        .exclude(appt_status=appt_status)
+    )
+    subject_identifiers = []
+    if has_related_timeline_version(model_cls):
+        subject_identifiers = set(queryset.values_list("subject_identifier", flat=True))
+    if queryset.update(appt_status=appt_status):
+        evict_objects(model_cls)
+        for subject_identifier in subject_identifiers:
+            bump_timeline_version(subject_identifier)
@@ -22,11 +22,64 @@ class AppConfig(DjangoAppConfig):
     allow_crf_report_datetime_before_visit = False
     reason_field = {}
 
+    # count report_datetime_allowance in working days of the
+    # facility instead of calendar days, see working_days.py
+    report_datetime_allowance_working_days = False
+
+    # years before study open and after study close covered by
+    # the working day calendar
+    working_days_margin = 2
+
+    # opt-in: maintain visit and CRF digests for node
+    # reconciliation, see digests.py
+    timeline_digests = False
+
+    # opt-in: append visit and CRF writes to the change log,
+    # see models.ChangeLog
+    change_log = False
+
+    # collect appointment status changes per transaction and
+    # apply them on commit with UPDATE instead of saving the
+    # appointment, see appointment_status.py
+    defer_appointment_status = False
+
+    # opt-in: bump a per-subject version on visit, CRF,
+    # appointment and metadata writes, see timeline_version.py
+    timeline_versions = False
+
+    # opt-in: maintain per-day counts of visits and CRFs for the
+    # admin date hierarchy, see date_buckets.py
+    date_buckets = False
+
+    # opt-in: maintain monthly counts of visits by reason and
+    # survival status, see visit_rollups.py
+    visit_rollups = False
+
+    # opt-in: maintain the latest survival status and last known
+    # alive date per subject, see vital_status.py
+    vital_status = False
+
+    # opt-in: maintain per-visit counts of submitted CRFs and
+    # requisitions, see crf_counts.py
+    visit_crf_counts = False
+
     def ready(self):
 
         from .signals import visit_tracking_check_in_progress_on_post_save
+        from .signals import get_derived_keys_on_pre_save
+        from .signals import update_derived_tables_on_post_save
+        from .signals import delete_derived_tables_on_post_delete
+        from .signals import evict_identity_map_on_post_save
+        from .signals import evict_identity_map_on_post_delete
+        from .signals import bump_timeline_version_on_post_save
+        from .signals import bump_timeline_version_on_post_delete
+        from .signals import clear_working_day_calendars_on_post_save
+        from .signals import clear_working_day_calendars_on_post_delete
+        from .crf_registry import site_crfs
 
         sys.stdout.write(f"Loading {self.verbose_name} ...\n")
+        site_crfs.populate()
+        sys.stdout.write(f" * registered {len(site_crfs.registry)} CRF models.\n")
         sys.stdout.write(f" Done loading {self.verbose_name}.\n")
 
 
@@ -39,6 +92,14 @@ if settings.APP_NAME == "edc_visit_tracking":
     class EdcMetadataAppConfig(BaseEdcMetadataAppConfig):
         reason_field = {"edc_visit_tracking.subjectvisit": "reason"}
 
+    class EdcVisitTrackingAppConfig(AppConfig):
+        timeline_digests = True
+        change_log = True
+        timeline_versions = True
+        date_buckets = True
+        visit_rollups = True
+        vital_status = True
+
     class EdcFacilityAppConfig(BaseEdcFacilityAppConfig):
         definitions = {
             "default": dict(days=[MO, TU, WE, TH, FR], slots=[100, 100, 100, 100, 100])
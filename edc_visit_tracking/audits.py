@@ -0,0 +1,232 @@
+import django
+import os
+
+from collections import Counter, OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from django import forms
+from django.apps import apps as django_apps
+from django.db import connections
+from itertools import repeat
+from zlib import crc32
+
+from .crf_date_validator import (
+    CrfDateValidator,
+    CrfReportDateAllowanceError,
+    CrfReportDateBeforeStudyStart,
+    CrfReportDateIsFuture,
+)
+from .crf_registry import site_crfs
+from .date_buckets import get_site_lookup
+from .form_validators import VisitFormValidator
+from .visit_sequence import VisitSequence, VisitSequenceError
+
+SITE = "site"
+SUBJECT_HASH = "hash"
+
+SEQUENCE = "sequence"
+CRF_DATE = "crf_date"
+VISIT_REASON = "visit_reason"
+
+AuditFinding = namedtuple(
+    "AuditFinding",
+    "check label_lower object_pk subject_identifier visit_code "
+    "visit_code_sequence message",
+)
+
+
+class AuditError(Exception):
+    pass
+
+
+def get_audit_shards(visit_model_cls, by=None, shards=None):
+    """Returns a list of (key, subject_identifiers) partitioning
+    the subjects of the visit model.
+
+    By SITE, key is the site id. By SUBJECT_HASH, subjects are
+    split into `shards` by a stable hash of the identifier and
+    key is the shard number. A subject is always in one shard so
+    that its timeline is audited by one worker.
+    """
+    by = by or SITE
+    if by not in [SITE, SUBJECT_HASH]:
+        raise AuditError(f"Invalid shard by. Expected one of {[SITE, SUBJECT_HASH]}.")
+    site_lookup = get_site_lookup(visit_model_cls) if by == SITE else None
+    rows = (
+        visit_model_cls._base_manager.order_by()
+        .values_list("subject_identifier", site_lookup or "subject_identifier")
+        .distinct()
+    )
+    partitions = OrderedDict()
+    for subject_identifier, site_id in rows.iterator():
+        if by == SITE:
+            key = site_id if site_lookup else None
+        else:
+            key = crc32(subject_identifier.encode()) % (shards or os.cpu_count())
+        partitions.setdefault(key, set()).add(subject_identifier)
+    return [
+        (key, sorted(subject_identifiers))
+        for key, subject_identifiers in sorted(
+            partitions.items(), key=lambda item: str(item[0])
+        )
+    ]
+
+
+def get_finding(check, obj, visit, message):
+    return AuditFinding(
+        check,
+        obj._meta.label_lower,
+        str(obj.pk),
+        visit.subject_identifier,
+        visit.visit_code,
+        visit.visit_code_sequence,
+        str(message),
+    )
+
+
+def audit_visit(visit, form_validator_cls=None):
+    """Returns a list of findings of the sequence and reason
+    checks of one visit.
+    """
+    findings = []
+    try:
+        VisitSequence(appointment=visit.appointment).enforce_sequence()
+    except VisitSequenceError as e:
+        findings.append(get_finding(SEQUENCE, visit, visit, e))
+    form_validator = (form_validator_cls or VisitFormValidator)(
+        cleaned_data={f.name: getattr(visit, f.name) for f in visit._meta.fields},
+        instance=visit,
+    )
+    for validate in [
+        form_validator.validate_visit_code_sequence_and_reason,
+        form_validator.validate_required_fields,
+    ]:
+        try:
+            validate()
+        except forms.ValidationError as e:
+            findings.append(
+                get_finding(VISIT_REASON, visit, visit, "; ".join(e.messages))
+            )
+    return findings
+
+
+def audit_crf(crf, visit):
+    """Returns a list of findings of the report date checks of
+    one CRF.
+    """
+    try:
+        CrfDateValidator(
+            report_datetime=crf.report_datetime,
+            visit_report_datetime=visit.report_datetime,
+            created=crf.created,
+            modified=crf.modified,
+            subject_identifier=visit.subject_identifier,
+            facility_name=visit.appointment.facility_name,
+        )
+    except (
+        CrfReportDateAllowanceError,
+        CrfReportDateBeforeStudyStart,
+        CrfReportDateIsFuture,
+    ) as e:
+        return [get_finding(CRF_DATE, crf, visit, e)]
+    return []
+
+
+def audit_subjects(label_lower, subject_identifiers, chunk_size=None):
+    """Returns a list of findings for the visits and CRFs of the
+    given subjects.
+
+    Runs in a worker process. Subjects are audited in chunks to
+    keep `__in` lookups small.
+    """
+    visit_model_cls = django_apps.get_model(label_lower)
+    chunk_size = chunk_size or 500
+    crf_models = site_crfs.get_models(visit_model_cls)
+    findings = []
+    for index in range(0, len(subject_identifiers), chunk_size):
+        chunk = subject_identifiers[index : index + chunk_size]
+        visits = {
+            visit.pk: visit
+            for visit in visit_model_cls._base_manager.filter(
+                subject_identifier__in=chunk
+            ).select_related("appointment")
+        }
+        for visit in visits.values():
+            findings.extend(audit_visit(visit))
+        for model_cls in crf_models:
+            visit_model_attr = model_cls.visit_model_attr()
+            for crf in model_cls._base_manager.filter(
+                **{f"{visit_model_attr}__in": list(visits)}
+            ):
+                findings.extend(
+                    audit_crf(crf, visits[getattr(crf, f"{visit_model_attr}_id")])
+                )
+    return findings
+
+
+def init_worker():
+    if not django_apps.ready:
+        django.setup()
+
+
+class AuditReport:
+
+    """A data quality audit of the visits and CRFs of a visit
+    model.
+
+    Subjects are split into shards by site or by subject hash,
+    see `get_audit_shards`, and each shard is audited in a
+    process of a `ProcessPoolExecutor`. Connections are closed
+    before the pool starts so that each worker opens its own.
+    Findings of all shards are merged in one report.
+
+    For example:
+
+        report = AuditReport(by="hash", shards=32)
+        report.counts
+        report.findings
+
+    If `workers` is 1 shards are audited in this process.
+    """
+
+    def __init__(self, visit_model_cls=None, by=None, shards=None, workers=None):
+        if not visit_model_cls:
+            from .models import get_visit_tracking_model
+
+            visit_model_cls = get_visit_tracking_model()
+        self.visit_model_cls = visit_model_cls
+        self.label_lower = visit_model_cls._meta.label_lower
+        self.by = by or SITE
+        self.workers = workers or os.cpu_count()
+        self.shards = get_audit_shards(visit_model_cls, by=self.by, shards=shards)
+        self.findings = sorted(self.run())
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(visit_model_cls={self.label_lower}, "
+            f"by={self.by})"
+        )
+
+    def run(self):
+        subject_identifiers = [subjects for _, subjects in self.shards]
+        if self.workers == 1 or len(subject_identifiers) < 2:
+            results = map(audit_subjects, repeat(self.label_lower), subject_identifiers)
+            return [finding for findings in results for finding in findings]
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=min(self.workers, len(subject_identifiers)),
+            initializer=init_worker,
+        ) as executor:
+            results = executor.map(
+                audit_subjects, repeat(self.label_lower), subject_identifiers
+            )
+            return [finding for findings in results for finding in findings]
+
+    @property
+    def counts(self):
+        """Returns a Counter of findings by check.
+        """
+        return Counter(finding.check for finding in self.findings)
+
+    @property
+    def subjects(self):
+        return sum(len(subjects) for _, subjects in self.shards)
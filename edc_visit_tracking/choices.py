@@ -1,6 +1,9 @@
 from edc_constants.constants import OTHER, NOT_APPLICABLE
 
 from .constants import (
+    CREATED,
+    UPDATED,
+    DELETED,
     MISSED_VISIT,
     SCHEDULED,
     UNSCHEDULED,
@@ -45,3 +48,9 @@ VISIT_REASON_MISSED = (
     (OTHER, "Other"),
     (NOT_APPLICABLE, "Not applicable"),
 )
+
+CHANGE_LOG_OPERATIONS = (
+    (CREATED, "Created"),
+    (UPDATED, "Updated"),
+    (DELETED, "Deleted"),
+)
@@ -15,3 +15,8 @@ FOLLOW_UP_REASONS = [SCHEDULED, UNSCHEDULED]
 REQUIRED_REASONS = NO_FOLLOW_UP_REASONS + FOLLOW_UP_REASONS
 
 CHART = "chart"
+
+# change log operations
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
@@ -0,0 +1,126 @@
+from collections import Counter
+from django.apps import apps as django_apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .crf_registry import site_crfs
+from .date_buckets import get_site_lookup
+
+CRFS = "crfs"
+REQUISITIONS = "requisitions"
+
+
+def get_crf_count_field(model_cls):
+    """Returns the count field for a CRF model; requisitions are
+    CRFs with a `panel`.
+    """
+    if "panel" in [f.name for f in model_cls._meta.fields]:
+        return REQUISITIONS
+    return CRFS
+
+
+def get_visit_attname(model_cls):
+    return model_cls._meta.get_field(model_cls.visit_model_attr()).attname
+
+
+def update_visit_crf_count(visit_model_cls, visit_pk, field, delta, using=None):
+    """Adds `delta` to the count `field` of the visit with an
+    atomic F-expression update, creating the row if needed.
+    """
+    model_cls = django_apps.get_model("edc_visit_tracking.visitcrfcount")
+    manager = model_cls.objects.db_manager(using)
+    opts = dict(label_lower=visit_model_cls._meta.label_lower, visit_pk=str(visit_pk))
+    updated = manager.filter(**opts).update(**{field: F(field) + delta})
+    if delta < 0:
+        manager.filter(crfs__lte=0, requisitions__lte=0, **opts).delete()
+    if updated or delta < 0:
+        return
+    site_lookup = get_site_lookup(visit_model_cls)
+    subject_identifier, site_id = (
+        visit_model_cls._base_manager.using(using)
+        .filter(pk=visit_pk)
+        .values_list("subject_identifier", site_lookup or "pk")
+        .get()
+    )
+    try:
+        with transaction.atomic(using=using):
+            manager.create(
+                subject_identifier=subject_identifier,
+                site_id=site_id if site_lookup else None,
+                **{field: delta},
+                **opts,
+            )
+    except IntegrityError:
+        manager.filter(**opts).update(**{field: F(field) + delta})
+
+
+def get_visit_crf_counts(visit_model_cls, using=None):
+    """Returns a dict of {visit pk as str: Counter of
+    {count field: n}} counted from the CRF tables.
+    """
+    counts = {}
+    for model_cls in site_crfs.get_models(visit_model_cls):
+        field = get_crf_count_field(model_cls)
+        attname = get_visit_attname(model_cls)
+        for visit_pk, n in (
+            model_cls._base_manager.using(using)
+            .order_by()
+            .values(attname)
+            .annotate(n=Count("pk"))
+            .values_list(attname, "n")
+        ):
+            counts.setdefault(str(visit_pk), Counter())[field] += n
+    return counts
+
+
+def reconcile_visit_crf_counts(visit_model_cls=None, using=None):
+    """Repairs the CRF counts of `visit_model_cls` or of all
+    visit models from the CRF tables.
+
+    Returns the number of counts created, updated or deleted
+    to match.
+    """
+    model_cls = django_apps.get_model("edc_visit_tracking.visitcrfcount")
+    visit_models = (
+        [visit_model_cls]
+        if visit_model_cls
+        else list(set(entry.visit_model_cls for entry in site_crfs.get_entries()))
+    )
+    repaired = 0
+    for visit_model_cls in visit_models:
+        label_lower = visit_model_cls._meta.label_lower
+        counts = get_visit_crf_counts(visit_model_cls, using=using)
+        stored = {
+            obj.visit_pk: obj
+            for obj in model_cls.objects.using(using).filter(label_lower=label_lower)
+        }
+        with transaction.atomic(using=using):
+            stale = [pk for pk in stored if pk not in counts]
+            model_cls.objects.using(using).filter(
+                pk__in=[stored[pk].pk for pk in stale]
+            ).delete()
+            repaired += len(stale)
+            for visit_pk, counter in counts.items():
+                obj = stored.get(visit_pk)
+                if obj is None:
+                    for field, n in counter.items():
+                        update_visit_crf_count(
+                            visit_model_cls, visit_pk, field, n, using=using
+                        )
+                    repaired += 1
+                elif (obj.crfs, obj.requisitions) != (
+                    counter[CRFS],
+                    counter[REQUISITIONS],
+                ):
+                    obj.crfs = counter[CRFS]
+                    obj.requisitions = counter[REQUISITIONS]
+                    obj.save(update_fields=[CRFS, REQUISITIONS])
+                    repaired += 1
+    return repaired
+
+
+def delete_visit_crf_counts(visit, using=None):
+    model_cls = django_apps.get_model("edc_visit_tracking.visitcrfcount")
+    model_cls.objects.using(using).filter(
+        label_lower=visit._meta.label_lower, visit_pk=str(visit.pk)
+    ).delete()
@@ -8,6 +8,9 @@ from edc_protocol.validators import datetime_not_before_study_start
 from edc_utils.text import convert_php_dateformat
 from django.conf import settings
 
+from .date_buckets import get_report_date
+from .working_days import WorkingDayCalendarError, get_working_day_calendar
+
 
 class CrfReportDateAllowanceError(Exception):
     pass
@@ -24,6 +27,7 @@ class CrfReportDateIsFuture(Exception):
 class CrfDateValidator:
 
     report_datetime_allowance = None
+    report_datetime_allowance_working_days = None
     allow_report_datetime_before_visit = False
 
     def __init__(
@@ -35,17 +39,26 @@ class CrfDateValidator:
         created=None,
         modified=None,
         subject_identifier=None,
+        report_datetime_allowance_working_days=None,
+        facility_name=None,
     ):
-        self.allow_report_datetime_before_visit = (
-            allow_report_datetime_before_visit
-            or self.allow_report_datetime_before_visit
-        )
-        self.report_datetime_allowance = (
-            report_datetime_allowance or self.report_datetime_allowance
-        )
-        if not self.report_datetime_allowance:
+        if allow_report_datetime_before_visit is not None:
+            self.allow_report_datetime_before_visit = allow_report_datetime_before_visit
+        if report_datetime_allowance is not None:
+            self.report_datetime_allowance = report_datetime_allowance
+        if self.report_datetime_allowance is None:
             app_config = django_apps.get_app_config("edc_visit_tracking")
             self.report_datetime_allowance = app_config.report_datetime_allowance
+        if report_datetime_allowance_working_days is not None:
+            self.report_datetime_allowance_working_days = (
+                report_datetime_allowance_working_days
+            )
+        if self.report_datetime_allowance_working_days is None:
+            app_config = django_apps.get_app_config("edc_visit_tracking")
+            self.report_datetime_allowance_working_days = (
+                app_config.report_datetime_allowance_working_days
+            )
+        self.facility_name = facility_name
         self.report_datetime = (
             arrow.Arrow.fromdatetime(report_datetime, report_datetime.tzinfo)
             .to("utc")
@@ -91,8 +104,23 @@ class CrfDateValidator:
                 f"Visit report datetime is {formatted_visit_datetime}. "
             )
 
+        # not more than x working days greater than the visit report_datetime
+        if (
+            self.report_datetime_allowance > 0
+            and self.report_datetime_allowance_working_days
+        ):
+            max_allowed_report_date = self.get_max_allowed_report_date(
+                formatted_visit_datetime
+            )
+            if get_report_date(self.report_datetime) > max_allowed_report_date:
+                raise CrfReportDateAllowanceError(
+                    f"Report datetime may not more than {self.report_datetime_allowance} "
+                    f"working days greater than the visit report datetime. "
+                    f"Visit report datetime is {formatted_visit_datetime}. "
+                    f"See also AppConfig.report_datetime_allowance."
+                )
         # not more than x days greater than the visit report_datetime
-        if self.report_datetime_allowance > 0:
+        elif self.report_datetime_allowance > 0:
             max_allowed_report_datetime = self.visit_report_datetime + relativedelta(
                 days=self.report_datetime_allowance
             )
@@ -107,3 +135,18 @@ class CrfDateValidator:
                     f"Visit report datetime is {formatted_visit_datetime}. "
                     f"See also AppConfig.report_datetime_allowance."
                 )
+
+    def get_max_allowed_report_date(self, formatted_visit_datetime):
+        """Returns the last report date allowed, in working days
+        of the facility after the visit report date.
+        """
+        try:
+            return get_working_day_calendar(self.facility_name).add_working_days(
+                get_report_date(self.visit_report_datetime),
+                self.report_datetime_allowance,
+            )
+        except WorkingDayCalendarError as e:
+            raise CrfReportDateAllowanceError(
+                "Unable to count working days from the visit report datetime. "
+                f"Visit report datetime is {formatted_visit_datetime}. {e}"
+            )
@@ -0,0 +1,232 @@
+from collections import OrderedDict, namedtuple
+from django.apps import apps as django_apps
+from django.db.models import CharField, Exists, F, OuterRef, Value
+from django.db.models.functions import Cast
+
+CrfRegistryEntry = namedtuple(
+    "CrfRegistryEntry", "model_cls visit_model_cls visit_lookup inline"
+)
+
+
+class CrfRegistryError(Exception):
+    pass
+
+
+def get_inline_parent_field(model_cls):
+    """Returns the FK field of an inline to its CRF parent model
+    or None.
+    """
+    from .model_mixins import CrfModelMixin
+
+    name = getattr(model_cls._meta, "crf_inline_parent", None)
+    if name:
+        return model_cls._meta.get_field(name)
+    fields = [
+        field
+        for field in model_cls._meta.fields
+        if field.related_model and issubclass(field.related_model, CrfModelMixin)
+    ]
+    return fields[0] if len(fields) == 1 else None
+
+
+class CrfRegistry:
+
+    """A registry of the CRF and CRF inline models of all apps
+    and the lookup from each to its visit's pk.
+
+    Populated in AppConfig.ready(). Use it to fetch the CRFs of
+    one or many visits in a few queries instead of one query per
+    CRF model, e.g.:
+
+        site_crfs.get_crfs(subject_visit)
+        site_crfs.get_crfs_for_visits(subject_visits)
+
+    or to check, without loading rows, if visits have CRFs:
+
+        site_crfs.has_dependents(subject_visit)
+    """
+
+    # CRF models per UNION query, below the SQLite limit of 500
+    union_size = 100
+
+    def __init__(self):
+        self.registry = OrderedDict()
+        self.loaded = False
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(loaded={self.loaded})"
+
+    def populate(self):
+        from .model_mixins import CrfInlineModelMixin, CrfModelMixin
+
+        self.registry = OrderedDict()
+        for model_cls in django_apps.get_models():
+            if model_cls._meta.proxy:
+                continue
+            if issubclass(model_cls, CrfModelMixin):
+                visit_field = model_cls._meta.get_field(model_cls.visit_model_attr())
+                self.register(model_cls, visit_field.related_model, visit_field.attname)
+            elif issubclass(model_cls, CrfInlineModelMixin):
+                parent_field = get_inline_parent_field(model_cls)
+                if parent_field is None:
+                    continue
+                parent_model_cls = parent_field.related_model
+                visit_field = parent_model_cls._meta.get_field(
+                    parent_model_cls.visit_model_attr()
+                )
+                self.register(
+                    model_cls,
+                    visit_field.related_model,
+                    f"{parent_field.name}__{visit_field.attname}",
+                    inline=True,
+                )
+        self.loaded = True
+
+    def register(self, model_cls, visit_model_cls, visit_lookup, inline=None):
+        self.registry.update(
+            {
+                model_cls._meta.label_lower: CrfRegistryEntry(
+                    model_cls, visit_model_cls, visit_lookup, bool(inline)
+                )
+            }
+        )
+
+    def get_entries(self, visit_model_cls=None, inline=None):
+        """Returns a list of registry entries, optionally for one
+        visit model and including inlines.
+        """
+        if not self.loaded:
+            raise CrfRegistryError("CRF registry is not loaded. See AppConfig.ready.")
+        return [
+            entry
+            for entry in self.registry.values()
+            if (visit_model_cls is None or entry.visit_model_cls == visit_model_cls)
+            and (inline or not entry.inline)
+        ]
+
+    def get_models(self, visit_model_cls=None, inline=None):
+        return [
+            entry.model_cls
+            for entry in self.get_entries(
+                visit_model_cls=visit_model_cls, inline=inline
+            )
+        ]
+
+    def get_crf_keys(self, visit_model_cls, visit_pks, inline=None, using=None):
+        """Returns a list of (label_lower, crf pk, visit pk) of the
+        CRFs of the given visits.
+
+        CRF pks are cast to the backend's text representation so
+        that models with different pk types can be UNIONed. They
+        are valid in a `pk__in` lookup.
+
+        One UNION query per `union_size` CRF models.
+        """
+        visit_pks = list(visit_pks)
+        entries = self.get_entries(visit_model_cls=visit_model_cls, inline=inline)
+        if not visit_pks or not entries:
+            return []
+        querysets = [
+            entry.model_cls._base_manager.using(using)
+            .filter(**{f"{entry.visit_lookup}__in": visit_pks})
+            .order_by()
+            .annotate(
+                crf_model=Value(entry.model_cls._meta.label_lower, CharField()),
+                crf_pk=Cast("pk", CharField()),
+                crf_visit=F(entry.visit_lookup),
+            )
+            .values_list("crf_model", "crf_pk", "crf_visit")
+            for entry in entries
+        ]
+        keys = []
+        for index in range(0, len(querysets), self.union_size):
+            qs, *others = querysets[index : index + self.union_size]
+            keys.extend(qs.union(*others, all=True) if others else qs)
+        return keys
+
+    def get_dependents(self, visit_model_cls, visit_pks, using=None):
+        """Returns a dict of {visit pk: [label_lower, ...]} of the
+        CRF models with rows for each visit, for visits with any.
+
+        One query with an EXISTS per CRF model, per `union_size`
+        CRF models. No CRF rows are loaded.
+        """
+        visit_pks = list(visit_pks)
+        entries = self.get_entries(visit_model_cls=visit_model_cls)
+        dependents = {}
+        if not visit_pks:
+            return dependents
+        for index in range(0, len(entries), self.union_size):
+            chunk = entries[index : index + self.union_size]
+            annotations = OrderedDict(
+                (
+                    f"crf_{i}",
+                    Exists(
+                        entry.model_cls._base_manager.using(using)
+                        .filter(**{entry.visit_lookup: OuterRef("pk")})
+                        .order_by()
+                        .values("pk")
+                    ),
+                )
+                for i, entry in enumerate(chunk)
+            )
+            for pk, *exists in (
+                visit_model_cls._base_manager.using(using)
+                .filter(pk__in=visit_pks)
+                .order_by()
+                .annotate(**annotations)
+                .values_list("pk", *annotations)
+            ):
+                label_lowers = [
+                    entry.model_cls._meta.label_lower
+                    for entry, value in zip(chunk, exists)
+                    if value
+                ]
+                if label_lowers:
+                    dependents.setdefault(pk, []).extend(label_lowers)
+        return dependents
+
+    def has_dependents(self, visit, using=None):
+        """Returns True if any CRF refers to the visit.
+        """
+        if visit.pk is None:
+            return False
+        return bool(self.get_dependents(visit.__class__, [visit.pk], using=using))
+
+    def get_crfs_for_visits(self, visits, inline=None, using=None):
+        """Returns a dict of {visit pk: {label_lower: [CRF
+        instances]}} for a list of visits of one visit model.
+
+        Costs one UNION query plus one query per CRF model with
+        rows for these visits.
+        """
+        visits = list(visits)
+        if not visits:
+            return {}
+        visit_model_cls = visits[0].__class__
+        pks = {}
+        for label_lower, crf_pk, _ in self.get_crf_keys(
+            visit_model_cls, [visit.pk for visit in visits], inline=inline, using=using
+        ):
+            pks.setdefault(label_lower, []).append(crf_pk)
+        crfs = OrderedDict((visit.pk, OrderedDict()) for visit in visits)
+        for label_lower, crf_pks in pks.items():
+            entry = self.registry[label_lower]
+            for crf in (
+                entry.model_cls._base_manager.using(using)
+                .filter(pk__in=crf_pks)
+                .annotate(crf_visit=F(entry.visit_lookup))
+            ):
+                crfs[crf.crf_visit].setdefault(label_lower, []).append(crf)
+        return crfs
+
+    def get_crfs(self, visit, inline=None, using=None):
+        """Returns a dict of {label_lower: [CRF instances]} for a
+        visit.
+        """
+        return self.get_crfs_for_visits([visit], inline=inline, using=using).get(
+            visit.pk, {}
+        )
+
+
+site_crfs = CrfRegistry()
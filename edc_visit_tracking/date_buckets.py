@@ -0,0 +1,204 @@
+from datetime import date
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, QuerySet
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .utils import get_related_visit
+
+DATE_BUCKET_FIELD = "report_datetime"
+
+
+def get_date_bucket_models():
+    """Returns a list of the visit and CRF model classes.
+    """
+    from .model_mixins import CrfModelMixin, VisitModelMixin
+
+    return [
+        model_cls
+        for model_cls in django_apps.get_models()
+        if issubclass(model_cls, (VisitModelMixin, CrfModelMixin))
+        and not model_cls._meta.proxy
+    ]
+
+
+def get_site_lookup(model_cls):
+    """Returns the lookup from a visit or CRF model to the
+    visit's site or None if the visit model has no site.
+    """
+    from .model_mixins import VisitModelMixin
+
+    if issubclass(model_cls, VisitModelMixin):
+        visit_model_cls, prefix = model_cls, ""
+    else:
+        visit_model_cls = model_cls.visit_model_cls()
+        prefix = f"{model_cls.visit_model_attr()}__"
+    try:
+        visit_model_cls._meta.get_field("site")
+    except FieldDoesNotExist:
+        return None
+    return f"{prefix}site"
+
+
+def get_report_date(report_datetime):
+    """Returns the local date of `report_datetime`, as
+    truncated by the database for the date hierarchy.
+    """
+    if settings.USE_TZ and timezone.is_aware(report_datetime):
+        report_datetime = timezone.localtime(report_datetime)
+    return report_datetime.date()
+
+
+def get_date_bucket_key(instance):
+    """Returns a tuple of (site_id, report_date) for a visit or
+    CRF instance.
+    """
+    return (
+        getattr(get_related_visit(instance), "site_id", None),
+        get_report_date(getattr(instance, DATE_BUCKET_FIELD)),
+    )
+
+
+def update_date_bucket(label_lower, site_id, report_date, delta, using=None):
+    """Adds `delta` to the count of the bucket.
+
+    Empty buckets are deleted.
+    """
+    model_cls = django_apps.get_model("edc_visit_tracking.datebucket")
+    manager = model_cls.objects.db_manager(using)
+    opts = dict(label_lower=label_lower, site_key=site_id or 0, report_date=report_date)
+    if not manager.filter(**opts).update(count=F("count") + delta) and delta > 0:
+        try:
+            with transaction.atomic(using=using):
+                manager.create(
+                    site_id=site_id,
+                    year=report_date.year,
+                    month=report_date.month,
+                    day=report_date.day,
+                    count=delta,
+                    **opts,
+                )
+        except IntegrityError:
+            manager.filter(**opts).update(count=F("count") + delta)
+    if delta < 0:
+        manager.filter(count__lte=0, **opts).delete()
+
+
+def rebuild_date_buckets(model_cls=None, using=None):
+    """Rebuilds the buckets of `model_cls` or of all visit and
+    CRF models from their tables.
+
+    Returns the number of buckets created.
+    """
+    date_bucket_model_cls = django_apps.get_model("edc_visit_tracking.datebucket")
+    created = 0
+    for model_cls in [model_cls] if model_cls else get_date_bucket_models():
+        label_lower = model_cls._meta.label_lower
+        site_lookup = get_site_lookup(model_cls)
+        rows = (
+            model_cls._base_manager.using(using)
+            .annotate(bucket_date=TruncDate(DATE_BUCKET_FIELD))
+            .values(*(["bucket_date"] + ([site_lookup] if site_lookup else [])))
+            .annotate(bucket_count=Count("pk"))
+            .order_by()
+        )
+        objs = [
+            date_bucket_model_cls(
+                label_lower=label_lower,
+                site_id=row.get(site_lookup) if site_lookup else None,
+                site_key=(row.get(site_lookup) if site_lookup else None) or 0,
+                report_date=row.get("bucket_date"),
+                year=row.get("bucket_date").year,
+                month=row.get("bucket_date").month,
+                day=row.get("bucket_date").day,
+                count=row.get("bucket_count"),
+            )
+            for row in rows
+        ]
+        with transaction.atomic(using=using):
+            date_bucket_model_cls.objects.using(using).filter(
+                label_lower=label_lower
+            ).delete()
+            date_bucket_model_cls.objects.using(using).bulk_create(objs)
+        created += len(objs)
+    return created
+
+
+class DateBucketQuerySetMixin:
+
+    """A QuerySet mixin that answers the admin date hierarchy's
+    `dates()` and Min/Max `aggregate()` on the date field from
+    a queryset of DateBucket instances.
+
+    Any further filtering falls back to the table.
+    """
+
+    date_buckets = None
+    date_bucket_field = DATE_BUCKET_FIELD
+
+    def _clone(self):
+        clone = super()._clone()
+        clone.date_buckets = self.date_buckets
+        return clone
+
+    def _filter_or_exclude(self, *args, **kwargs):
+        clone = super()._filter_or_exclude(*args, **kwargs)
+        clone.date_buckets = None
+        return clone
+
+    def dates(self, field_name, kind, order="ASC"):
+        if self.date_buckets is None or field_name != self.date_bucket_field:
+            return super().dates(field_name, kind, order=order)
+        fields = {"year": ["year"], "month": ["year", "month"]}.get(
+            kind, ["year", "month", "day"]
+        )
+        values = self.date_buckets.values_list(*fields).distinct().order_by(*fields)
+        dates = [date(*(list(value) + [1, 1])[:3]) for value in values]
+        return list(reversed(dates)) if order == "DESC" else dates
+
+    def aggregate(self, *args, **kwargs):
+        if self.date_buckets is None or args or not kwargs:
+            return super().aggregate(*args, **kwargs)
+        for aggregate in kwargs.values():
+            expressions = aggregate.get_source_expressions()
+            if (
+                not isinstance(aggregate, (Min, Max))
+                or len(expressions) != 1
+                or getattr(expressions[0], "name", None) != self.date_bucket_field
+            ):
+                return super().aggregate(*args, **kwargs)
+        return self.date_buckets.aggregate(
+            **{
+                name: aggregate.__class__("report_date")
+                for name, aggregate in kwargs.items()
+            }
+        )
+
+
+class DateBucketQuerySet(DateBucketQuerySetMixin, QuerySet):
+    pass
+
+
+def get_date_bucket_queryset(queryset, site_id=None, **lookups):
+    """Returns a `DateBucketQuerySet` with the query of
+    `queryset` that reads its date hierarchy from the buckets.
+
+    `lookups` are the date hierarchy's year, month and day, if
+    any. Methods of a custom QuerySet class of `queryset` are
+    not available on the returned queryset.
+    """
+    date_bucket_model_cls = django_apps.get_model("edc_visit_tracking.datebucket")
+    date_buckets = date_bucket_model_cls.objects.using(queryset.db).filter(
+        label_lower=queryset.model._meta.label_lower, **lookups
+    )
+    if site_id:
+        date_buckets = date_buckets.filter(site_key=site_id)
+    clone = DateBucketQuerySet(
+        model=queryset.model, query=queryset.query.chain(), using=queryset.db
+    )
+    clone.date_buckets = date_buckets
+    return clone
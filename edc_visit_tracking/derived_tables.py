@@ -0,0 +1,256 @@
+from collections import Counter, OrderedDict
+
+from django.apps import apps as django_apps
+
+from .constants import CREATED, UPDATED, DELETED
+from .crf_counts import (
+    delete_visit_crf_counts,
+    get_crf_count_field,
+    get_visit_attname,
+    update_visit_crf_count,
+)
+from .date_buckets import get_date_bucket_key, update_date_bucket
+from .digests import delete_timeline_digest, update_timeline_digests
+from .timeline_version import bump_timeline_version
+from .utils import get_related_visit
+from .visit_rollups import (
+    get_instance_visit_rollup_key,
+    update_visit_rollup,
+    update_visit_rollups,
+)
+from .vital_status import update_subject_vital_status
+
+DATE_BUCKET = "date_bucket"
+VISIT_ROLLUP = "visit_rollup"
+CRF_COUNT = "crf_count"
+
+
+def is_visit_model(model_cls):
+    from .model_mixins import VisitModelMixin
+
+    return issubclass(model_cls, VisitModelMixin)
+
+
+def get_keyed_tables(model_cls):
+    """Returns the names of the enabled derived tables that move
+    a row from an old key to a new key on update.
+    """
+    app_config = django_apps.get_app_config("edc_visit_tracking")
+    tables = []
+    if app_config.date_buckets:
+        tables.append(DATE_BUCKET)
+    if app_config.visit_rollups and is_visit_model(model_cls):
+        tables.append(VISIT_ROLLUP)
+    if app_config.visit_crf_counts and not is_visit_model(model_cls):
+        tables.append(CRF_COUNT)
+    return tables
+
+
+def has_derived_tables(model_cls):
+    """Returns True if any derived table is enabled for the
+    visit or CRF model.
+    """
+    app_config = django_apps.get_app_config("edc_visit_tracking")
+    return bool(
+        get_keyed_tables(model_cls)
+        or app_config.timeline_digests
+        or app_config.change_log
+        or app_config.timeline_versions
+        or (app_config.vital_status and is_visit_model(model_cls))
+    )
+
+
+def get_derived_queryset(model_cls, using=None):
+    """Returns a queryset of `model_cls` that joins the visit of
+    CRF instances.
+    """
+    queryset = model_cls._base_manager.using(using)
+    if is_visit_model(model_cls):
+        return queryset
+    return queryset.select_related(model_cls.visit_model_attr())
+
+
+def get_derived_keys(instance):
+    """Returns a dict of {table: key} of an instance for the
+    enabled keyed derived tables.
+    """
+    model_cls = instance.__class__
+    keys = {}
+    for table in get_keyed_tables(model_cls):
+        if table == DATE_BUCKET:
+            keys.update({table: get_date_bucket_key(instance)})
+        elif table == VISIT_ROLLUP:
+            keys.update({table: get_instance_visit_rollup_key(instance)})
+        elif table == CRF_COUNT:
+            keys.update({table: getattr(instance, get_visit_attname(model_cls))})
+    return keys
+
+
+def get_stored_derived_keys(model_cls, pks, using=None):
+    """Returns a dict of {pk: {table: key}} of the stored rows
+    of `pks` in one query.
+    """
+    pks = list(pks)
+    if not pks or not get_keyed_tables(model_cls):
+        return {}
+    return {
+        obj.pk: get_derived_keys(obj)
+        for obj in get_derived_queryset(model_cls, using=using).filter(pk__in=pks)
+    }
+
+
+def get_key_deltas(table, created, updated, get_key):
+    """Returns a Counter of {key: delta} moving updated instances
+    from their stored key to their current key and counting
+    created instances.
+    """
+    deltas = Counter()
+    for instance in created:
+        deltas[get_key(instance)] += 1
+    for instance, stored_keys in updated:
+        old_key = (stored_keys or {}).get(table)
+        new_key = get_key(instance)
+        if old_key is None:
+            deltas[new_key] += 1
+        elif old_key != new_key:
+            deltas[old_key] -= 1
+            deltas[new_key] += 1
+    return deltas
+
+
+def get_subjects(instances):
+    return list(
+        OrderedDict(
+            (get_related_visit(instance).subject_identifier, None)
+            for instance in instances
+        )
+    )
+
+
+def update_derived_tables(model_cls, created=None, updated=None, using=None):
+    """Refreshes the enabled derived tables for saved visit or
+    CRF instances of `model_cls`.
+
+    `created` is a list of instances, `updated` a list of
+    (instance, stored keys), see `get_stored_derived_keys`.
+
+    Called by the post_save signal for one instance and by
+    batch writes that do not call `save()`, e.g.
+    `mark_visits_missed`.
+    """
+    app_config = django_apps.get_app_config("edc_visit_tracking")
+    created = list(created or [])
+    updated = list(updated or [])
+    instances = created + [instance for instance, _ in updated]
+    if not instances:
+        return
+    if app_config.timeline_digests:
+        update_timeline_digests(instances)
+    if app_config.change_log:
+        change_log_model_cls = django_apps.get_model("edc_visit_tracking.changelog")
+        manager = change_log_model_cls.objects.db_manager(using)
+        manager.log_changes(created, CREATED)
+        manager.log_changes([instance for instance, _ in updated], UPDATED)
+    if app_config.timeline_versions:
+        for subject_identifier in get_subjects(instances):
+            bump_timeline_version(subject_identifier)
+    update_keyed_tables(model_cls, created, updated, using=using)
+    if app_config.vital_status and is_visit_model(model_cls):
+        for subject_identifier in get_subjects(instances):
+            update_subject_vital_status(model_cls, subject_identifier, using=using)
+
+
+def update_keyed_tables(model_cls, created, updated, using=None):
+    """Applies the key deltas of created and updated instances to
+    the date buckets, visit rollups and CRF counts.
+    """
+    label_lower = model_cls._meta.label_lower
+    keyed_tables = get_keyed_tables(model_cls)
+    if DATE_BUCKET in keyed_tables:
+        deltas = get_key_deltas(DATE_BUCKET, created, updated, get_date_bucket_key)
+        for key, delta in deltas.items():
+            if delta:
+                update_date_bucket(label_lower, *key, delta, using=using)
+    if VISIT_ROLLUP in keyed_tables:
+        update_visit_rollups(
+            label_lower,
+            get_key_deltas(
+                VISIT_ROLLUP, created, updated, get_instance_visit_rollup_key
+            ),
+            using=using,
+        )
+    if CRF_COUNT in keyed_tables:
+        attname = get_visit_attname(model_cls)
+        deltas = get_key_deltas(
+            CRF_COUNT, created, updated, lambda instance: getattr(instance, attname)
+        )
+        for visit_pk, delta in deltas.items():
+            if delta:
+                update_visit_crf_count(
+                    model_cls.visit_model_cls(),
+                    visit_pk,
+                    get_crf_count_field(model_cls),
+                    delta,
+                    using=using,
+                )
+
+
+def refresh_derived_tables(model_cls, created_pks=None, stored_keys=None, using=None):
+    """Refreshes the enabled derived tables for rows of
+    `model_cls` written without `save()`.
+
+    `created_pks` are the pks of inserted rows and `stored_keys`
+    a dict of {pk: stored keys} of updated rows, read with
+    `get_stored_derived_keys` before the update. The written rows
+    are fetched in one query.
+    """
+    created_pks = list(created_pks or [])
+    stored_keys = stored_keys or {}
+    if not has_derived_tables(model_cls) or not (created_pks or stored_keys):
+        return
+    instances = {
+        obj.pk: obj
+        for obj in get_derived_queryset(model_cls, using=using).filter(
+            pk__in=created_pks + list(stored_keys)
+        )
+    }
+    update_derived_tables(
+        model_cls,
+        created=[instances[pk] for pk in created_pks if pk in instances],
+        updated=[
+            (instances[pk], keys) for pk, keys in stored_keys.items() if pk in instances
+        ],
+        using=using,
+    )
+
+
+def delete_derived_tables(model_cls, instance, using=None):
+    """Removes a deleted visit or CRF instance from the enabled
+    derived tables.
+    """
+    app_config = django_apps.get_app_config("edc_visit_tracking")
+    label_lower = model_cls._meta.label_lower
+    if app_config.timeline_digests:
+        delete_timeline_digest(instance)
+    if app_config.change_log:
+        change_log_model_cls = django_apps.get_model("edc_visit_tracking.changelog")
+        change_log_model_cls.objects.db_manager(using).log_change(instance, DELETED)
+    if app_config.timeline_versions:
+        bump_timeline_version(get_related_visit(instance).subject_identifier)
+    keys = get_derived_keys(instance)
+    if DATE_BUCKET in keys:
+        update_date_bucket(label_lower, *keys.get(DATE_BUCKET), -1, using=using)
+    if VISIT_ROLLUP in keys:
+        update_visit_rollup(label_lower, keys.get(VISIT_ROLLUP), -1, using=using)
+    if CRF_COUNT in keys:
+        update_visit_crf_count(
+            model_cls.visit_model_cls(),
+            keys.get(CRF_COUNT),
+            get_crf_count_field(model_cls),
+            -1,
+            using=using,
+        )
+    if app_config.vital_status and is_visit_model(model_cls):
+        update_subject_vital_status(model_cls, instance.subject_identifier, using=using)
+    if app_config.visit_crf_counts and is_visit_model(model_cls):
+        delete_visit_crf_counts(instance, using=using)
@@ -0,0 +1,205 @@
+import hashlib
+import json
+
+from django.apps import apps as django_apps
+from django_audit_fields.constants import AUDIT_MODEL_FIELDS
+
+from .utils import get_row_hash, get_related_visit
+
+MERKLE_DEPTH = 10
+
+EXCLUDE_DIGEST_FIELDS = AUDIT_MODEL_FIELDS + [
+    "revision",
+    "device_created",
+    "device_modified",
+]
+
+
+def sha256(value):
+    return hashlib.sha256(json.dumps(value).encode()).hexdigest()
+
+
+def get_digest_fields(model_cls):
+    """Returns the names of the fields of `model_cls` tracked
+    by the digest.
+
+    Relations, the primary key and audit fields are not tracked.
+    """
+    return [
+        field.name
+        for field in model_cls._meta.concrete_fields
+        if not field.is_relation
+        and not field.primary_key
+        and field.name not in EXCLUDE_DIGEST_FIELDS
+    ]
+
+
+def get_instance_digest(instance):
+    """Returns a stable digest for a visit or CRF instance from
+    its natural key and tracked fields.
+    """
+    model_cls = instance.__class__
+    row_hash = get_row_hash(
+        model_cls, {f: getattr(instance, f) for f in get_digest_fields(model_cls)}
+    )
+    return sha256(
+        [model_cls._meta.label_lower, json.dumps(instance.natural_key()), row_hash]
+    )
+
+
+def get_subject_and_site(instance):
+    """Returns a tuple of (subject_identifier, site_id) for a visit
+    or CRF instance.
+    """
+    visit = get_related_visit(instance)
+    return visit.subject_identifier, getattr(visit, "site_id", None)
+
+
+def update_timeline_digest(instance):
+    """Updates the digest of a visit or CRF instance and the
+    digest of its subject.
+    """
+    update_timeline_digests([instance])
+
+
+def update_timeline_digests(instances):
+    """Updates the digests of visit or CRF instances and, once
+    per subject, the digests of their subjects.
+    """
+    timeline_digest_model_cls = django_apps.get_model(
+        "edc_visit_tracking.timelinedigest"
+    )
+    subjects = {}
+    for instance in instances:
+        subject_identifier, site_id = get_subject_and_site(instance)
+        timeline_digest_model_cls.objects.update_or_create(
+            label_lower=instance._meta.label_lower,
+            natural_key=json.dumps(instance.natural_key()),
+            defaults=dict(
+                subject_identifier=subject_identifier,
+                site_id=site_id,
+                digest=get_instance_digest(instance),
+            ),
+        )
+        subjects.update({subject_identifier: site_id})
+    for subject_identifier, site_id in subjects.items():
+        update_subject_digest(subject_identifier, site_id)
+
+
+def delete_timeline_digest(instance):
+    """Deletes the digest of a visit or CRF instance and updates
+    the digest of its subject.
+    """
+    timeline_digest_model_cls = django_apps.get_model(
+        "edc_visit_tracking.timelinedigest"
+    )
+    subject_identifier, site_id = get_subject_and_site(instance)
+    timeline_digest_model_cls.objects.filter(
+        label_lower=instance._meta.label_lower,
+        natural_key=json.dumps(instance.natural_key()),
+    ).delete()
+    update_subject_digest(subject_identifier, site_id)
+
+
+def update_subject_digest(subject_identifier, site_id=None):
+    """Rolls up the subject's timeline digests into the
+    subject digest.
+    """
+    timeline_digest_model_cls = django_apps.get_model(
+        "edc_visit_tracking.timelinedigest"
+    )
+    subject_digest_model_cls = django_apps.get_model("edc_visit_tracking.subjectdigest")
+    digests = list(
+        timeline_digest_model_cls.objects.filter(subject_identifier=subject_identifier)
+        .order_by("label_lower", "natural_key")
+        .values_list("label_lower", "natural_key", "digest")
+    )
+    if digests:
+        subject_digest_model_cls.objects.update_or_create(
+            subject_identifier=subject_identifier,
+            defaults=dict(site_id=site_id, digest=sha256(digests)),
+        )
+    else:
+        subject_digest_model_cls.objects.filter(
+            subject_identifier=subject_identifier
+        ).delete()
+
+
+def get_bucket(subject_identifier, depth):
+    """Returns the leaf bucket index of a subject.
+
+    Buckets depend only on the subject_identifier so that
+    trees on different nodes have the same shape.
+    """
+    return int(hashlib.sha256(subject_identifier.encode()).hexdigest(), 16) % (
+        2 ** depth
+    )
+
+
+class MerkleTree:
+    """A binary hash tree over 2**depth buckets of
+    (subject_identifier, digest).
+
+    Level 0 is the root, level `depth` holds the bucket digests.
+
+    Two nodes find the subjects that differ by comparing
+    `digest(level, index)` top-down and only descending into
+    subtrees that differ, then comparing `bucket(index)` for
+    the differing leaves. `other` in `diff` may be any object,
+    for example a remote proxy, that implements `digest` and
+    `bucket`.
+    """
+
+    def __init__(self, subject_digests=None, depth=None):
+        self.depth = MERKLE_DEPTH if depth is None else depth
+        self.buckets = [[] for _ in range(2 ** self.depth)]
+        for subject_identifier, digest in sorted(subject_digests or []):
+            self.buckets[get_bucket(subject_identifier, self.depth)].append(
+                [subject_identifier, digest]
+            )
+        level = [sha256(bucket) for bucket in self.buckets]
+        self.levels = [level]
+        while len(level) > 1:
+            level = [sha256(level[i : i + 2]) for i in range(0, len(level), 2)]
+            self.levels.insert(0, level)
+
+    @property
+    def root(self):
+        return self.levels[0][0]
+
+    def digest(self, level, index):
+        return self.levels[level][index]
+
+    def bucket(self, index):
+        return self.buckets[index]
+
+    def diff(self, other):
+        """Returns a sorted list of subject identifiers whose
+        digests differ between this tree and `other`.
+        """
+        subject_identifiers = set()
+        nodes = [(0, 0)]
+        while nodes:
+            level, index = nodes.pop()
+            if self.digest(level, index) == other.digest(level, index):
+                continue
+            if level < self.depth:
+                nodes.extend([(level + 1, index * 2), (level + 1, index * 2 + 1)])
+            else:
+                mine = dict(map(tuple, self.bucket(index)))
+                theirs = dict(map(tuple, other.bucket(index)))
+                subject_identifiers.update(
+                    k for k in set(mine) | set(theirs) if mine.get(k) != theirs.get(k)
+                )
+        return sorted(subject_identifiers)
+
+
+def get_merkle_tree(site_id=None, depth=None):
+    """Returns a `MerkleTree` of subject digests for all
+    subjects or for subjects of a site.
+    """
+    subject_digest_model_cls = django_apps.get_model("edc_visit_tracking.subjectdigest")
+    qs = subject_digest_model_cls.objects.all()
+    if site_id:
+        qs = qs.filter(site_id=site_id)
+    return MerkleTree(qs.values_list("subject_identifier", "digest"), depth=depth)
@@ -6,6 +6,7 @@ from edc_metadata.models import CrfMetadata, RequisitionMetadata
 from edc_metadata.constants import KEYED
 
 from ..constants import MISSED_VISIT, UNSCHEDULED
+from ..crf_registry import site_crfs
 from ..visit_sequence import VisitSequence, VisitSequenceError
 
 
@@ -22,6 +23,8 @@ class VisitFormValidator(FormValidator):
                 {"appointment": "This field is required"}, code=REQUIRED_ERROR
             )
 
+        self.validate_appointment_has_no_visit()
+
         visit_sequence = self.visit_sequence_cls(appointment=appointment)
 
         try:
@@ -33,6 +36,23 @@ class VisitFormValidator(FormValidator):
 
         self.validate_required_fields()
 
+    def validate_appointment_has_no_visit(self):
+        """Raises if another visit refers to the appointment, e.g.
+        one submitted since the form was opened, instead of an
+        IntegrityError on save.
+        """
+        appointment = self.cleaned_data.get("appointment")
+        visits = appointment.visit_model_cls()._default_manager.filter(
+            appointment=appointment
+        )
+        if getattr(self.instance, "pk", None) is not None:
+            visits = visits.exclude(pk=self.instance.pk)
+        if visits.exists():
+            raise forms.ValidationError(
+                {"appointment": "Invalid. A visit already exists for this appointment"},
+                code=INVALID_ERROR,
+            )
+
     def validate_visit_code_sequence_and_reason(self):
         appointment = self.cleaned_data.get("appointment")
         reason = self.cleaned_data.get("reason")
@@ -47,7 +67,7 @@ class VisitFormValidator(FormValidator):
                     {"reason": "Invalid. This is an unscheduled visit"},
                     code=INVALID_ERROR,
                 )
-            if reason == MISSED_VISIT and self.metadata_exists_for(entry_status=KEYED):
+            if reason == MISSED_VISIT and self.crfs_exist():
                 raise forms.ValidationError(
                     {"reason": "Invalid. Some data has already been submitted"},
                     code=INVALID_ERROR,
@@ -77,6 +97,14 @@ class VisitFormValidator(FormValidator):
 
         self.required_if(OTHER, field="info_source", field_required="info_source_other")
 
+    def crfs_exist(self):
+        """Returns True if any CRF has been submitted for this
+        visit, see `crf_registry.CrfRegistry.has_dependents`.
+        """
+        if getattr(self.instance, "pk", None) is None:
+            return False
+        return site_crfs.has_dependents(self.instance)
+
     def metadata_exists_for(self, entry_status=None):
         """Returns True if metadata exists for this visit for
         the given entry_status.
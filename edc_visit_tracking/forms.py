@@ -0,0 +1,42 @@
+from django import forms
+from edc_constants.constants import NOT_APPLICABLE, OTHER
+
+
+class MarkAsMissedForm(forms.Form):
+
+    """A form for the reason missed of the "mark as missed"
+    admin action.
+
+    Choices of `reason_missed` are those of the visit model's
+    `reason_missed` field.
+    """
+
+    reason_missed = forms.ChoiceField(label="Reason missed")
+
+    reason_missed_other = forms.CharField(
+        label='If "other", specify', max_length=25, required=False
+    )
+
+    def __init__(self, *args, model_cls=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        field = model_cls._meta.get_field("reason_missed")
+        if field.choices:
+            self.fields["reason_missed"].choices = [
+                (value, label)
+                for value, label in field.flatchoices
+                if value != NOT_APPLICABLE
+            ]
+        else:
+            self.fields["reason_missed"] = forms.CharField(
+                label="Reason missed", max_length=field.max_length
+            )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        reason_missed = cleaned_data.get("reason_missed")
+        reason_missed_other = cleaned_data.get("reason_missed_other")
+        if reason_missed == OTHER and not reason_missed_other:
+            self.add_error("reason_missed_other", "This field is required.")
+        elif reason_missed != OTHER and reason_missed_other:
+            self.add_error("reason_missed_other", "This field is not required.")
+        return cleaned_data
@@ -0,0 +1,127 @@
+import threading
+
+from contextlib import contextmanager
+from django.db import models
+
+_local = threading.local()
+
+
+class IdentityMap:
+
+    """A map of model instances fetched during a request or
+    transaction, keyed by model and lookup.
+
+    Only found instances are kept. All instances of a model are
+    evicted when any instance of that model is saved or deleted,
+    see signals.py.
+    """
+
+    def __init__(self):
+        self._objects = {}
+
+    def get_key(self, model_cls, **lookup):
+        return (
+            model_cls._meta.label_lower,
+            tuple(
+                sorted(
+                    (k, v.pk if isinstance(v, models.Model) else v)
+                    for k, v in lookup.items()
+                )
+            ),
+        )
+
+    def get(self, model_cls, manager=None, **lookup):
+        """Returns the instance from the map or, if not in the
+        map, from `manager` or the model's `objects` manager.
+        """
+        key = self.get_key(model_cls, **lookup)
+        try:
+            obj = self._objects[key]
+        except KeyError:
+            obj = (manager or model_cls.objects).get(**lookup)
+            self._objects.update({key: obj})
+            self.add(obj)
+        return obj
+
+    def add(self, obj):
+        """Adds an instance to the map keyed by its pk.
+        """
+        if obj is not None and obj.pk is not None:
+            self._objects.update({self.get_key(obj.__class__, pk=obj.pk): obj})
+
+    def evict(self, model_cls):
+        """Removes all instances of `model_cls` from the map.
+        """
+        label_lower = model_cls._meta.label_lower
+        for key in [k for k in self._objects if k[0] == label_lower]:
+            del self._objects[key]
+
+    def clear(self):
+        self._objects = {}
+
+
+def get_identity_map():
+    """Returns the active identity map or None.
+    """
+    return getattr(_local, "identity_map", None)
+
+
+@contextmanager
+def identity_map():
+    """A context manager that activates an identity map for the
+    current thread. Nested blocks share the outer map.
+    """
+    previous = get_identity_map()
+    _local.identity_map = previous or IdentityMap()
+    try:
+        yield _local.identity_map
+    finally:
+        _local.identity_map = previous
+
+
+def get_object(model_cls, manager=None, **lookup):
+    """Returns `manager.get(**lookup)` through the active
+    identity map, if any.
+
+    `manager` defaults to `model_cls.objects`.
+    """
+    active = get_identity_map()
+    if active is None:
+        return (manager or model_cls.objects).get(**lookup)
+    return active.get(model_cls, manager=manager, **lookup)
+
+
+def add_object(obj):
+    """Adds an instance to the active identity map, if any.
+    """
+    active = get_identity_map()
+    if active is not None:
+        active.add(obj)
+
+
+def evict_objects(model_cls):
+    """Evicts all instances of `model_cls` from the active
+    identity map, if any.
+
+    Call after writes that send no signals, e.g. `update()` or
+    `bulk_update()`.
+    """
+    active = get_identity_map()
+    if active is not None:
+        active.evict(model_cls)
+
+
+class IdentityMapMiddleware:
+
+    """Activates an identity map for the duration of a request.
+
+    Add "edc_visit_tracking.identity_map.IdentityMapMiddleware"
+    to settings.MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with identity_map():
+            return self.get_response(request)
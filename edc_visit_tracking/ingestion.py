@@ -0,0 +1,287 @@
+import time
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import DatabaseError, close_old_connections
+from django.forms.models import model_to_dict
+from django.utils import timezone
+from itertools import islice
+
+from .crf_date_validator import (
+    CrfDateValidator,
+    CrfReportDateAllowanceError,
+    CrfReportDateBeforeStudyStart,
+    CrfReportDateIsFuture,
+)
+from .managers import NATURAL_KEY_FIELDS, UpsertError, get_natural_key
+
+NON_FIELD_ERRORS = "__all__"
+
+IngestionError = namedtuple("IngestionError", "index natural_key errors")
+
+
+class IngestionReport:
+
+    """The counts, per-record errors and throughput of an
+    ingestion run.
+    """
+
+    def __init__(self):
+        self.records = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []
+        self.seconds = 0.0
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(records={self.records}, "
+            f"errors={len(self.errors)})"
+        )
+
+    @property
+    def records_per_second(self):
+        return self.records / self.seconds if self.seconds else 0.0
+
+
+class CrfIngestionPipeline:
+
+    """Validates and writes CRF records in batches.
+
+    Records are dicts of field values with the visit natural key
+    under "visit", e.g.:
+
+        {"visit": ["12345", "visit_schedule1", "schedule1", "1000", 0],
+         "report_datetime": ..., "f1": ...}
+
+    Each batch goes through the stages:
+        1. parse the visit natural key and convert the values with
+           the model fields' `to_python`, e.g. ISO datetime strings;
+        2. resolve the visits and existing CRFs in one query each;
+        3. validate the report date with `CrfDateValidator`;
+        4. validate `form_cls`, if given, in a pool of `workers`
+           threads, one chunk of the batch per thread. Each thread
+           uses its own DB connection;
+        5. write the valid records with `upsert_many`, which saves
+           each new or changed CRF, so edc_metadata is updated.
+
+    Since the pool threads do not share the caller's DB connection,
+    form validation cannot see rows written in an open transaction
+    of the caller, e.g. in `transaction.atomic()` or a TestCase.
+    Commit such rows before ingesting or do not pass `form_cls`.
+
+    Records are read from the iterable one batch at a time, so a
+    slow stage holds back the reader and at most `batch_size`
+    records are in memory. Errors are captured per record as
+    {field: [messages]}; invalid records are skipped. A later
+    record for the same visit in a batch replaces an earlier one.
+
+    For example:
+
+        pipeline = CrfIngestionPipeline(CrfOne, form_cls=CrfOneForm, workers=8)
+        report = pipeline.ingest(records)
+        report.errors, report.records_per_second
+    """
+
+    batch_size = 500
+    workers = 4
+
+    def __init__(self, model_cls, form_cls=None, workers=None, batch_size=None):
+        self.model_cls = model_cls
+        self.form_cls = form_cls
+        self.workers = workers or self.workers
+        self.batch_size = batch_size or self.batch_size
+        self.visit_model_attr = model_cls.visit_model_attr()
+        self.visit_attname = model_cls._meta.get_field(self.visit_model_attr).attname
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(model_cls={self.model_cls._meta.label_lower}, "
+            f"workers={self.workers})"
+        )
+
+    def ingest(self, records):
+        """Returns an `IngestionReport` after ingesting all records.
+        """
+        report = IngestionReport()
+        start = time.monotonic()
+        records = iter(records)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            index = 0
+            while True:
+                batch = list(islice(records, self.batch_size))
+                if not batch:
+                    break
+                self.ingest_batch(executor, index, batch, report)
+                index += len(batch)
+        report.records = index
+        report.seconds = time.monotonic() - start
+        return report
+
+    def ingest_batch(self, executor, index, batch, report):
+        rows = self.parse(index, batch, report)
+        visits, crfs = self.resolve(rows, report)
+        rows = [row for row in rows if self.validate_report_date(row, visits, report)]
+        if self.form_cls:
+            size = -(-len(rows) // self.workers) or 1
+            chunks = [rows[i : i + size] for i in range(0, len(rows), size)]
+            results = [
+                errors
+                for chunk_results in executor.map(
+                    lambda chunk: self.validate_forms(chunk, visits, crfs), chunks
+                )
+                for errors in chunk_results
+            ]
+            for row, errors in zip(rows, results):
+                if errors:
+                    report.errors.append(IngestionError(row[0], row[1], errors))
+            rows = [row for row, errors in zip(rows, results) if not errors]
+        self.write(rows, report)
+
+    def parse(self, index, batch, report):
+        """Returns a list of (index, natural_key, values).
+        """
+        rows = []
+        for i, record in enumerate(batch, start=index):
+            values = dict(record)
+            try:
+                natural_key = get_natural_key(values.pop("visit"))
+            except (KeyError, TypeError, ValueError, IndexError) as e:
+                report.errors.append(
+                    IngestionError(
+                        i, None, {NON_FIELD_ERRORS: [f"Invalid visit. Got {e}."]}
+                    )
+                )
+                continue
+            errors = self.to_python(values)
+            if errors:
+                report.errors.append(IngestionError(i, natural_key, errors))
+            else:
+                rows.append((i, natural_key, values))
+        return rows
+
+    def to_python(self, values):
+        """Converts `values` in place with the model fields'
+        `to_python` and returns a dict of errors, if any.
+
+        Naive datetimes are made aware in the current time zone,
+        as on save.
+        """
+        errors = {}
+        for name, value in values.items():
+            try:
+                field = self.model_cls._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            try:
+                value = field.to_python(value)
+            except ValidationError as e:
+                errors.update({name: e.messages})
+                continue
+            if isinstance(value, datetime) and settings.USE_TZ:
+                if timezone.is_naive(value):
+                    value = timezone.make_aware(value)
+            values[name] = value
+        return errors
+
+    def resolve(self, rows, report):
+        """Returns a tuple of dicts ({natural_key: visit values},
+        {natural_key: CRF instance}) for the batch and removes rows
+        without a visit.
+        """
+        visit_model_cls = self.model_cls.visit_model_cls()
+        visits = {
+            tuple(row[f] for f in NATURAL_KEY_FIELDS): row
+            for row in visit_model_cls.objects.filter(
+                subject_identifier__in=set(row[1][0] for row in rows)
+            )
+            .order_by()
+            .values(
+                "pk",
+                "report_datetime",
+                "appointment__facility_name",
+                *NATURAL_KEY_FIELDS,
+            )
+        }
+        for row in [row for row in rows if row[1] not in visits]:
+            rows.remove(row)
+            report.errors.append(
+                IngestionError(
+                    row[0], row[1], {self.visit_model_attr: ["Visit does not exist."]}
+                )
+            )
+        visit_keys = {visits[row[1]]["pk"]: row[1] for row in rows}
+        crfs = {
+            visit_keys[getattr(crf, self.visit_attname)]: crf
+            for crf in self.model_cls.objects.filter(
+                **{f"{self.visit_attname}__in": visit_keys}
+            )
+        }
+        return visits, crfs
+
+    def validate_report_date(self, row, visits, report):
+        index, natural_key, values = row
+        if not values.get("report_datetime"):
+            return True
+        visit = visits[natural_key]
+        try:
+            CrfDateValidator(
+                report_datetime=values.get("report_datetime"),
+                visit_report_datetime=visit["report_datetime"],
+                facility_name=visit["appointment__facility_name"],
+            )
+        except (
+            CrfReportDateAllowanceError,
+            CrfReportDateBeforeStudyStart,
+            CrfReportDateIsFuture,
+        ) as e:
+            report.errors.append(
+                IngestionError(index, natural_key, {"report_datetime": [str(e)]})
+            )
+            return False
+        return True
+
+    def validate_forms(self, rows, visits, crfs):
+        """Returns a list of form errors or None per row.
+
+        Runs in a pool thread and closes the thread's old DB
+        connections once done.
+        """
+        try:
+            return [self.validate_form(row, visits, crfs) for row in rows]
+        finally:
+            close_old_connections()
+
+    def validate_form(self, row, visits, crfs):
+        """Returns a dict of form errors or None.
+        """
+        _, natural_key, values = row
+        instance = crfs.get(natural_key)
+        data = model_to_dict(instance) if instance else {}
+        data.update(values)
+        data.update({self.visit_model_attr: visits[natural_key]["pk"]})
+        form = self.form_cls(data=data, instance=instance)
+        if not form.is_valid():
+            return {k: list(v) for k, v in form.errors.items()}
+        return None
+
+    def write(self, rows, report):
+        if not rows:
+            return
+        try:
+            result = self.model_cls.objects.upsert_many(
+                [(natural_key, values) for _, natural_key, values in rows]
+            )
+        except (DatabaseError, UpsertError) as e:
+            for index, natural_key, _ in rows:
+                report.errors.append(
+                    IngestionError(index, natural_key, {NON_FIELD_ERRORS: [str(e)]})
+                )
+        else:
+            report.created += result.created
+            report.updated += result.updated
+            report.unchanged += result.unchanged
@@ -0,0 +1,86 @@
+import csv
+
+from django.apps import apps as django_apps
+from django.core.management.base import BaseCommand, CommandError
+
+from ...audits import SITE, SUBJECT_HASH, AuditError, AuditFinding, AuditReport
+from ...model_mixins import VisitModelMixin
+from ...models import get_visit_tracking_model
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Audit visit sequence, visit reason and CRF report dates in parallel "
+        "shards and write the findings as CSV."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            dest="label_lower",
+            default=None,
+            help="Visit model, e.g. app_label.model_name. Default: SUBJECT_VISIT_MODEL",
+        )
+        parser.add_argument(
+            "--by",
+            dest="by",
+            choices=[SITE, SUBJECT_HASH],
+            default=SITE,
+            help="Shard subjects by site or by a hash of the subject identifier",
+        )
+        parser.add_argument(
+            "--shards",
+            dest="shards",
+            type=int,
+            default=None,
+            help="Number of hash shards. Default: number of CPUs",
+        )
+        parser.add_argument(
+            "--workers",
+            dest="workers",
+            type=int,
+            default=None,
+            help="Number of worker processes. Default: number of CPUs",
+        )
+        parser.add_argument(
+            "--output", dest="output", default="-", help="CSV file. Default: stdout"
+        )
+
+    def get_model(self, label_lower):
+        if not label_lower:
+            return get_visit_tracking_model()
+        try:
+            model_cls = django_apps.get_model(label_lower)
+        except (LookupError, ValueError) as e:
+            raise CommandError(e)
+        if not issubclass(model_cls, VisitModelMixin):
+            raise CommandError(f"Not a visit model. Got {label_lower}.")
+        return model_cls
+
+    def handle(self, *args, **options):
+        try:
+            report = AuditReport(
+                visit_model_cls=self.get_model(options.get("label_lower")),
+                by=options.get("by"),
+                shards=options.get("shards"),
+                workers=options.get("workers"),
+            )
+        except AuditError as e:
+            raise CommandError(e)
+        output = options.get("output")
+        f = self.stdout if output == "-" else open(output, "w", newline="")
+        try:
+            writer = csv.writer(f)
+            writer.writerow(AuditFinding._fields)
+            writer.writerows(report.findings)
+        finally:
+            if f is not self.stdout:
+                f.close()
+        counts = ", ".join(f"{k}={v}" for k, v in sorted(report.counts.items()))
+        self.stderr.write(
+            self.style.SUCCESS(
+                f"Audited {report.subjects} subjects in {len(report.shards)} shards. "
+                f"Found {len(report.findings)} problems. {counts}"
+            )
+        )
@@ -0,0 +1,56 @@
+from django.apps import apps as django_apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Compact the visit tracking change log. Keeps only the last "
+        "entry per model and natural key up to the given sequence."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sequence",
+            dest="sequence",
+            type=int,
+            default=None,
+            help=(
+                "Compact entries up to and including this sequence. Use the "
+                "lowest cursor of all consumers. (Default: the lowest export "
+                "watermark sequence)"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        change_log_model_cls = django_apps.get_model("edc_visit_tracking.changelog")
+        sequence = options.get("sequence")
+        if sequence is None:
+            sequence = self.get_lowest_watermark()
+            if sequence is None:
+                raise CommandError(
+                    "No export watermarks found. Specify --sequence as the "
+                    "lowest cursor of all consumers."
+                )
+        elif sequence < 0:
+            raise CommandError(f"Invalid sequence. Got {sequence}.")
+        deleted = change_log_model_cls.objects.compact(sequence)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {deleted} change log entries up to sequence {sequence}.\n"
+            )
+        )
+
+    @staticmethod
+    def get_lowest_watermark():
+        """Returns the lowest sequence of all export watermarks or
+        None, so that entries not yet read by any export consumer
+        are not compacted.
+        """
+        watermark_model_cls = django_apps.get_model(
+            "edc_visit_tracking.exportwatermark"
+        )
+        return watermark_model_cls.objects.aggregate(sequence=Min("sequence")).get(
+            "sequence"
+        )
@@ -0,0 +1,74 @@
+import os
+
+from django.apps import apps as django_apps
+from django.core.management.base import BaseCommand, CommandError
+
+from ...date_buckets import get_date_bucket_models
+from ...watermark_exports import WatermarkExporter, iter_ndjson
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Append visit and CRF rows changed since the consumer's last run, "
+        "and tombstones for deletes, as NDJSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--consumer", dest="consumer", required=True, help="Name of the consumer"
+        )
+        parser.add_argument(
+            "--model",
+            dest="label_lowers",
+            action="append",
+            default=None,
+            help="Export this visit or CRF model only. May be repeated.",
+        )
+        parser.add_argument(
+            "--output",
+            dest="output",
+            default="-",
+            help="File to append to. Default: stdout",
+        )
+        parser.add_argument("--batch-size", dest="batch_size", type=int, default=None)
+
+    def get_models(self, label_lowers):
+        models = get_date_bucket_models()
+        if not label_lowers:
+            return models
+        selected = []
+        for label_lower in label_lowers:
+            try:
+                model_cls = django_apps.get_model(label_lower)
+            except (LookupError, ValueError) as e:
+                raise CommandError(e)
+            if model_cls not in models:
+                raise CommandError(f"Not a visit or CRF model. Got {label_lower}.")
+            selected.append(model_cls)
+        return selected
+
+    def handle(self, *args, **options):
+        models = self.get_models(options.get("label_lowers"))
+        output = options.get("output")
+        f = self.stdout if output == "-" else open(output, "a")
+        exported = 0
+        try:
+            for model_cls in models:
+                exporter = WatermarkExporter(
+                    options.get("consumer"),
+                    model_cls,
+                    batch_size=options.get("batch_size"),
+                )
+                for batch in exporter:
+                    for line in iter_ndjson(batch):
+                        f.write(line)
+                    # written before the watermark moves on
+                    f.flush()
+                    if f is not self.stdout:
+                        os.fsync(f.fileno())
+                    exported += len(batch.rows) + len(batch.tombstones)
+        finally:
+            if f is not self.stdout:
+                f.close()
+        self.stderr.write(self.style.SUCCESS(f"Exported {exported} changes."))
@@ -0,0 +1,53 @@
+from django.apps import apps as django_apps
+from django.core.management.base import BaseCommand, CommandError
+
+from ...model_mixins import VisitModelMixin
+from ...models import get_visit_tracking_model
+from ...snapshots import SnapshotError, write_visit_snapshot
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Write a columnar, memory-mappable snapshot of visits to a directory, "
+        "see snapshots.load_visit_snapshot."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Directory to create for the snapshot")
+        parser.add_argument(
+            "--model",
+            dest="label_lower",
+            default=None,
+            help="Visit model, e.g. app_label.model_name. Default: SUBJECT_VISIT_MODEL",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            dest="chunk_size",
+            type=int,
+            default=10000,
+            help="Rows fetched per database round trip",
+        )
+
+    def handle(self, *args, **options):
+        label_lower = options.get("label_lower")
+        if label_lower:
+            try:
+                model_cls = django_apps.get_model(label_lower)
+            except (LookupError, ValueError) as e:
+                raise CommandError(e)
+            if not issubclass(model_cls, VisitModelMixin):
+                raise CommandError(f"Not a visit model. Got {label_lower}.")
+        else:
+            model_cls = get_visit_tracking_model()
+        try:
+            written = write_visit_snapshot(
+                options.get("path"),
+                model_cls._default_manager.all(),
+                chunk_size=options.get("chunk_size"),
+            )
+        except SnapshotError as e:
+            raise CommandError(e)
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {written} visits to {options.get('path')}.\n")
+        )
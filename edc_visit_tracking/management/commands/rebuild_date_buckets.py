@@ -0,0 +1,30 @@
+from django.apps import apps as django_apps
+from django.core.management.base import BaseCommand, CommandError
+
+from ...date_buckets import get_date_bucket_models, rebuild_date_buckets
+
+
+class Command(BaseCommand):
+
+    help = "Rebuild the per-day visit and CRF counts used by the admin date hierarchy."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            dest="label_lower",
+            default=None,
+            help="Rebuild for this visit or CRF model only, e.g. app_label.model_name",
+        )
+
+    def handle(self, *args, **options):
+        model_cls = None
+        label_lower = options.get("label_lower")
+        if label_lower:
+            try:
+                model_cls = django_apps.get_model(label_lower)
+            except (LookupError, ValueError) as e:
+                raise CommandError(e)
+            if model_cls not in get_date_bucket_models():
+                raise CommandError(f"Not a visit or CRF model. Got {label_lower}.")
+        created = rebuild_date_buckets(model_cls=model_cls)
+        self.stdout.write(self.style.SUCCESS(f"Created {created} date buckets.\n"))
@@ -0,0 +1,30 @@
+from django.apps import apps as django_apps
+from django.core.management.base import BaseCommand, CommandError
+
+from ...visit_rollups import get_visit_rollup_models, rebuild_visit_rollups
+
+
+class Command(BaseCommand):
+
+    help = "Rebuild the monthly visit reason and survival status counts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            dest="label_lower",
+            default=None,
+            help="Rebuild for this visit model only, e.g. app_label.model_name",
+        )
+
+    def handle(self, *args, **options):
+        model_cls = None
+        label_lower = options.get("label_lower")
+        if label_lower:
+            try:
+                model_cls = django_apps.get_model(label_lower)
+            except (LookupError, ValueError) as e:
+                raise CommandError(e)
+            if model_cls not in get_visit_rollup_models():
+                raise CommandError(f"Not a visit model. Got {label_lower}.")
+        created = rebuild_visit_rollups(model_cls=model_cls)
+        self.stdout.write(self.style.SUCCESS(f"Created {created} visit rollups.\n"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ...vital_status import rebuild_vital_status
+
+
+class Command(BaseCommand):
+
+    help = "Rebuild the per-subject survival status and last known alive date."
+
+    def handle(self, *args, **options):
+        created = rebuild_vital_status()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt vital status for {created} subjects.\n")
+        )
@@ -0,0 +1,33 @@
+from django.apps import apps as django_apps
+from django.core.management.base import BaseCommand, CommandError
+
+from ...crf_counts import reconcile_visit_crf_counts
+from ...model_mixins import VisitModelMixin
+
+
+class Command(BaseCommand):
+
+    help = "Repair the per-visit CRF and requisition counts from the CRF tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            dest="label_lower",
+            default=None,
+            help="Visit model, e.g. app_label.model_name. Default: all visit models",
+        )
+
+    def handle(self, *args, **options):
+        model_cls = None
+        label_lower = options.get("label_lower")
+        if label_lower:
+            try:
+                model_cls = django_apps.get_model(label_lower)
+            except (LookupError, ValueError) as e:
+                raise CommandError(e)
+            if not issubclass(model_cls, VisitModelMixin):
+                raise CommandError(f"Not a visit model. Got {label_lower}.")
+        repaired = reconcile_visit_crf_counts(model_cls)
+        self.stdout.write(
+            self.style.SUCCESS(f"Repaired {repaired} visit CRF counts.\n")
+        )
@@ -1,8 +1,144 @@
-from django.db import models
+import json
+
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+from django.core.exceptions import FieldDoesNotExist
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import Max, Q, Sum
 from django.contrib.sites.managers import CurrentSiteManager as BaseCurrentSiteManager
+from django.contrib.sites.models import Site
+from edc_constants.constants import YES, NO
+from edc_utils import get_utcnow
+
+from .constants import MISSED_VISIT
+from .identity_map import get_object
+from .utils import get_row_hash, get_related_visit
+
+NATURAL_KEY_FIELDS = [
+    "subject_identifier",
+    "visit_schedule_name",
+    "schedule_name",
+    "visit_code",
+    "visit_code_sequence",
+]
+
+UpsertResult = namedtuple("UpsertResult", "created updated unchanged")
+
+
+class UpsertError(Exception):
+    pass
+
+
+def get_batch(batch):
+    """Returns a dict of {natural_key: values} from a dict or
+    an iterable of (natural_key, values) pairs.
+    """
+    items = batch.items() if hasattr(batch, "items") else batch
+    return {get_natural_key(k): dict(v) for k, v in items}
+
+
+def get_natural_key(key):
+    """Returns a visit natural key as a hashable tuple.
+
+    Accepts lists (e.g. from JSON) and a string visit_code_sequence.
+    """
+    key = tuple(key)
+    return key[:4] + (int(key[4]),)
+
+
+class UpsertManagerMixin:
+    """Shared batch upsert logic for the visit and CRF managers.
+
+    Rows are fetched in one query and compared by hash; unchanged
+    rows are not written. New and changed rows are saved with
+    `save()`, so the model's rules and signals apply as for a
+    form, e.g. the visit sequence, the appointment status,
+    edc_metadata and the derived tables.
+
+    A new row that conflicts with a row inserted by another
+    writer since the batch was read is skipped and not counted
+    as created.
+    """
+
+    def _upsert(self, batch, existing, build):
+        """Writes `batch`, a dict of {natural_key: values}.
+
+        `existing` is a dict of {natural_key: values dict incl. pk}.
+        `build` returns an unsaved instance for a new natural key.
+        """
+        new_objs = []
+        changed = {}
+        unchanged = 0
+        for natural_key, values in batch.items():
+            row = existing.get(natural_key)
+            if row is None:
+                new_objs.append(build(natural_key, values))
+            elif get_row_hash(self.model, values) == get_row_hash(
+                self.model, {k: row[k] for k in values}
+            ):
+                unchanged += 1
+            else:
+                changed.update({row["pk"]: values})
+        created = 0
+        if new_objs or changed:
+            created = self._write(new_objs, changed)
+        return UpsertResult(created, len(changed), unchanged)
+
+    def _write(self, new_objs, changed):
+        """Saves the new instances and the changed rows, a dict of
+        {pk: values}, in order.
+
+        Returns the number of rows inserted.
+        """
+        using = router.db_for_write(self.model)
+        created = 0
+        with transaction.atomic(using=using):
+            for obj in new_objs:
+                created += self._insert(obj, using)
+            for obj in (
+                self.using(using)
+                .filter(pk__in=changed)
+                .order_by(*self.get_upsert_ordering())
+            ):
+                for field, value in changed[obj.pk].items():
+                    setattr(obj, field, value)
+                obj.save(using=using)
+        return created
 
+    def _insert(self, obj, using):
+        """Saves a new instance and returns 1, or 0 if another
+        writer inserted the row first.
+        """
+        try:
+            with transaction.atomic(using=using):
+                obj.save(using=using, force_insert=True)
+        except IntegrityError:
+            if not self.using(using).filter(**self.get_unique_lookup(obj)).exists():
+                raise
+            return 0
+        return 1
 
-class CrfModelManager(models.Manager):
+    def get_upsert_ordering(self):
+        """Returns the ordering in which changed rows are saved.
+        """
+        return ["pk"]
+
+    def get_unique_lookup(self, obj):
+        """Returns the lookup of the row an insert of `obj` would
+        conflict with.
+        """
+        raise NotImplementedError
+
+    def _has_field(self, name):
+        try:
+            self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return False
+        return True
+
+
+class CrfModelManager(UpsertManagerMixin, models.Manager):
     """A manager class for Crf models, models that have an FK to
     the visit model.
     """
@@ -24,12 +160,142 @@ class CrfModelManager(models.Manager):
             visit_code,
             visit_code_sequence,
         )
-        return self.get(**{self.model.visit_model_attr(): instance})
+        return get_object(
+            self.model, manager=self, **{self.model.visit_model_attr(): instance}
+        )
 
+    def upsert_many(self, batch):
+        """Creates or updates CRF instances from a batch of
+        {visit natural_key: {field: value, ...}}.
 
-class VisitModelManager(models.Manager):
-    """A manager class for visit models.
-    """
+        The visit of each natural key must exist. Unchanged rows
+        are skipped, see `UpsertManagerMixin`.
+
+        Returns an `UpsertResult`.
+        """
+        batch = get_batch(batch)
+        if not batch:
+            return UpsertResult(0, 0, 0)
+        visit_model_cls = self.model.visit_model_cls()
+        visits = {
+            tuple(row[f] for f in NATURAL_KEY_FIELDS): row["pk"]
+            for row in visit_model_cls.objects.filter(
+                subject_identifier__in=set(k[0] for k in batch)
+            )
+            .order_by()
+            .values("pk", *NATURAL_KEY_FIELDS)
+        }
+        missing = [k for k in batch if k not in visits]
+        if missing:
+            raise UpsertError(
+                f"Visit does not exist. Cannot upsert {self.model._meta.label_lower}. "
+                f"Got {missing}."
+            )
+        attname = self.model._meta.get_field(self.model.visit_model_attr()).attname
+        visit_keys = {visits[k]: k for k in batch}
+        fields = set(f for values in batch.values() for f in values)
+        existing = {
+            visit_keys[row[attname]]: row
+            for row in self.filter(**{f"{attname}__in": visit_keys})
+            .order_by()
+            .values("pk", attname, *fields)
+        }
+        return self._upsert(
+            batch,
+            existing,
+            lambda k, values: self.model(**{attname: visits[k]}, **values),
+        )
+
+    def get_upsert_ordering(self):
+        attr = self.model.visit_model_attr()
+        return [f"{attr}__appointment__timepoint", f"{attr}__visit_code_sequence"]
+
+    def get_unique_lookup(self, obj):
+        attname = self.model._meta.get_field(self.model.visit_model_attr()).attname
+        return {attname: getattr(obj, attname)}
+
+    def previous_instance(self, crf):
+        """Returns the instance of this CRF model at the subject's
+        previous visit in the same schedule or None.
+
+        "Previous" is by appointment timepoint then visit code
+        sequence.
+        """
+        attr = self.model.visit_model_attr()
+        visit = getattr(crf, attr)
+        timepoint = visit.appointment.timepoint
+        return (
+            self.filter(
+                **{
+                    f"{attr}__subject_identifier": visit.subject_identifier,
+                    f"{attr}__visit_schedule_name": visit.visit_schedule_name,
+                    f"{attr}__schedule_name": visit.schedule_name,
+                }
+            )
+            .filter(
+                Q(**{f"{attr}__appointment__timepoint__lt": timepoint})
+                | Q(
+                    **{
+                        f"{attr}__appointment__timepoint": timepoint,
+                        f"{attr}__visit_code_sequence__lt": visit.visit_code_sequence,
+                    }
+                )
+            )
+            .order_by(
+                f"-{attr}__appointment__timepoint", f"-{attr}__visit_code_sequence"
+            )
+            .first()
+        )
+
+    def previous_instances(self, crfs):
+        """Returns a dict of {crf.pk: previous instance or None}
+        for an iterable or queryset of instances of this CRF model.
+
+        Candidates for all subjects are fetched in one query.
+        """
+        attr = self.model.visit_model_attr()
+        if isinstance(crfs, models.QuerySet):
+            crfs = crfs.select_related(f"{attr}__appointment")
+        crfs = list(crfs)
+        timelines = {}
+        for instance in (
+            self.filter(
+                **{
+                    f"{attr}__subject_identifier__in": set(
+                        getattr(crf, attr).subject_identifier for crf in crfs
+                    )
+                }
+            )
+            .select_related(f"{attr}__appointment")
+            .order_by(f"{attr}__appointment__timepoint", f"{attr}__visit_code_sequence")
+        ):
+            keys, instances = timelines.setdefault(
+                self._get_timeline_key(instance), ([], [])
+            )
+            keys.append(self._get_timepoint_key(instance))
+            instances.append(instance)
+        previous_instances = {}
+        for crf in crfs:
+            keys, instances = timelines.get(self._get_timeline_key(crf), ([], []))
+            index = bisect_left(keys, self._get_timepoint_key(crf))
+            previous_instances.update({crf.pk: instances[index - 1] if index else None})
+        return previous_instances
+
+    def _get_timeline_key(self, crf):
+        visit = getattr(crf, self.model.visit_model_attr())
+        return (
+            visit.subject_identifier,
+            visit.visit_schedule_name,
+            visit.schedule_name,
+        )
+
+    def _get_timepoint_key(self, crf):
+        visit = getattr(crf, self.model.visit_model_attr())
+        return (visit.appointment.timepoint, visit.visit_code_sequence)
+
+
+class VisitModelManager(UpsertManagerMixin, models.Manager):
+    """A manager class for visit models."""
 
     def get_by_natural_key(
         self,
@@ -39,7 +305,9 @@ class VisitModelManager(models.Manager):
         visit_code,
         visit_code_sequence,
     ):
-        return self.get(
+        return get_object(
+            self.model,
+            manager=self,
             subject_identifier=subject_identifier,
             visit_schedule_name=visit_schedule_name,
             schedule_name=schedule_name,
@@ -47,6 +315,267 @@ class VisitModelManager(models.Manager):
             visit_code_sequence=visit_code_sequence,
         )
 
+    def upsert_many(self, batch):
+        """Creates or updates visit instances from a batch of
+        {natural_key: {field: value, ...}}.
+
+        New visits are linked to the appointment with the same
+        natural key and, if the visit model has a `site`, to the
+        appointment's site. They are saved in timepoint order so
+        that the visit sequence is enforced as for a form.
+        Unchanged rows are skipped, see `UpsertManagerMixin`.
+
+        Returns an `UpsertResult`.
+        """
+        batch = get_batch(batch)
+        if not batch:
+            return UpsertResult(0, 0, 0)
+        for values in batch.values():
+            if "reason" in values:
+                values.update(
+                    require_crfs=NO if values["reason"] == MISSED_VISIT else YES
+                )
+        subject_identifiers = set(k[0] for k in batch)
+        fields = set(f for values in batch.values() for f in values)
+        existing = {
+            tuple(row[f] for f in NATURAL_KEY_FIELDS): row
+            for row in self.filter(subject_identifier__in=subject_identifiers)
+            .order_by()
+            .values("pk", *(set(NATURAL_KEY_FIELDS) | fields))
+        }
+        new_keys = [k for k in batch if k not in existing]
+        appointments = {}
+        if new_keys:
+            appointment_model_cls = self.model._meta.get_field(
+                "appointment"
+            ).related_model
+            appointments = {
+                tuple(row[f] for f in NATURAL_KEY_FIELDS): row
+                for row in appointment_model_cls.objects.filter(
+                    subject_identifier__in=set(k[0] for k in new_keys)
+                )
+                .order_by()
+                .values("pk", "site_id", "timepoint", *NATURAL_KEY_FIELDS)
+            }
+            missing = [k for k in new_keys if k not in appointments]
+            if missing:
+                raise UpsertError(
+                    f"Appointment does not exist. Cannot upsert "
+                    f"{self.model._meta.label_lower}. Got {missing}."
+                )
+
+        has_site = self._has_field("site")
+
+        def build(natural_key, values):
+            appointment = appointments[natural_key]
+            obj = self.model(
+                appointment_id=appointment["pk"],
+                **dict(zip(NATURAL_KEY_FIELDS, natural_key)),
+                **values,
+            )
+            if has_site and not obj.site_id:
+                # as SiteModelMixin.save
+                obj.site_id = appointment["site_id"] or Site.objects.get_current().id
+            return obj
+
+        # new visits in sequence order; changed visits are saved after
+        batch = OrderedDict(
+            sorted(
+                batch.items(),
+                key=lambda item: (
+                    item[0] in existing,
+                    appointments.get(item[0], {}).get("timepoint") or 0,
+                    item[0][4],
+                ),
+            )
+        )
+        return self._upsert(batch, existing, build)
+
+    def get_upsert_ordering(self):
+        return ["appointment__timepoint", "visit_code_sequence"]
+
+    def get_unique_lookup(self, obj):
+        return {"appointment_id": obj.appointment_id}
+
 
 class CurrentSiteManager(BaseCurrentSiteManager, CrfModelManager):
     pass
+
+
+class ChangeLogManager(models.Manager):
+    """A manager class for the visit tracking change log.
+    """
+
+    def log_change(self, instance, operation):
+        """Appends a change log entry for a visit or CRF instance.
+        """
+        return self.create(**self.get_change_values(instance, operation))
+
+    def log_changes(self, instances, operation):
+        """Appends change log entries for visit or CRF instances,
+        in order, with one batch INSERT.
+        """
+        self.bulk_create(
+            [
+                self.model(**self.get_change_values(instance, operation))
+                for instance in instances
+            ]
+        )
+
+    def get_change_values(self, instance, operation):
+        return dict(
+            label_lower=instance._meta.label_lower,
+            natural_key=json.dumps(instance.natural_key()),
+            subject_identifier=get_related_visit(instance).subject_identifier,
+            object_pk=str(instance.pk),
+            operation=operation,
+        )
+
+    # how long a gap in the sequence may be an open transaction
+    gap_timeout = timedelta(minutes=10)
+
+    # entries deleted per DELETE when compacting
+    compact_chunk_size = 500
+
+    def get_safe_sequence(self, cursor=None, limit=None, gap_timeout=None):
+        """Returns the sequence up to which entries after `cursor`
+        can be read without skipping an entry yet to be committed.
+
+        Sequences are assigned on insert, not on commit, so a gap
+        is an open or a rolled back transaction. The safe sequence
+        stops before the first gap unless the entry after the gap
+        is older than `gap_timeout`, then the gap is taken as
+        rolled back. `gap_timeout` must exceed the longest
+        transaction that writes visits or CRFs.
+
+        A consumer without a cursor starts at the first entry.
+        """
+        gap_timeout = self.gap_timeout if gap_timeout is None else gap_timeout
+        settled = get_utcnow() - gap_timeout
+        safe_sequence = cursor or 0
+        started = bool(cursor)
+        for sequence, timestamp in (
+            self.filter(sequence__gt=safe_sequence)
+            .order_by("sequence")
+            .values_list("sequence", "timestamp")[: limit or 1000]
+        ):
+            if started and sequence != safe_sequence + 1 and timestamp > settled:
+                break
+            started, safe_sequence = True, sequence
+        return safe_sequence
+
+    def read(self, cursor=None, limit=None, label_lowers=None, gap_timeout=None):
+        """Returns a tuple of (entries, next cursor) of at most
+        `limit` entries with a sequence greater than `cursor`.
+
+        Pass the returned cursor to the next call to read
+        only the changes since. Entries after a gap that may still
+        be filled are left for a later call, see
+        `get_safe_sequence`.
+        """
+        cursor = cursor or 0
+        limit = limit or 1000
+        safe_sequence = self.get_safe_sequence(
+            cursor, limit=limit, gap_timeout=gap_timeout
+        )
+        qs = self.filter(sequence__gt=cursor, sequence__lte=safe_sequence)
+        if label_lowers:
+            qs = qs.filter(label_lower__in=label_lowers)
+        entries = list(qs.order_by("sequence")[:limit])
+        if len(entries) == limit:
+            return entries, entries[-1].sequence
+        return entries, safe_sequence
+
+    def compact(self, cursor):
+        """Deletes all but the last entry per model and natural
+        key for entries with a sequence up to `cursor`.
+
+        The sequences to keep are read before the DELETE since
+        MySQL cannot delete from a table it reads in a subquery.
+
+        Returns the number of entries deleted.
+        """
+        qs = self.filter(sequence__lte=cursor)
+        keep = set(
+            qs.order_by()
+            .values("label_lower", "natural_key")
+            .annotate(last_sequence=Max("sequence"))
+            .values_list("last_sequence", flat=True)
+        )
+        sequences = [
+            sequence
+            for sequence in qs.order_by("sequence").values_list("sequence", flat=True)
+            if sequence not in keep
+        ]
+        deleted = 0
+        for index in range(0, len(sequences), self.compact_chunk_size):
+            count, _ = self.filter(
+                sequence__in=sequences[index : index + self.compact_chunk_size]
+            ).delete()
+            deleted += count
+        return deleted
+
+
+class VisitRollupManager(models.Manager):
+    """A manager class for the visit reason and survival status
+    rollup.
+    """
+
+    def totals(self, *fields, **lookups):
+        """Returns a queryset of dicts of `fields` and their
+        `total` for rollups matching `lookups`.
+
+        For example, visits per reason by month for a site:
+
+            VisitRollup.objects.totals("year", "month", "reason", site_id=10)
+        """
+        fields = fields or ("reason",)
+        return (
+            self.filter(**lookups)
+            .order_by()
+            .values(*fields)
+            .annotate(total=Sum("count"))
+            .order_by(*fields)
+        )
+
+
+class SubjectVitalStatusManager(models.Manager):
+    """A manager class for the per-subject vital status.
+    """
+
+    def get_many(self, subject_identifiers, visit_model_cls=None):
+        """Returns a dict of {subject_identifier: instance} for
+        the given subjects in one query.
+
+        `visit_model_cls` defaults to the SUBJECT_VISIT_MODEL.
+        """
+        from .models import get_visit_tracking_model
+
+        visit_model_cls = visit_model_cls or get_visit_tracking_model()
+        return {
+            obj.subject_identifier: obj
+            for obj in self.filter(
+                label_lower=visit_model_cls._meta.label_lower,
+                subject_identifier__in=subject_identifiers,
+            )
+        }
+
+
+class VisitCrfCountManager(models.Manager):
+    """A manager class for the per-visit CRF counts.
+    """
+
+    def get_many(self, visits):
+        """Returns a dict of {visit pk: instance} for a list of
+        visits of one visit model in one query.
+        """
+        visits = list(visits)
+        if not visits:
+            return {}
+        pks = {str(visit.pk): visit.pk for visit in visits}
+        return {
+            pks[obj.visit_pk]: obj
+            for obj in self.filter(
+                label_lower=visits[0]._meta.label_lower, visit_pk__in=pks
+            )
+        }
@@ -0,0 +1,83 @@
+# Generated by Django 2.2 on 2026-10-19 09:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("sites", "0002_alter_domain_unique"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TimelineDigest",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("label_lower", models.CharField(max_length=150)),
+                ("natural_key", models.CharField(max_length=250)),
+                ("subject_identifier", models.CharField(max_length=50)),
+                ("digest", models.CharField(max_length=64)),
+                (
+                    "site",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        to="sites.Site",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SubjectDigest",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("subject_identifier", models.CharField(max_length=50, unique=True)),
+                ("digest", models.CharField(max_length=64)),
+                (
+                    "site",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        to="sites.Site",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="timelinedigest",
+            index=models.Index(
+                fields=["subject_identifier", "label_lower"],
+                name="edc_visit_t_subject_03e2bd_idx",
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="timelinedigest", unique_together={("label_lower", "natural_key")},
+        ),
+        migrations.AddIndex(
+            model_name="subjectdigest",
+            index=models.Index(
+                fields=["site", "subject_identifier"],
+                name="edc_visit_t_site_id_2b30fe_idx",
+            ),
+        ),
+    ]
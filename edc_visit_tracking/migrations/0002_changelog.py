@@ -0,0 +1,43 @@
+# Generated by Django 2.2 on 2026-10-19 09:18
+
+from django.db import migrations, models
+import edc_utils.date
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("edc_visit_tracking", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeLog",
+            fields=[
+                ("sequence", models.BigAutoField(primary_key=True, serialize=False)),
+                ("label_lower", models.CharField(max_length=150)),
+                ("natural_key", models.CharField(max_length=250)),
+                ("subject_identifier", models.CharField(max_length=50)),
+                ("object_pk", models.CharField(max_length=36)),
+                (
+                    "operation",
+                    models.CharField(
+                        choices=[
+                            ("created", "Created"),
+                            ("updated", "Updated"),
+                            ("deleted", "Deleted"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("timestamp", models.DateTimeField(default=edc_utils.date.get_utcnow)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="changelog",
+            index=models.Index(
+                fields=["label_lower", "sequence"],
+                name="edc_visit_t_label_l_f5444f_idx",
+            ),
+        ),
+    ]
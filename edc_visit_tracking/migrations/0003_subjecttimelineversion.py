@@ -0,0 +1,31 @@
+# Generated by Django 2.2 on 2026-10-19 09:18
+
+from django.db import migrations, models
+import edc_utils.date
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("edc_visit_tracking", "0002_changelog"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SubjectTimelineVersion",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("subject_identifier", models.CharField(max_length=50, unique=True)),
+                ("version", models.PositiveIntegerField(default=0)),
+                ("modified", models.DateTimeField(default=edc_utils.date.get_utcnow)),
+            ],
+        ),
+    ]
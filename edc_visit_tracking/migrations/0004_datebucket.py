@@ -0,0 +1,55 @@
+# Generated by Django 2.2 on 2026-10-19 09:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("edc_visit_tracking", "0003_subjecttimelineversion"),
+        ("sites", "0002_alter_domain_unique"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DateBucket",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("label_lower", models.CharField(max_length=150)),
+                ("site_key", models.PositiveIntegerField(default=0)),
+                ("report_date", models.DateField()),
+                ("year", models.PositiveSmallIntegerField()),
+                ("month", models.PositiveSmallIntegerField()),
+                ("day", models.PositiveSmallIntegerField()),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "site",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        to="sites.Site",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="datebucket",
+            index=models.Index(
+                fields=["label_lower", "year", "month", "day"],
+                name="edc_visit_t_label_l_96467a_idx",
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="datebucket",
+            unique_together={("label_lower", "site_key", "report_date")},
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 2.2 on 2026-10-19 09:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("edc_visit_tracking", "0004_datebucket"),
+        ("sites", "0002_alter_domain_unique"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VisitRollup",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("label_lower", models.CharField(max_length=150)),
+                ("site_key", models.PositiveIntegerField(default=0)),
+                ("visit_schedule_name", models.CharField(max_length=25)),
+                ("schedule_name", models.CharField(max_length=25)),
+                ("year", models.PositiveSmallIntegerField()),
+                ("month", models.PositiveSmallIntegerField()),
+                ("reason", models.CharField(max_length=25)),
+                ("survival_status", models.CharField(default="", max_length=10)),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "site",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        to="sites.Site",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="visitrollup",
+            index=models.Index(
+                fields=["label_lower", "year", "month"],
+                name="edc_visit_t_label_l_0c2672_idx",
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="visitrollup",
+            unique_together={
+                (
+                    "label_lower",
+                    "site_key",
+                    "visit_schedule_name",
+                    "schedule_name",
+                    "year",
+                    "month",
+                    "reason",
+                    "survival_status",
+                )
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 2.2 on 2026-10-19 09:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+import edc_utils.date
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("edc_visit_tracking", "0005_visitrollup"),
+        ("sites", "0002_alter_domain_unique"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SubjectVitalStatus",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("label_lower", models.CharField(max_length=150)),
+                ("subject_identifier", models.CharField(max_length=50)),
+                ("survival_status", models.CharField(max_length=10, null=True)),
+                ("survival_status_datetime", models.DateTimeField(null=True)),
+                ("last_alive_date", models.DateField(null=True)),
+                ("modified", models.DateTimeField(default=edc_utils.date.get_utcnow)),
+                (
+                    "site",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        to="sites.Site",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="subjectvitalstatus",
+            index=models.Index(
+                fields=["site", "survival_status"],
+                name="edc_visit_t_site_id_55c59b_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="subjectvitalstatus",
+            index=models.Index(
+                fields=["last_alive_date"], name="edc_visit_t_last_al_962cd4_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="subjectvitalstatus",
+            unique_together={("label_lower", "subject_identifier")},
+        ),
+    ]
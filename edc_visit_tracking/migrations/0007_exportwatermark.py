@@ -0,0 +1,33 @@
+# Generated by Django 2.2 on 2026-10-19 09:18
+
+from django.db import migrations, models
+import edc_utils.date
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("edc_visit_tracking", "0006_subjectvitalstatus"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExportWatermark",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("consumer", models.CharField(max_length=50)),
+                ("label_lower", models.CharField(max_length=150)),
+                ("sequence", models.BigIntegerField(default=0)),
+                ("updated", models.DateTimeField(default=edc_utils.date.get_utcnow)),
+            ],
+            options={"unique_together": {("consumer", "label_lower")},},
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 2.2 on 2026-10-19 09:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("edc_visit_tracking", "0007_exportwatermark"),
+        ("sites", "0002_alter_domain_unique"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VisitCrfCount",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("label_lower", models.CharField(max_length=150)),
+                ("visit_pk", models.CharField(max_length=36)),
+                ("subject_identifier", models.CharField(max_length=50)),
+                ("crfs", models.IntegerField(default=0)),
+                ("requisitions", models.IntegerField(default=0)),
+                (
+                    "site",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        to="sites.Site",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="visitcrfcount",
+            index=models.Index(
+                fields=["subject_identifier"], name="edc_visit_t_subject_15c4fc_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="visitcrfcount", unique_together={("label_lower", "visit_pk")},
+        ),
+    ]
@@ -0,0 +1,133 @@
+from collections import namedtuple
+from django.apps import apps as django_apps
+from django.db import transaction
+from django.db.models import Q
+from edc_constants.constants import NO, OTHER
+from edc_metadata.constants import KEYED
+from edc_metadata.models import CrfMetadata, RequisitionMetadata
+from edc_utils import get_utcnow
+
+from .constants import MISSED_VISIT
+from .crf_registry import site_crfs
+from .derived_tables import get_stored_derived_keys, refresh_derived_tables
+from .identity_map import evict_objects
+
+METADATA_KEY_FIELDS = [
+    "subject_identifier",
+    "visit_schedule_name",
+    "schedule_name",
+    "visit_code",
+    "visit_code_sequence",
+]
+
+MarkMissedResult = namedtuple("MarkMissedResult", "updated unchanged errors")
+
+
+class MissedVisitError(Exception):
+    pass
+
+
+def get_metadata_key(obj):
+    return tuple(getattr(obj, f) for f in METADATA_KEY_FIELDS)
+
+
+def delete_metadata(visits):
+    """Deletes the CRF and requisition metadata of the visits,
+    as edc_metadata does when a visit is saved as missed.
+    """
+    q = Q()
+    for visit in visits:
+        q |= Q(**dict(zip(METADATA_KEY_FIELDS, get_metadata_key(visit))))
+    for metadata_model_cls in [CrfMetadata, RequisitionMetadata]:
+        metadata_model_cls.objects.filter(q).exclude(entry_status=KEYED).delete()
+
+
+def validate_missed_visits(visits):
+    """Returns a tuple of (valid visits, number unchanged, errors)."""
+    keyed = (
+        site_crfs.get_dependents(visits[0].__class__, [v.pk for v in visits])
+        if visits
+        else {}
+    )
+    errors = {}
+    valid = []
+    unchanged = 0
+    for visit in visits:
+        if visit.appointment.visit_code_sequence:
+            errors.update({visit.pk: "Invalid. This is an unscheduled visit"})
+        elif visit.pk in keyed:
+            errors.update({visit.pk: "Invalid. Some data has already been submitted"})
+        elif visit.reason == MISSED_VISIT:
+            unchanged += 1
+        else:
+            valid.append(visit)
+    return valid, unchanged, errors
+
+
+def update_visits_missed(visit_model_cls, visits, **values):
+    """Writes `values` to the visits and updates their metadata,
+    appointments and derived tables in one transaction.
+    """
+    appointment_model_cls = visit_model_cls._meta.get_field("appointment").related_model
+    appt_statuses = {}
+    for visit in visits:
+        appt_statuses.setdefault(visit.get_appt_status(reason=MISSED_VISIT), []).append(
+            visit.appointment_id
+        )
+    if "modified" in [f.name for f in visit_model_cls._meta.concrete_fields]:
+        values.update(modified=get_utcnow())
+    pks = [visit.pk for visit in visits]
+    with transaction.atomic():
+        stored_keys = get_stored_derived_keys(visit_model_cls, pks)
+        visit_model_cls.objects.filter(pk__in=pks).update(**values)
+        if MISSED_VISIT in django_apps.get_app_config("edc_metadata").delete_on_reasons:
+            delete_metadata(visits)
+        for appt_status, appointment_pks in appt_statuses.items():
+            appointment_model_cls.objects.filter(pk__in=appointment_pks).exclude(
+                appt_status=appt_status
+            ).update(appt_status=appt_status)
+        refresh_derived_tables(
+            visit_model_cls, stored_keys={pk: stored_keys.get(pk) for pk in pks}
+        )
+    evict_objects(visit_model_cls)
+    evict_objects(appointment_model_cls)
+
+
+def mark_visits_missed(queryset, reason_missed=None, reason_missed_other=None):
+    """Changes the visits in `queryset` to MISSED_VISIT in a fixed
+    number of queries plus those to refresh the enabled derived
+    tables, see `refresh_derived_tables`.
+
+    A visit is skipped, and its error returned, if it is an
+    unscheduled visit or if any CRF or requisition refers to it,
+    as in `VisitFormValidator`. For the others, `reason`,
+    `reason_missed` and `require_crfs` are updated, their non-KEYED
+    metadata is deleted, their appointment status is set as in
+    `post_save_check_appointment_in_progress` and the derived
+    tables, e.g. change log, timeline versions and visit rollups,
+    are refreshed as the post_save signal would.
+
+    Visits and appointments are updated with `update()`, so
+    `save()` is not called and no signals are sent.
+
+    Returns a `MarkMissedResult` where `errors` is a dict of
+    {pk: message}.
+    """
+    if not reason_missed:
+        raise MissedVisitError("Expected a reason missed. Got None.")
+    if reason_missed == OTHER and not reason_missed_other:
+        raise MissedVisitError("Expected reason missed other. Got None.")
+    visits = list(queryset.select_related("appointment"))
+    if not visits:
+        return MarkMissedResult(0, 0, {})
+    valid, unchanged, errors = validate_missed_visits(visits)
+    if valid:
+        update_visits_missed(
+            queryset.model,
+            valid,
+            reason=MISSED_VISIT,
+            reason_missed=reason_missed,
+            reason_missed_other=reason_missed_other,
+            require_crfs=NO,
+        )
+    return MarkMissedResult(len(valid), unchanged, errors)
@@ -1,5 +1,5 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from django.db.models.deletion import PROTECT
 from edc_model.validators import datetime_not_future
 from edc_protocol.validators import datetime_not_before_study_start
@@ -45,6 +45,16 @@ class CrfModelMixin(CrfVisitMethodsModelMixin, models.Model):
 
     natural_key.dependencies = [settings.SUBJECT_VISIT_MODEL]
 
+    def save(self, *args, **kwargs):
+        # atomic so that post_save writes, e.g. the change log,
+        # commit or roll back with the CRF
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get("using")):
+            return super().delete(*args, **kwargs)
+
     @property
     def subject_identifier(self):
         return self.subject_visit.subject_identifier
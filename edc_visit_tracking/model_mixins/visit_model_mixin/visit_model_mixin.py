@@ -1,10 +1,12 @@
-from django.db import models
+from django.apps import apps as django_apps
+from django.db import models, transaction
 from django.db.models.deletion import PROTECT
 from edc_appointment.constants import IN_PROGRESS_APPT, COMPLETE_APPT
 from edc_constants.constants import YES, NO
 from edc_identifier.model_mixins import NonUniqueSubjectIdentifierFieldMixin
 from edc_visit_schedule.model_mixins import VisitScheduleModelMixin
 
+from ...appointment_status import defer_appointment_status
 from ...constants import NO_FOLLOW_UP_REASONS, MISSED_VISIT
 from ...managers import VisitModelManager
 from ..previous_visit_model_mixin import PreviousVisitModelMixin
@@ -43,7 +45,14 @@ class VisitModelMixin(
         self.visit_code = self.appointment.visit_code
         self.visit_code_sequence = self.appointment.visit_code_sequence
         self.require_crfs = NO if self.reason == MISSED_VISIT else YES
-        super().save(*args, **kwargs)
+        # atomic so that post_save writes, e.g. the change log,
+        # commit or roll back with the visit
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get("using")):
+            return super().delete(*args, **kwargs)
 
     def natural_key(self):
         return (
@@ -69,15 +78,23 @@ class VisitModelMixin(
             dct.update({item: item})
         return dct
 
+    def get_appt_status(self, reason=None):
+        """Returns the appointment status implied by the visit
+        reason.
+        """
+        reason = reason or self.reason
+        if reason in self.get_visit_reason_no_follow_up_choices():
+            return COMPLETE_APPT
+        return IN_PROGRESS_APPT
+
     def post_save_check_appointment_in_progress(self):
-        if self.reason in self.get_visit_reason_no_follow_up_choices():
-            if self.appointment.appt_status != COMPLETE_APPT:
-                self.appointment.appt_status = COMPLETE_APPT
-                self.appointment.save()
-        else:
-            if self.appointment.appt_status != IN_PROGRESS_APPT:
-                self.appointment.appt_status = IN_PROGRESS_APPT
-                self.appointment.save()
+        appt_status = self.get_appt_status()
+        app_config = django_apps.get_app_config("edc_visit_tracking")
+        if app_config.defer_appointment_status:
+            defer_appointment_status(self)
+        elif self.appointment.appt_status != appt_status:
+            self.appointment.appt_status = appt_status
+            self.appointment.save()
 
     class Meta:
         abstract = True
@@ -115,5 +132,6 @@ class VisitModelMixin(
                     "visit_code_sequence",
                     "report_datetime",
                 ]
-            )
+            ),
+            models.Index(fields=["visit_code", "visit_code_sequence"]),
         ]
@@ -1,2 +1,16 @@
+from .appointment_autocomplete_model_admin_mixin import (
+    AppointmentAutocompleteModelAdminMixin,
+    AppointmentAutocompleteSelect,
+)
 from .crf_model_admin_mixin import CrfModelAdminMixin
+from .date_bucket_model_admin_mixin import (
+    DateBucketChangeList,
+    DateBucketModelAdminMixin,
+)
+from .estimated_count_model_admin_mixin import (
+    EstimatedCountChangeList,
+    EstimatedCountModelAdminMixin,
+)
+from .export_model_admin_mixin import ExportModelAdminMixin
+from .indexed_search_model_admin_mixin import IndexedSearchModelAdminMixin
 from .visit_model_admin_mixin import VisitModelAdminMixin
@@ -0,0 +1,157 @@
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.contrib.sites.shortcuts import get_current_site
+from django.core.exceptions import PermissionDenied
+from django.db.models import Exists, OuterRef
+from django.http import JsonResponse
+from django.urls import path, reverse
+
+
+class AppointmentAutocompleteSelect(AutocompleteSelect):
+
+    """A select2 widget that loads appointments from the visit
+    model admin's appointment autocomplete view.
+    """
+
+    def __init__(self, rel, admin_site, visit_model_cls=None, **kwargs):
+        super().__init__(rel, admin_site, **kwargs)
+        self.visit_model_cls = visit_model_cls
+
+    def get_url(self):
+        opts = self.visit_model_cls._meta
+        return reverse(
+            f"{self.admin_site.name}:{opts.app_label}_{opts.model_name}_"
+            "appointment_autocomplete"
+        )
+
+
+class AppointmentAutocompleteModelAdminMixin:
+
+    """A ModelAdmin mixin for the visit model that lets the user
+    pick an appointment without a visit by subject identifier
+    prefix.
+
+    The autocomplete query filters on the current site and
+    subject identifier prefix, excludes appointments with a visit
+    using NOT EXISTS on the visit's unique `appointment_id`, and
+    orders on the appointment's (subject_identifier, schedule,
+    visit_code, timepoint) index. Only one page is read per
+    request.
+
+    Opt in with `use_appointment_autocomplete = True`.
+    """
+
+    use_appointment_autocomplete = False
+    appointment_autocomplete_paginate_by = 20
+
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path(
+                "appointment_autocomplete/",
+                self.admin_site.admin_view(self.appointment_autocomplete_view),
+                name=f"{opts.app_label}_{opts.model_name}_appointment_autocomplete",
+            )
+        ] + super().get_urls()
+
+    @property
+    def appointment_model_cls(self):
+        return self.model._meta.get_field("appointment").related_model
+
+    def get_appointment_queryset(self, request):
+        """Returns the appointments at the current site.
+        """
+        return self.appointment_model_cls.objects.filter(
+            site_id=get_current_site(request).id
+        )
+
+    def get_appointment_autocomplete_queryset(self, request, term=None):
+        """Returns the appointments without a visit at the current
+        site, ordered by subject and schedule.
+        """
+        queryset = (
+            self.get_appointment_queryset(request)
+            .annotate(
+                has_visit=Exists(
+                    self.model._default_manager.filter(appointment=OuterRef("pk"))
+                )
+            )
+            .filter(has_visit=False)
+        )
+        if term:
+            queryset = queryset.filter(subject_identifier__startswith=term)
+        return queryset.order_by(
+            "subject_identifier",
+            "visit_schedule_name",
+            "schedule_name",
+            "visit_code",
+            "timepoint",
+            "visit_code_sequence",
+        )
+
+    def appointment_autocomplete_view(self, request):
+        """Returns a page of appointments without a visit in the
+        JSON format expected by select2.
+        """
+        if not (
+            self.has_add_permission(request) or self.has_change_permission(request)
+        ):
+            raise PermissionDenied
+        try:
+            page = max(int(request.GET.get("page", 1)), 1)
+        except ValueError:
+            page = 1
+        paginate_by = self.appointment_autocomplete_paginate_by
+        offset = (page - 1) * paginate_by
+        rows = list(
+            self.get_appointment_autocomplete_queryset(
+                request, term=request.GET.get("term", "").strip()
+            ).values_list(
+                "pk",
+                "subject_identifier",
+                "visit_code",
+                "visit_code_sequence",
+                "appt_datetime",
+            )[
+                offset : offset + paginate_by + 1
+            ]
+        )
+        return JsonResponse(
+            {
+                "results": [
+                    {
+                        "id": str(pk),
+                        "text": (
+                            f"{subject_identifier} {visit_code}.{visit_code_sequence} "
+                            f"{appt_datetime:%Y-%m-%d %H:%M}"
+                        ),
+                    }
+                    for (
+                        pk,
+                        subject_identifier,
+                        visit_code,
+                        visit_code_sequence,
+                        appt_datetime,
+                    ) in rows[:paginate_by]
+                ],
+                "pagination": {"more": len(rows) > paginate_by},
+            }
+        )
+
+    def get_appointment_formfield_kwargs(self, db_field, request, **kwargs):
+        """Returns formfield kwargs to pick the appointment with
+        the autocomplete widget.
+
+        Any appointment at the site validates; the visit's
+        one-to-one constraint rejects an appointment that already
+        has a visit.
+        """
+        kwargs["queryset"] = self.get_appointment_queryset(request).using(
+            kwargs.get("using")
+        )
+        kwargs["widget"] = AppointmentAutocompleteSelect(
+            db_field.remote_field,
+            self.admin_site,
+            visit_model_cls=self.model,
+            using=kwargs.get("using"),
+        )
+        return kwargs
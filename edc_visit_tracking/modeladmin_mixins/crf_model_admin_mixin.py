@@ -1,4 +1,11 @@
-class CrfModelAdminMixin:
+from .date_bucket_model_admin_mixin import DateBucketModelAdminMixin
+from .export_model_admin_mixin import ExportModelAdminMixin
+from .indexed_search_model_admin_mixin import IndexedSearchModelAdminMixin
+
+
+class CrfModelAdminMixin(
+    ExportModelAdminMixin, IndexedSearchModelAdminMixin, DateBucketModelAdminMixin
+):
 
     """ModelAdmin subclass for models with a ForeignKey to your
     visit model(s).
@@ -39,6 +46,12 @@ class CrfModelAdminMixin:
         )
         return self.search_fields
 
+    def get_visit_lookup_prefix(self):
+        return f"{self.visit_model_attr}__"
+
+    def get_export_visit_model(self):
+        return self.visit_model
+
     def get_list_filter(self, request):
         super().get_list_filter(request)
         fields = [
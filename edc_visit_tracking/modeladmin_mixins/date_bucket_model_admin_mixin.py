@@ -0,0 +1,81 @@
+from django.apps import apps as django_apps
+from django.contrib.sites.models import Site
+
+from ..date_buckets import (
+    DATE_BUCKET_FIELD,
+    get_date_bucket_queryset,
+    get_site_lookup,
+)
+from .estimated_count_model_admin_mixin import (
+    EstimatedCountChangeList,
+    EstimatedCountModelAdminMixin,
+)
+
+
+class DateBucketChangeList(EstimatedCountChangeList):
+
+    """A ChangeList that renders the date hierarchy from the
+    date buckets if no filters other than the date hierarchy
+    and no search terms are applied, see date_buckets.py.
+    """
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        lookups = self.get_date_bucket_lookups()
+        if lookups is not None:
+            queryset = get_date_bucket_queryset(
+                queryset,
+                site_id=self.model_admin.get_date_bucket_site_id(request),
+                **lookups,
+            )
+        return queryset
+
+    def get_date_bucket_lookups(self):
+        """Returns the year/month/day lookups for the date buckets
+        or None if the date buckets cannot be used.
+        """
+        if (
+            self.date_hierarchy != DATE_BUCKET_FIELD
+            or self.query
+            or not django_apps.get_app_config("edc_visit_tracking").date_buckets
+        ):
+            return None
+        lookups = {}
+        for key, value in self.get_filters_params().items():
+            field_name, _, part = key.partition("__")
+            if field_name != DATE_BUCKET_FIELD or part not in ["year", "month", "day"]:
+                return None
+            try:
+                lookups.update({part: int(value)})
+            except ValueError:
+                return None
+        return lookups
+
+
+class DateBucketModelAdminMixin(EstimatedCountModelAdminMixin):
+
+    """A ModelAdmin mixin to render the `report_datetime` date
+    hierarchy from the date buckets instead of DISTINCT date
+    queries over the table.
+
+    Opt-in by setting `use_date_buckets = True`. The date
+    buckets must be enabled, see AppConfig.date_buckets.
+    """
+
+    use_date_buckets = False
+
+    def get_date_bucket_site_id(self, request):
+        """Returns the site to limit the date buckets to, the
+        request's site, or None for all sites.
+
+        Override if `get_queryset` is not limited to a site.
+        """
+        if not get_site_lookup(self.model):
+            return None
+        site = getattr(request, "site", None) or Site.objects.get_current(request)
+        return site.id
+
+    def get_changelist(self, request, **kwargs):
+        if self.use_date_buckets:
+            return DateBucketChangeList
+        return super().get_changelist(request, **kwargs)
@@ -0,0 +1,93 @@
+from django.contrib.admin.views.main import ChangeList, PAGE_VAR
+
+from ..paginator import CURSOR_VAR, EstimatedCountPaginator
+
+
+class EstimatedCountChangeList(ChangeList):
+
+    """A ChangeList that ignores the keyset cursor in the query
+    string and adds the cursor of the last row of this page to
+    links to the next page, see EstimatedCountPaginator.
+
+    Links are built with `get_query_string`, so the admin's
+    `pagination` template tag links the next page with its
+    cursor. Other links drop the cursor.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params=params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        new_params = dict(new_params or {})
+        remove = list(remove or [])
+        if CURSOR_VAR not in new_params:
+            cursor = self.get_next_page_cursor(new_params)
+            if cursor:
+                new_params.update({CURSOR_VAR: cursor})
+            else:
+                remove.append(CURSOR_VAR)
+        return super().get_query_string(new_params, remove)
+
+    def get_next_page_cursor(self, new_params):
+        """Returns the cursor if `new_params` only set the page to
+        the next page, otherwise None.
+        """
+        get_cursor = getattr(self.paginator, "get_cursor", None)
+        result_list = getattr(self, "result_list", None)
+        if not get_cursor or result_list is None or self.show_all:
+            return None
+        if list(new_params) != [PAGE_VAR]:
+            return None
+        number = self.page_num + 1
+        if str(new_params.get(PAGE_VAR)) != str(number):
+            return None
+        if number >= self.paginator.num_pages:
+            return None
+        return get_cursor(number, result_list)
+
+    def get_next_page_query_string(self):
+        """Returns the query string of the next page with the
+        cursor of the last row of this page or None.
+        """
+        if not self.multi_page or self.page_num + 1 >= self.paginator.num_pages:
+            return None
+        return self.get_query_string({PAGE_VAR: self.page_num + 1})
+
+
+class EstimatedCountModelAdminMixin:
+
+    """A ModelAdmin mixin to use estimated counts and keyset
+    pagination on the changelist of a large table.
+
+    Opt-in by setting `use_estimated_count = True`.
+
+    Counts are estimated only if no filters or search terms
+    are applied, see EstimatedCountPaginator. With estimated
+    counts the changelist does not count the unfiltered
+    queryset with COUNT(*), see `show_full_result_count`.
+
+    Keyset pagination is used for a page if the request has the
+    cursor of the previous page, as linked to by the admin's
+    `pagination` template tag, see EstimatedCountChangeList.
+    """
+
+    use_estimated_count = False
+    estimated_count_paginator = EstimatedCountPaginator
+
+    @property
+    def show_full_result_count(self):
+        return not self.use_estimated_count
+
+    def get_paginator(self, request, queryset, per_page, **kwargs):
+        if self.use_estimated_count:
+            return self.estimated_count_paginator(
+                queryset, per_page, cursor=request.GET.get(CURSOR_VAR), **kwargs
+            )
+        return super().get_paginator(request, queryset, per_page, **kwargs)
+
+    def get_changelist(self, request, **kwargs):
+        if self.use_estimated_count:
+            return EstimatedCountChangeList
+        return super().get_changelist(request, **kwargs)
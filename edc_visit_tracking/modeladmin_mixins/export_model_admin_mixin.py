@@ -0,0 +1,180 @@
+import csv
+import json
+
+from collections import OrderedDict
+from itertools import chain
+from django.core.exceptions import PermissionDenied
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.urls import path
+from edc_constants.constants import OTHER
+
+from ..constants import UNSCHEDULED
+
+try:
+    from django_crypto_fields.fields import BaseField as EncryptedField
+except ImportError:  # pragma: no cover
+    EncryptedField = None
+
+CSV = "csv"
+NDJSON = "ndjson"
+EXPORT_FORMAT_VAR = "_format"
+
+EXPORT_CONTENT_TYPES = {CSV: "text/csv", NDJSON: "application/x-ndjson"}
+
+
+class EchoBuffer:
+
+    """A file-like object for csv.writer that returns each
+    written line instead of buffering it.
+    """
+
+    def write(self, value):
+        return value
+
+
+class ExportModelAdminMixin:
+
+    """A ModelAdmin mixin that streams the selected or the
+    filtered changelist queryset as CSV or NDJSON.
+
+    Rows are read with `values_list(...).iterator()` with the
+    visit and appointment columns joined in SQL so memory use
+    does not grow with the number of rows.
+
+    The export view is at "<changelist>/export/?_format=ndjson"
+    and takes the same filters and search terms as the
+    changelist.
+
+    Encrypted fields, see django_crypto_fields, are not exported
+    since rows are read decrypted and the export only requires
+    the view permission.
+
+    The export actions are in `actions`. To add actions, extend
+    them, e.g. `actions = ExportModelAdminMixin.actions + [...]`.
+    """
+
+    export_chunk_size = 2000
+    actions = ["export_as_csv", "export_as_ndjson"]
+
+    def is_exported_field(self, field):
+        return not (EncryptedField and isinstance(field, EncryptedField))
+
+    def get_visit_lookup_prefix(self):
+        return ""
+
+    def get_export_visit_model(self):
+        return self.model
+
+    def get_export_columns(self, request):
+        """Returns an ordered dict of {header: (lookups, func)}.
+
+        If `func` is None the value is that of the only lookup,
+        otherwise `func(*values)`.
+        """
+        prefix = self.get_visit_lookup_prefix()
+        columns = OrderedDict(
+            (field.attname, ((field.attname,), None))
+            for field in self.model._meta.concrete_fields
+            if self.is_exported_field(field)
+        )
+        columns.update(
+            subject_identifier=((f"{prefix}appointment__subject_identifier",), None),
+            visit_code=((f"{prefix}appointment__visit_code",), None),
+            visit_reason=self.get_visit_reason_column(prefix),
+        )
+        return columns
+
+    def get_visit_reason_column(self, prefix):
+        """Returns the column of the visit reason as displayed by
+        `VisitModelAdminMixin.visit_reason`.
+        """
+        opts = self.get_export_visit_model()._meta
+        reasons = dict(opts.get_field("reason").flatchoices)
+        reasons_unscheduled = dict(opts.get_field("reason_unscheduled").flatchoices)
+
+        def visit_reason(reason, reason_unscheduled, reason_unscheduled_other):
+            if reason != UNSCHEDULED:
+                return reasons.get(reason, reason)
+            elif reason_unscheduled == OTHER:
+                return reason_unscheduled_other
+            return reasons_unscheduled.get(reason_unscheduled, reason_unscheduled)
+
+        return (
+            (
+                f"{prefix}reason",
+                f"{prefix}reason_unscheduled",
+                f"{prefix}reason_unscheduled_other",
+            ),
+            visit_reason,
+        )
+
+    def iter_export_rows(self, queryset, columns):
+        lookups = [lookup for lookups, _ in columns.values() for lookup in lookups]
+        for values in queryset.values_list(*lookups).iterator(
+            chunk_size=self.export_chunk_size
+        ):
+            row = []
+            index = 0
+            for column_lookups, func in columns.values():
+                column_values = values[index : index + len(column_lookups)]
+                index += len(column_lookups)
+                row.append(func(*column_values) if func else column_values[0])
+            yield row
+
+    def get_export_response(self, request, queryset, export_format=None):
+        export_format = export_format if export_format in EXPORT_CONTENT_TYPES else CSV
+        columns = self.get_export_columns(request)
+        headers = list(columns)
+        rows = self.iter_export_rows(queryset, columns)
+        if export_format == NDJSON:
+            content = (
+                json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder) + "\n"
+                for row in rows
+            )
+        else:
+            writer = csv.writer(EchoBuffer())
+            content = chain(
+                [writer.writerow(headers)], (writer.writerow(row) for row in rows)
+            )
+        response = StreamingHttpResponse(
+            content, content_type=EXPORT_CONTENT_TYPES.get(export_format)
+        )
+        filename = f"{self.model._meta.model_name}.{export_format}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    def export_as_csv(self, request, queryset):
+        return self.get_export_response(request, queryset, CSV)
+
+    export_as_csv.short_description = "Export selected %(verbose_name_plural)s as CSV"
+    export_as_csv.allowed_permissions = ("view",)
+
+    def export_as_ndjson(self, request, queryset):
+        return self.get_export_response(request, queryset, NDJSON)
+
+    export_as_ndjson.short_description = (
+        "Export selected %(verbose_name_plural)s as NDJSON"
+    )
+    export_as_ndjson.allowed_permissions = ("view",)
+
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path(
+                "export/",
+                self.admin_site.admin_view(self.export_view),
+                name=f"{opts.app_label}_{opts.model_name}_export",
+            )
+        ] + super().get_urls()
+
+    def export_view(self, request):
+        """Streams the changelist queryset, with filters and
+        search terms applied.
+        """
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        request.GET = request.GET.copy()
+        export_format = request.GET.pop(EXPORT_FORMAT_VAR, [CSV])[0]
+        changelist = self.get_changelist_instance(request)
+        return self.get_export_response(request, changelist.queryset, export_format)
@@ -0,0 +1,83 @@
+import re
+
+from django.apps import apps as django_apps
+from django.db.models import Q
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+
+UUID_PATTERN = re.compile(
+    r"^[0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{12}$", re.I
+)
+VISIT_CODE_PATTERN = re.compile(r"^(?P<visit_code>[^.]+)(\.(?P<sequence>\d+))?$")
+
+
+class IndexedSearchModelAdminMixin:
+
+    """A ModelAdmin mixin that routes search terms that look like
+    a subject identifier, visit code or pk to exact or prefix
+    lookups on the visit's denormalized, indexed columns.
+
+    Other terms fall back to the default `icontains` search over
+    `search_fields`. All terms must match.
+
+    Opt-in by setting `use_indexed_search = True`.
+
+    For example:
+
+        "092-4099"        -> subject_identifier__startswith
+        "092-40990001-5"  -> subject_identifier
+        "1000" or "1000.1" -> visit_code (and visit_code_sequence)
+    """
+
+    use_indexed_search = False
+    subject_identifier_prefix_pattern = re.compile(r"^\d+-[\d-]*$")
+
+    def get_visit_lookup_prefix(self):
+        """Returns the lookup prefix from the model to the visit
+        model's columns.
+        """
+        return ""
+
+    def get_visit_codes(self):
+        return {
+            visit_code
+            for visit_schedule in site_visit_schedules.visit_schedules.values()
+            for schedule in visit_schedule.schedules.values()
+            for visit_code in schedule.visits
+        }
+
+    def get_indexed_search_q(self, term):
+        """Returns a Q for `term` on indexed columns or None.
+        """
+        prefix = self.get_visit_lookup_prefix()
+        subject_identifier_pattern = django_apps.get_app_config(
+            "edc_identifier"
+        ).get_subject_identifier_pattern()
+        if re.fullmatch(subject_identifier_pattern, term):
+            return Q(**{f"{prefix}subject_identifier": term})
+        match = VISIT_CODE_PATTERN.match(term)
+        if match and match.group("visit_code") in self.get_visit_codes():
+            q = Q(**{f"{prefix}visit_code": match.group("visit_code")})
+            if match.group("sequence") is not None:
+                q &= Q(**{f"{prefix}visit_code_sequence": int(match.group("sequence"))})
+            return q
+        if self.subject_identifier_prefix_pattern.match(term):
+            return Q(**{f"{prefix}subject_identifier__startswith": term})
+        if UUID_PATTERN.match(term):
+            q = Q(pk=term)
+            if prefix:
+                q |= Q(**{f"{prefix}pk": term})
+            return q
+        return None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not self.use_indexed_search:
+            return super().get_search_results(request, queryset, search_term)
+        use_distinct = False
+        for term in search_term.split():
+            q = self.get_indexed_search_q(term)
+            if q is not None:
+                queryset = queryset.filter(q)
+            else:
+                queryset, distinct = super().get_search_results(request, queryset, term)
+                use_distinct = use_distinct or distinct
+        return queryset, use_distinct
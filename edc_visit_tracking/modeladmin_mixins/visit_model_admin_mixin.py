@@ -1,4 +1,6 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.template.response import TemplateResponse
 from edc_constants.constants import OTHER
 from edc_model_admin.model_admin_audit_fields_mixin import audit_fieldset_tuple
 from edc_visit_schedule.fieldsets import (
@@ -6,9 +8,24 @@ from edc_visit_schedule.fieldsets import (
     visit_schedule_fields,
 )
 from edc_visit_tracking.constants import UNSCHEDULED
+from edc_visit_tracking.crf_registry import site_crfs
+from edc_visit_tracking.forms import MarkAsMissedForm
+from edc_visit_tracking.missed_visits import mark_visits_missed
+
+from .appointment_autocomplete_model_admin_mixin import (
+    AppointmentAutocompleteModelAdminMixin,
+)
+from .date_bucket_model_admin_mixin import DateBucketModelAdminMixin
+from .export_model_admin_mixin import ExportModelAdminMixin
+from .indexed_search_model_admin_mixin import IndexedSearchModelAdminMixin
 
 
-class VisitModelAdminMixin:
+class VisitModelAdminMixin(
+    AppointmentAutocompleteModelAdminMixin,
+    ExportModelAdminMixin,
+    IndexedSearchModelAdminMixin,
+    DateBucketModelAdminMixin,
+):
 
     """ModelAdmin subclass for models with a ForeignKey to
     'appointment', such as your visit model(s).
@@ -20,6 +37,12 @@ class VisitModelAdminMixin:
         dashboard_type = 'maternal'
     """
 
+    actions = ExportModelAdminMixin.actions + ["mark_as_missed"]
+
+    mark_as_missed_confirmation_template = (
+        "edc_visit_tracking/admin/mark_as_missed_confirmation.html"
+    )
+
     date_hierarchy = "report_datetime"
 
     fieldsets = (
@@ -100,10 +123,65 @@ class VisitModelAdminMixin:
             kwargs["queryset"] = db_field.related_model._default_manager.using(
                 db
             ).filter(pk=request.GET.get("appointment"))
+        elif db_field.name == "appointment" and self.use_appointment_autocomplete:
+            kwargs = self.get_appointment_formfield_kwargs(db_field, request, **kwargs)
         else:
             kwargs["queryset"] = db_field.related_model._default_manager.none()
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
+    def mark_as_missed(self, request, queryset):
+        """Asks for the reason missed then marks the selected
+        visits as missed.
+        """
+        if "apply" in request.POST:
+            form = MarkAsMissedForm(request.POST, model_cls=self.model)
+            if form.is_valid():
+                result = mark_visits_missed(queryset, **form.cleaned_data)
+                self.message_user(
+                    request,
+                    f"Marked {result.updated} {self.opts.verbose_name_plural} "
+                    "as missed.",
+                )
+                for pk, message in result.errors.items():
+                    self.message_user(
+                        request, f"{pk}: {message}", level=messages.WARNING
+                    )
+                return None
+        else:
+            form = MarkAsMissedForm(model_cls=self.model)
+        context = dict(
+            self.admin_site.each_context(request),
+            title="Mark as missed",
+            objects_name=self.opts.verbose_name_plural,
+            queryset=queryset,
+            form=form,
+            opts=self.opts,
+            action_checkbox_name=helpers.ACTION_CHECKBOX_NAME,
+            media=self.media,
+        )
+        request.current_app = self.admin_site.name
+        return TemplateResponse(
+            request, self.mark_as_missed_confirmation_template, context
+        )
+
+    mark_as_missed.short_description = "Mark selected %(verbose_name_plural)s as missed"
+    mark_as_missed.allowed_permissions = ("change",)
+
+    def get_deleted_objects(self, objs, request):
+        """Returns the visits' CRFs as protected, without collecting
+        related objects, if any CRF refers to the visits.
+        """
+        objs = list(objs)
+        dependents = site_crfs.get_dependents(self.model, [obj.pk for obj in objs])
+        if dependents:
+            protected = [
+                f"{site_crfs.registry[label_lower].model_cls._meta.verbose_name}: {obj}"
+                for obj in objs
+                for label_lower in dependents.get(obj.pk, [])
+            ]
+            return [], {}, set(), protected
+        return super().get_deleted_objects(objs, request)
+
     def get_readonly_fields(self, request, obj=None):
         readonly_fields = super().get_readonly_fields(request, obj=obj)
         return list(readonly_fields) + list(visit_schedule_fields)
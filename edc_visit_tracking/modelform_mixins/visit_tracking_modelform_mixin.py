@@ -6,6 +6,7 @@ from ..crf_date_validator import (
     CrfReportDateBeforeStudyStart,
 )
 from ..crf_date_validator import CrfReportDateIsFuture
+from ..identity_map import add_object, get_object
 
 
 class VisitTrackingModelFormError(Exception):
@@ -29,13 +30,15 @@ class VisitTrackingModelFormMixin:
         # a required field.
         if not cleaned_data.get(self._meta.model.visit_model_attr()):
             raise forms.ValidationError({self._meta.model.visit_model_attr(): ""})
-        elif cleaned_data.get("report_datetime"):
+        visit = cleaned_data.get(self._meta.model.visit_model_attr())
+        add_object(visit)
+        self.get_appointment(visit)
+        if cleaned_data.get("report_datetime"):
             try:
                 self.crf_validator_cls(
                     report_datetime=cleaned_data.get("report_datetime"),
-                    visit_report_datetime=cleaned_data.get(
-                        self._meta.model.visit_model_attr()
-                    ).report_datetime,
+                    visit_report_datetime=visit.report_datetime,
+                    facility_name=visit.appointment.facility_name,
                 )
             except (
                 CrfReportDateAllowanceError,
@@ -44,3 +47,16 @@ class VisitTrackingModelFormMixin:
             ) as e:
                 raise forms.ValidationError({"report_datetime": str(e)})
         return cleaned_data
+
+    @staticmethod
+    def get_appointment(visit):
+        """Returns the visit's appointment through the active
+        identity map, if any, and caches it on the visit.
+
+        Later clean methods, e.g. SubjectScheduleCrfModelFormMixin,
+        read `visit.appointment` from the cache.
+        """
+        field = visit._meta.get_field("appointment")
+        if not field.is_cached(visit):
+            visit.appointment = get_object(field.related_model, pk=visit.appointment_id)
+        return visit.appointment
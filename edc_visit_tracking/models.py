@@ -1,10 +1,263 @@
 from django.apps import apps as django_apps
 from django.conf import settings
+from django.contrib.sites.models import Site
+from django.db import models
+from django.db.models.deletion import PROTECT
+from edc_utils import get_utcnow
+
+from .choices import CHANGE_LOG_OPERATIONS
+from .managers import (
+    ChangeLogManager,
+    SubjectVitalStatusManager,
+    VisitCrfCountManager,
+    VisitRollupManager,
+)
 
 
 def get_visit_tracking_model():
     return django_apps.get_model(settings.SUBJECT_VISIT_MODEL)
 
 
+class TimelineDigest(models.Model):
+    """A sha256 digest per visit or CRF instance, keyed by
+    model and natural key.
+
+    Maintained by signals, see `digests.py`.
+    """
+
+    label_lower = models.CharField(max_length=150)
+
+    natural_key = models.CharField(max_length=250)
+
+    subject_identifier = models.CharField(max_length=50)
+
+    site = models.ForeignKey(Site, on_delete=PROTECT, null=True)
+
+    digest = models.CharField(max_length=64)
+
+    class Meta:
+        unique_together = ("label_lower", "natural_key")
+        indexes = [models.Index(fields=["subject_identifier", "label_lower"])]
+
+
+class SubjectDigest(models.Model):
+    """A sha256 digest per subject rolled up from the subject's
+    `TimelineDigest` instances.
+    """
+
+    subject_identifier = models.CharField(max_length=50, unique=True)
+
+    site = models.ForeignKey(Site, on_delete=PROTECT, null=True)
+
+    digest = models.CharField(max_length=64)
+
+    class Meta:
+        indexes = [models.Index(fields=["site", "subject_identifier"])]
+
+
+class ChangeLog(models.Model):
+
+    """An append-only log of visit and CRF writes.
+
+    Entries are written in the same transaction as the change.
+    Consumers read deltas by sequence, holding back at gaps left
+    by open transactions, see `ChangeLogManager.read`.
+    """
+
+    sequence = models.BigAutoField(primary_key=True)
+
+    label_lower = models.CharField(max_length=150)
+
+    natural_key = models.CharField(max_length=250)
+
+    subject_identifier = models.CharField(max_length=50)
+
+    object_pk = models.CharField(max_length=36)
+
+    operation = models.CharField(max_length=10, choices=CHANGE_LOG_OPERATIONS)
+
+    timestamp = models.DateTimeField(default=get_utcnow)
+
+    objects = ChangeLogManager()
+
+    class Meta:
+        indexes = [models.Index(fields=["label_lower", "sequence"])]
+
+
+class SubjectTimelineVersion(models.Model):
+
+    """A per-subject counter bumped on every visit or CRF save
+    and delete.
+
+    Used for ETag/Last-Modified, see `timeline_version.py`.
+    """
+
+    subject_identifier = models.CharField(max_length=50, unique=True)
+
+    version = models.PositiveIntegerField(default=0)
+
+    modified = models.DateTimeField(default=get_utcnow)
+
+
+class DateBucket(models.Model):
+
+    """A per-day count of visit or CRF instances by model and
+    site, keyed on the local date of `report_datetime`.
+
+    Used to render the admin date hierarchy. Maintained by
+    signals, see `date_buckets.py`.
+
+    `site_key` is the site id or 0 if none; unlike the nullable
+    `site` it is enforced by the unique constraint.
+    """
+
+    label_lower = models.CharField(max_length=150)
+
+    site = models.ForeignKey(Site, on_delete=PROTECT, null=True)
+
+    site_key = models.PositiveIntegerField(default=0)
+
+    report_date = models.DateField()
+
+    year = models.PositiveSmallIntegerField()
+
+    month = models.PositiveSmallIntegerField()
+
+    day = models.PositiveSmallIntegerField()
+
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("label_lower", "site_key", "report_date")
+        indexes = [models.Index(fields=["label_lower", "year", "month", "day"])]
+
+
+class VisitRollup(models.Model):
+
+    """A count of visits by model, site, schedule, month of
+    `report_datetime`, reason and survival status.
+
+    Used for visit reason and survival status reports.
+    Maintained by signals, see `visit_rollups.py`.
+
+    `site_key` is the site id or 0 if none; unlike the nullable
+    `site` it is enforced by the unique constraint.
+    """
+
+    label_lower = models.CharField(max_length=150)
+
+    site = models.ForeignKey(Site, on_delete=PROTECT, null=True)
+
+    site_key = models.PositiveIntegerField(default=0)
+
+    visit_schedule_name = models.CharField(max_length=25)
+
+    schedule_name = models.CharField(max_length=25)
+
+    year = models.PositiveSmallIntegerField()
+
+    month = models.PositiveSmallIntegerField()
+
+    reason = models.CharField(max_length=25)
+
+    survival_status = models.CharField(max_length=10, default="")
+
+    count = models.IntegerField(default=0)
+
+    objects = VisitRollupManager()
+
+    class Meta:
+        unique_together = (
+            "label_lower",
+            "site_key",
+            "visit_schedule_name",
+            "schedule_name",
+            "year",
+            "month",
+            "reason",
+            "survival_status",
+        )
+        indexes = [models.Index(fields=["label_lower", "year", "month"])]
+
+
+class SubjectVitalStatus(models.Model):
+
+    """The latest survival status and last known alive date of
+    a subject across the subject's visits of a visit model.
+
+    Maintained by signals, see `vital_status.py`.
+    """
+
+    label_lower = models.CharField(max_length=150)
+
+    subject_identifier = models.CharField(max_length=50)
+
+    site = models.ForeignKey(Site, on_delete=PROTECT, null=True)
+
+    survival_status = models.CharField(max_length=10, null=True)
+
+    survival_status_datetime = models.DateTimeField(null=True)
+
+    last_alive_date = models.DateField(null=True)
+
+    modified = models.DateTimeField(default=get_utcnow)
+
+    objects = SubjectVitalStatusManager()
+
+    class Meta:
+        unique_together = ("label_lower", "subject_identifier")
+        indexes = [
+            models.Index(fields=["site", "survival_status"]),
+            models.Index(fields=["last_alive_date"]),
+        ]
+
+
+class ExportWatermark(models.Model):
+
+    """The position of an export consumer in a visit or CRF
+    model as the change log sequence of its last read. See
+    `watermark_exports.py`.
+    """
+
+    consumer = models.CharField(max_length=50)
+
+    label_lower = models.CharField(max_length=150)
+
+    sequence = models.BigIntegerField(default=0)
+
+    updated = models.DateTimeField(default=get_utcnow)
+
+    class Meta:
+        unique_together = ("consumer", "label_lower")
+
+
+class VisitCrfCount(models.Model):
+
+    """The number of CRFs and requisitions submitted for a visit.
+
+    Maintained by signals with F-expression increments, see
+    `crf_counts.py`. Repair drift with the `reconcile_crf_counts`
+    management command.
+    """
+
+    label_lower = models.CharField(max_length=150)
+
+    visit_pk = models.CharField(max_length=36)
+
+    subject_identifier = models.CharField(max_length=50)
+
+    site = models.ForeignKey(Site, on_delete=PROTECT, null=True)
+
+    crfs = models.IntegerField(default=0)
+
+    requisitions = models.IntegerField(default=0)
+
+    objects = VisitCrfCountManager()
+
+    class Meta:
+        unique_together = ("label_lower", "visit_pk")
+        indexes = [models.Index(fields=["subject_identifier"])]
+
+
 if settings.APP_NAME == "edc_visit_tracking":
     from .tests import models  # noqa
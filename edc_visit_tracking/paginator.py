@@ -0,0 +1,234 @@
+import json
+
+from datetime import datetime, time
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+CURSOR_VAR = "cursor"
+CURSOR_SALT = "edc_visit_tracking.paginator"
+
+
+def get_estimated_count(queryset):
+    """Returns the row count for the queryset's table from the
+    backend's statistics or None.
+
+    Only unfiltered querysets are estimated. The estimate is only
+    as fresh as the last ANALYZE.
+    """
+    if queryset.query.where:
+        return None
+    connection = connections[queryset.db]
+    db_table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [connection.ops.quote_name(db_table)],
+            )
+        elif connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s",
+                [db_table],
+            )
+        elif connection.vendor == "sqlite":
+            cursor.execute(
+                "SELECT name FROM sqlite_master "
+                "WHERE type = 'table' AND name = 'sqlite_stat1'"
+            )
+            if not cursor.fetchone():
+                return None
+            cursor.execute(
+                "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [db_table]
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    if not row or row[0] is None:
+        return None
+    estimated_count = int(str(row[0]).split()[0])
+    return estimated_count if estimated_count > 0 else None
+
+
+class CursorEncoder(DjangoJSONEncoder):
+
+    """A JSON encoder that keeps the microseconds of datetimes
+    and times, unlike DjangoJSONEncoder, so keys compare equal.
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime, time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorSerializer:
+
+    """A JSON serializer for `signing` that encodes dates, times,
+    decimals and UUIDs.
+    """
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(",", ":"), cls=CursorEncoder).encode(
+            "latin-1"
+        )
+
+    def loads(self, data):
+        return json.loads(data.decode("latin-1"))
+
+
+def encode_cursor(number, key):
+    """Returns a signed cursor for the page after page `number`
+    whose last row has `key`.
+    """
+    return signing.dumps(
+        [number, list(key)], salt=CURSOR_SALT, serializer=CursorSerializer
+    )
+
+
+def decode_cursor(value):
+    """Returns a tuple of (number, key) for a cursor or None if
+    not valid.
+    """
+    try:
+        number, key = signing.loads(
+            value, salt=CURSOR_SALT, serializer=CursorSerializer
+        )
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    return number, tuple(key)
+
+
+class EstimatedCountPaginator(Paginator):
+
+    """A paginator for large tables.
+
+    * `count` is taken from the backend's statistics if the
+      queryset is not filtered and the estimate is at least
+      `min_estimated_count`, otherwise COUNT(*) is used;
+    * pages starting at or beyond `keyset_offset` are fetched by
+      seeking past the last key of the previous page instead of
+      by OFFSET if `cursor` is that of the previous page, see
+      `get_cursor`. Other pages, e.g. when jumping to a page, are
+      fetched by OFFSET.
+
+    Keyset pagination is only used if the queryset ordering is
+    on local fields. If the ordering does not include the pk or
+    a unique field, the pk is added as the last ordering field.
+    Nullable ordering fields, such as `visit_code`, are assumed
+    to be set on every row; a cursor with a null is ignored.
+    """
+
+    min_estimated_count = 10000
+    keyset_offset = 10000
+
+    def __init__(
+        self,
+        *args,
+        min_estimated_count=None,
+        keyset_offset=None,
+        cursor=None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        if min_estimated_count is not None:
+            self.min_estimated_count = min_estimated_count
+        if keyset_offset is not None:
+            self.keyset_offset = keyset_offset
+        self.cursor = decode_cursor(cursor) if cursor else None
+        if self.keyset_fields:
+            self.object_list = self.object_list.order_by(
+                *[
+                    f"-{name}" if descending else name
+                    for name, descending in self.keyset_fields
+                ]
+            )
+
+    @cached_property
+    def estimated_count(self):
+        estimated_count = get_estimated_count(self.object_list)
+        if estimated_count is not None and estimated_count >= self.min_estimated_count:
+            return estimated_count
+        return None
+
+    @cached_property
+    def count(self):
+        if self.estimated_count is not None:
+            return self.estimated_count
+        return super().count
+
+    @cached_property
+    def keyset_fields(self):
+        """Returns a list of (attname, descending) for the queryset
+        ordering, ending with the pk if the ordering has no unique
+        field, or None.
+        """
+        if not isinstance(self.object_list, QuerySet):
+            return None
+        opts = self.object_list.model._meta
+        keyset_fields = []
+        for part in self.object_list.query.order_by or opts.ordering:
+            if not isinstance(part, str) or part == "?":
+                return None
+            name = part.lstrip("-")
+            try:
+                field = opts.pk if name == "pk" else opts.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            if not field.concrete or field.many_to_many:
+                return None
+            if field.remote_field and name == field.name:
+                return None
+            keyset_fields.append((field.attname, part.startswith("-")))
+            if field.primary_key or field.unique:
+                return keyset_fields
+        return keyset_fields + [(opts.pk.attname, False)]
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        if (
+            bottom < self.keyset_offset
+            or not self.keyset_fields
+            or not self.cursor
+            or self.cursor[0] != number - 1
+            or None in self.cursor[1]
+            or len(self.cursor[1]) != len(self.keyset_fields)
+        ):
+            return super().page(number)
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        return self._get_page(
+            self.get_keyset_page(self.cursor[1], top - bottom), number, self
+        )
+
+    def get_keyset_page(self, key, limit):
+        """Returns up to `limit` objects after the row with `key`.
+        """
+        names = [name for name, _ in self.keyset_fields]
+        q = Q()
+        for index, (name, descending) in enumerate(self.keyset_fields):
+            lookup = {f"{name}__{'lt' if descending else 'gt'}": key[index]}
+            lookup.update({n: key[i] for i, n in enumerate(names[:index])})
+            q |= Q(**lookup)
+        return self.object_list.filter(q)[:limit]
+
+    def get_cursor(self, number, object_list):
+        """Returns the cursor to pass for the page after page
+        `number`, taken from the last row of its `object_list`,
+        or None.
+        """
+        if not self.keyset_fields or number >= self.num_pages:
+            return None
+        objs = list(object_list)
+        if not objs:
+            return None
+        return encode_cursor(
+            number, [getattr(objs[-1], name) for name, _ in self.keyset_fields]
+        )
@@ -0,0 +1,205 @@
+from collections import OrderedDict, namedtuple
+
+from .constants import DEFERRED_VISIT, FOLLOW_UP_REASONS, LOST_VISIT, MISSED_VISIT
+from .date_buckets import get_site_lookup
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+# visit status codes in the subjects x visits matrix
+NOT_REPORTED = 0
+ATTENDED = 1
+MISSED = 2
+LOST = 3
+
+MISSED_REASONS = [MISSED_VISIT, DEFERRED_VISIT]
+
+RetentionCurves = namedtuple(
+    "RetentionCurves",
+    "visit_codes enrolled attended missed lost "
+    "attended_fraction missed_fraction lost_fraction",
+)
+
+
+class RetentionReportError(Exception):
+    pass
+
+
+def get_status_codes(reasons):
+    """Returns an int8 array of visit status codes for an array of
+    visit reasons.
+
+    A visit is ATTENDED if its reason is one of FOLLOW_UP_REASONS,
+    MISSED if missed or deferred and LOST if lost to follow-up.
+    Other NO_FOLLOW_UP_REASONS, e.g. completed protocol, are
+    NOT_REPORTED.
+    """
+    codes = np.full(len(reasons), NOT_REPORTED, dtype=np.int8)
+    codes[np.isin(reasons, FOLLOW_UP_REASONS)] = ATTENDED
+    codes[np.isin(reasons, MISSED_REASONS)] = MISSED
+    codes[reasons == LOST_VISIT] = LOST
+    return codes
+
+
+def get_retention_counts(status, group_index, groups):
+    """Returns a tuple of (enrolled, attended, missed, lost) from a
+    subjects x visits `status` matrix and a group index per
+    subject. `enrolled` has shape (groups,), the others have shape
+    (groups, visits).
+
+    A subject counts as lost at a visit if lost at that visit or
+    any earlier visit.
+    """
+    lost = np.maximum.accumulate(status == LOST, axis=1)
+    order = np.argsort(group_index, kind="stable")
+    starts = np.searchsorted(group_index[order], np.arange(groups))
+    enrolled = np.bincount(group_index, minlength=groups)
+
+    def sum_by_group(matrix):
+        if not len(order):
+            return np.zeros((groups, status.shape[1]), dtype=np.int64)
+        sums = np.add.reduceat(matrix[order].astype(np.int64), starts, axis=0)
+        # reduceat returns a row, not zeros, for empty groups
+        sums[enrolled == 0] = 0
+        return sums
+
+    return (
+        enrolled,
+        sum_by_group(status == ATTENDED),
+        sum_by_group(status == MISSED),
+        sum_by_group(lost),
+    )
+
+
+class RetentionReport:
+
+    """Retention curves of the subjects of a visit model: per
+    visit code, the number and fraction of enrolled subjects who
+    attended, missed or were lost to follow-up.
+
+    Subjects, visit codes (by timepoint), reasons and sites of the
+    scheduled visits in `queryset` are fetched in one projected
+    query into a subjects x visits status matrix. Curves for all
+    groups are computed from the matrix with numpy in one pass.
+    A subject is enrolled if the subject has any visit in the
+    queryset.
+
+    For example:
+
+        report = RetentionReport(SubjectVisit.objects.filter(schedule_name="schedule1"))
+        report.get_curves()
+        report.get_curves(by_site=True)
+
+    Requires numpy.
+    """
+
+    def __init__(self, queryset=None):
+        if np is None:
+            raise RetentionReportError("numpy is required for the retention report.")
+        if queryset is None:
+            from .models import get_visit_tracking_model
+
+            queryset = get_visit_tracking_model()._default_manager.all()
+        self.queryset = queryset
+        (
+            self.subject_identifiers,
+            self.site_ids,
+            self.visit_codes,
+            self.status,
+        ) = self.get_matrix()
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(subjects={len(self.subject_identifiers)}, "
+            f"visits={len(self.visit_codes)})"
+        )
+
+    def get_rows(self):
+        """Returns a list of (subject_identifier, timepoint,
+        visit_code, reason, site_id) for the scheduled visits of
+        the queryset.
+        """
+        site_lookup = get_site_lookup(self.queryset.model)
+        return list(
+            self.queryset.filter(visit_code_sequence=0)
+            .order_by()
+            .values_list(
+                "subject_identifier",
+                "appointment__timepoint",
+                "visit_code",
+                "reason",
+                site_lookup or "visit_code_sequence",
+            )
+            .iterator()
+        )
+
+    def get_matrix(self):
+        """Returns a tuple of (subject_identifiers, site_ids,
+        visit_codes, status matrix).
+        """
+        rows = self.get_rows()
+        if not rows:
+            return (
+                np.array([], dtype=object),
+                np.array([], dtype=object),
+                [],
+                np.zeros((0, 0), dtype=np.int8),
+            )
+        subjects, timepoints, visit_codes, reasons, site_ids = (
+            np.array(column, dtype=object) for column in zip(*rows)
+        )
+        if not get_site_lookup(self.queryset.model):
+            site_ids[:] = None
+        subject_identifiers, subject_index = np.unique(
+            subjects.astype(str), return_inverse=True
+        )
+        codes, visit_index = np.unique(visit_codes.astype(str), return_inverse=True)
+        # order visit codes by timepoint
+        code_timepoints = np.full(len(codes), np.inf)
+        np.minimum.at(code_timepoints, visit_index, timepoints.astype(float))
+        order = np.argsort(code_timepoints, kind="stable")
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        visit_index = rank[visit_index]
+        status = np.zeros((len(subject_identifiers), len(codes)), dtype=np.int8)
+        status[subject_index, visit_index] = get_status_codes(reasons.astype(str))
+        subject_site_ids = np.empty(len(subject_identifiers), dtype=object)
+        subject_site_ids[subject_index] = site_ids
+        return (
+            subject_identifiers,
+            subject_site_ids,
+            [str(visit_code) for visit_code in codes[order]],
+            status,
+        )
+
+    def get_curves(self, by_site=None):
+        """Returns an ordered dict of {site_id: RetentionCurves} or,
+        if not `by_site`, of {None: RetentionCurves}.
+        """
+        if not len(self.subject_identifiers):
+            return OrderedDict()
+        if by_site:
+            _, first, group_index = np.unique(
+                self.site_ids.astype(str), return_index=True, return_inverse=True
+            )
+            keys = list(self.site_ids[first])
+        else:
+            keys, group_index = [None], np.zeros(len(self.status), dtype=np.int64)
+        enrolled, attended, missed, lost = get_retention_counts(
+            self.status, group_index, len(keys)
+        )
+        curves = OrderedDict()
+        for i, key in enumerate(keys):
+            curves[key] = RetentionCurves(
+                self.visit_codes,
+                int(enrolled[i]),
+                attended[i],
+                missed[i],
+                lost[i],
+                attended[i] / enrolled[i],
+                missed[i] / enrolled[i],
+                lost[i] / enrolled[i],
+            )
+        return curves
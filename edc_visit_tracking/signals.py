@@ -1,6 +1,16 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 
+from .derived_tables import (
+    delete_derived_tables,
+    get_stored_derived_keys,
+    update_derived_tables,
+)
+from .identity_map import get_identity_map
+from .model_mixins import CrfModelMixin, VisitModelMixin
+from .timeline_version import bump_related_timeline_version
+from .working_days import clear_working_day_calendars
+
 
 @receiver(
     post_save, weak=False, dispatch_uid="visit_tracking_check_in_progress_on_post_save"
@@ -8,11 +18,112 @@ from django.dispatch import receiver
 def visit_tracking_check_in_progress_on_post_save(
     sender, instance, raw, created, using, **kwargs
 ):
-    """Calls post_save method on the visit tracking instance.
-    """
+    """Calls post_save method on the visit tracking instance."""
     if not raw:
         try:
             instance.post_save_check_appointment_in_progress()
         except AttributeError as e:
             if "post_save_check_appointment_in_progress" not in str(e):
                 raise
+
+
+@receiver(pre_save, weak=False, dispatch_uid="get_derived_keys_on_pre_save")
+def get_derived_keys_on_pre_save(sender, instance, raw, using, **kwargs):
+    """Keeps the derived table keys of the stored row, e.g. its
+    date bucket, on the instance.
+    """
+    if not raw and isinstance(instance, (VisitModelMixin, CrfModelMixin)):
+        instance._derived_keys = (
+            None
+            if instance._state.adding
+            else get_stored_derived_keys(sender, [instance.pk], using=using).get(
+                instance.pk
+            )
+        )
+
+
+@receiver(post_save, weak=False, dispatch_uid="update_derived_tables_on_post_save")
+def update_derived_tables_on_post_save(sender, instance, raw, created, using, **kwargs):
+    """Refreshes the derived tables, e.g. digests, change log and
+    rollups, for a saved visit or CRF.
+    """
+    if not raw and isinstance(instance, (VisitModelMixin, CrfModelMixin)):
+        if created:
+            update_derived_tables(sender, created=[instance], using=using)
+        else:
+            update_derived_tables(
+                sender,
+                updated=[(instance, getattr(instance, "_derived_keys", None))],
+                using=using,
+            )
+
+
+@receiver(post_delete, weak=False, dispatch_uid="delete_derived_tables_on_post_delete")
+def delete_derived_tables_on_post_delete(sender, instance, using, **kwargs):
+    """Removes a deleted visit or CRF from the derived tables.
+    """
+    if isinstance(instance, (VisitModelMixin, CrfModelMixin)):
+        delete_derived_tables(sender, instance, using=using)
+
+
+@receiver(post_save, weak=False, dispatch_uid="evict_identity_map_on_post_save")
+def evict_identity_map_on_post_save(sender, instance, raw, created, using, **kwargs):
+    """Evicts instances of the saved model from the active
+    identity map, if any.
+    """
+    active = get_identity_map()
+    if active is not None:
+        active.evict(sender)
+
+
+@receiver(post_delete, weak=False, dispatch_uid="evict_identity_map_on_post_delete")
+def evict_identity_map_on_post_delete(sender, instance, using, **kwargs):
+    """Evicts instances of the deleted model from the active
+    identity map, if any.
+    """
+    active = get_identity_map()
+    if active is not None:
+        active.evict(sender)
+
+
+@receiver(post_save, weak=False, dispatch_uid="bump_timeline_version_on_post_save")
+def bump_timeline_version_on_post_save(sender, instance, raw, **kwargs):
+    """Bumps the subject's timeline version for a saved
+    appointment or metadata instance.
+    """
+    if not raw:
+        bump_related_timeline_version(sender, lambda: instance.subject_identifier)
+
+
+@receiver(post_delete, weak=False, dispatch_uid="bump_timeline_version_on_post_delete")
+def bump_timeline_version_on_post_delete(sender, instance, **kwargs):
+    """Bumps the subject's timeline version for a deleted
+    appointment or metadata instance.
+    """
+    bump_related_timeline_version(sender, lambda: instance.subject_identifier)
+
+
+@receiver(
+    post_save,
+    sender="edc_facility.holiday",
+    weak=False,
+    dispatch_uid="clear_working_day_calendars_on_post_save",
+)
+def clear_working_day_calendars_on_post_save(sender, instance, raw, **kwargs):
+    """Clears the cached working day calendars when a holiday is
+    saved.
+    """
+    clear_working_day_calendars()
+
+
+@receiver(
+    post_delete,
+    sender="edc_facility.holiday",
+    weak=False,
+    dispatch_uid="clear_working_day_calendars_on_post_delete",
+)
+def clear_working_day_calendars_on_post_delete(sender, instance, **kwargs):
+    """Clears the cached working day calendars when a holiday is
+    deleted.
+    """
+    clear_working_day_calendars()
@@ -0,0 +1,214 @@
+import json
+import os
+import shutil
+
+from datetime import date
+from django.db.models.functions import TruncDate
+from edc_utils import get_utcnow
+from itertools import islice
+
+from .date_buckets import get_site_lookup
+
+try:
+    import numpy as np
+    from numpy.lib.format import open_memmap
+except ImportError:  # pragma: no cover
+    np = None
+
+CATEGORY = "category"
+DATE = "date"
+INTEGER = "integer"
+
+CATEGORY_NULL = -1
+INTEGER_NULL = -(2 ** 31)
+EPOCH = date(1970, 1, 1)
+MANIFEST = "snapshot.json"
+
+SNAPSHOT_COLUMNS = [
+    ("subject_identifier", "subject_identifier", CATEGORY),
+    ("visit_schedule_name", "visit_schedule_name", CATEGORY),
+    ("schedule_name", "schedule_name", CATEGORY),
+    ("visit_code", "visit_code", CATEGORY),
+    ("visit_code_sequence", "visit_code_sequence", INTEGER),
+    ("reason", "reason", CATEGORY),
+    ("survival_status", "survival_status", CATEGORY),
+    ("report_date", "snapshot_report_date", DATE),
+    ("appt_date", "snapshot_appt_date", DATE),
+    ("last_alive_date", "last_alive_date", DATE),
+]
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def get_snapshot_columns(model_cls):
+    """Returns a list of (name, lookup, kind) for the visit model.
+    """
+    site_lookup = get_site_lookup(model_cls)
+    return SNAPSHOT_COLUMNS + (
+        [("site_id", site_lookup, INTEGER)] if site_lookup else []
+    )
+
+
+def encode(values, kind, codes):
+    """Returns a list of int32 values for a column chunk.
+
+    Categories are encoded with `codes`, a dict of {value: code}
+    updated in place. Dates are days since 1970-01-01.
+    """
+    if kind == CATEGORY:
+        return [
+            CATEGORY_NULL if v is None else codes.setdefault(v, len(codes))
+            for v in values
+        ]
+    elif kind == DATE:
+        return [INTEGER_NULL if v is None else (v - EPOCH).days for v in values]
+    return [INTEGER_NULL if v is None else v for v in values]
+
+
+def write_visit_snapshot(path, queryset, chunk_size=None):
+    """Writes the visits in `queryset` to directory `path` as one
+    int32 .npy file per column plus a .labels.npy file per
+    dictionary-encoded column and a manifest.
+
+    Rows are ordered by subject and timepoint so that each
+    subject's timeline is contiguous. Rows are streamed in
+    chunks into memory-mapped files. The snapshot is written to
+    a temporary directory and renamed into place.
+
+    Returns the number of rows written.
+    """
+    if np is None:
+        raise SnapshotError("numpy is required to write a snapshot.")
+    if os.path.exists(path):
+        raise SnapshotError(f"Snapshot path exists. Got {path}.")
+    chunk_size = chunk_size or 10000
+    columns = get_snapshot_columns(queryset.model)
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    length = queryset.count()
+    arrays = {
+        name: open_memmap(
+            os.path.join(tmp_path, f"{name}.npy"),
+            mode="w+",
+            dtype=np.int32,
+            shape=(length,),
+        )
+        for name, _, _ in columns
+    }
+    codes = {name: {} for name, _, kind in columns if kind == CATEGORY}
+    rows = (
+        queryset.annotate(
+            snapshot_report_date=TruncDate("report_datetime"),
+            snapshot_appt_date=TruncDate("appointment__appt_datetime"),
+        )
+        .order_by(
+            "subject_identifier",
+            "visit_schedule_name",
+            "schedule_name",
+            "appointment__timepoint",
+            "visit_code_sequence",
+        )
+        .values_list(*[lookup for _, lookup, _ in columns])
+        .iterator(chunk_size=chunk_size)
+    )
+    written = 0
+    while written < length:
+        chunk = list(islice(rows, min(chunk_size, length - written)))
+        if not chunk:
+            break
+        for (name, _, kind), values in zip(columns, zip(*chunk)):
+            arrays[name][written : written + len(chunk)] = encode(
+                values, kind, codes.get(name)
+            )
+        written += len(chunk)
+    for array in arrays.values():
+        array.flush()
+    del arrays
+    for name, value_codes in codes.items():
+        np.save(
+            os.path.join(tmp_path, f"{name}.labels.npy"),
+            np.array(list(value_codes), dtype=str),
+        )
+    with open(os.path.join(tmp_path, MANIFEST), "w") as f:
+        json.dump(
+            dict(
+                model=queryset.model._meta.label_lower,
+                created=get_utcnow().isoformat(),
+                rows=written,
+                columns=[dict(name=name, kind=kind) for name, _, kind in columns],
+            ),
+            f,
+        )
+    os.rename(tmp_path, path)
+    return written
+
+
+class VisitSnapshot:
+
+    """A read-only, memory-mapped visit snapshot written by
+    `write_visit_snapshot`.
+
+    Columns are int32 arrays shared between processes that map
+    the same files. Filter on codes without decoding, e.g.:
+
+        snapshot = VisitSnapshot(path)
+        missed = snapshot["reason"] == snapshot.get_code("reason", "missed")
+        snapshot.get_dates("report_date")[missed]
+    """
+
+    def __init__(self, path):
+        if np is None:
+            raise SnapshotError("numpy is required to load a snapshot.")
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.kinds = {c.get("name"): c.get("kind") for c in self.manifest["columns"]}
+        self.columns = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")[: len(self)]
+            for name in self.kinds
+        }
+        self.labels = {
+            name: np.load(os.path.join(path, f"{name}.labels.npy"), mmap_mode="r")
+            for name, kind in self.kinds.items()
+            if kind == CATEGORY
+        }
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(path={self.path})"
+
+    def __len__(self):
+        return self.manifest.get("rows")
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def get_code(self, name, value):
+        """Returns the code of `value` in a category column or
+        None.
+        """
+        codes = np.flatnonzero(self.labels[name] == value)
+        return int(codes[0]) if len(codes) else None
+
+    def decode(self, name):
+        """Returns an object array of the values of a category
+        column with None for nulls.
+        """
+        # CATEGORY_NULL (-1) indexes the appended None
+        labels = np.append(np.asarray(self.labels[name], dtype=object), [None])
+        return labels[self.columns[name]]
+
+    def get_dates(self, name):
+        """Returns a datetime64[D] array of a date column with NaT
+        for nulls.
+        """
+        days = self.columns[name]
+        dates = days.astype("datetime64[D]")
+        dates[days == INTEGER_NULL] = np.datetime64("NaT")
+        return dates
+
+
+def load_visit_snapshot(path):
+    return VisitSnapshot(path)
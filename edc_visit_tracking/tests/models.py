@@ -1,5 +1,6 @@
 from django.db import models
 from django.db.models.deletion import PROTECT
+from django_crypto_fields.fields import EncryptedCharField
 from edc_appointment.models import Appointment
 from edc_identifier.model_mixins import NonUniqueSubjectIdentifierFieldMixin
 from edc_model.models import BaseUuidModel
@@ -82,6 +83,8 @@ class CrfOne(CrfModelMixin, BaseUuidModel):
 
     f3 = models.CharField(max_length=50, null=True)
 
+    f4 = EncryptedCharField(null=True, blank=True)
+
 
 class OtherModel(BaseUuidModel):
 
@@ -0,0 +1,96 @@
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase, tag
+from django.test.client import RequestFactory
+from edc_appointment.models import Appointment
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.admin_site import edc_visit_tracking_admin
+from edc_visit_tracking.constants import SCHEDULED
+from edc_visit_tracking.modeladmin_mixins import AppointmentAutocompleteSelect
+
+from ..helper import Helper
+from ..models import SubjectVisit
+from ..visit_schedule import visit_schedule1, visit_schedule2
+from .test_modeladmin import SubjectVisitModelAdmin  # noqa
+
+
+class TestAppointmentAutocomplete(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        for subject_identifier in ["12345", "67890"]:
+            self.helper_cls(
+                subject_identifier=subject_identifier
+            ).consent_and_put_on_schedule()
+        self.appointment = Appointment.objects.filter(
+            subject_identifier="12345"
+        ).order_by("timepoint", "visit_code_sequence")[0]
+        SubjectVisit.objects.create(appointment=self.appointment, reason=SCHEDULED)
+        self.modeladmin = edc_visit_tracking_admin._registry.get(SubjectVisit)
+        self.modeladmin.use_appointment_autocomplete = True
+        self.user = User.objects.create_superuser("erik", "erik@example.com", "x")
+
+    def tearDown(self):
+        self.modeladmin.use_appointment_autocomplete = False
+
+    def get_results(self, **data):
+        request = RequestFactory().get("/", data)
+        request.user = self.user
+        response = self.modeladmin.appointment_autocomplete_view(request)
+        return json.loads(response.content)
+
+    def test_excludes_appointments_with_visit(self):
+        data = self.get_results(term="123")
+        ids = [result.get("id") for result in data.get("results")]
+        expected = Appointment.objects.filter(subject_identifier="12345").exclude(
+            pk=self.appointment.pk
+        )
+        self.assertEqual(len(ids), expected.count())
+        self.assertNotIn(str(self.appointment.pk), ids)
+        self.assertEqual(
+            set(ids), {str(pk) for pk in expected.values_list("pk", flat=True)}
+        )
+        self.assertFalse(data.get("pagination").get("more"))
+
+    def test_paginates(self):
+        self.modeladmin.appointment_autocomplete_paginate_by = 2
+        try:
+            data = self.get_results(page=1)
+            self.assertEqual(len(data.get("results")), 2)
+            self.assertTrue(data.get("pagination").get("more"))
+            self.assertTrue(data.get("results")[0].get("text").startswith("12345"))
+        finally:
+            self.modeladmin.appointment_autocomplete_paginate_by = 20
+
+    def test_opt_in(self):
+        self.modeladmin.use_appointment_autocomplete = False
+        request = RequestFactory().get("/")
+        request.user = self.user
+        formfield = self.modeladmin.formfield_for_foreignkey(
+            SubjectVisit._meta.get_field("appointment"), request
+        )
+        self.assertNotIsInstance(formfield.widget, AppointmentAutocompleteSelect)
+
+    def test_formfield_widget(self):
+        request = RequestFactory().get("/")
+        request.user = self.user
+        formfield = self.modeladmin.formfield_for_foreignkey(
+            SubjectVisit._meta.get_field("appointment"), request
+        )
+        self.assertIsInstance(formfield.widget, AppointmentAutocompleteSelect)
+        self.assertIn("appointment_autocomplete", formfield.widget.get_url())
+        self.assertEqual(
+            formfield.queryset.count(),
+            Appointment.objects.filter(site_id=self.appointment.site_id).count(),
+        )
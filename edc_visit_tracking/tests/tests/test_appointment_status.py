@@ -0,0 +1,153 @@
+from django.apps import apps as django_apps
+from django.db import transaction
+from django.test import TransactionTestCase, tag
+from edc_appointment.constants import IN_PROGRESS_APPT, COMPLETE_APPT
+from edc_appointment.models import Appointment
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.appointment_status import apply_deferred_appointment_status
+from edc_visit_tracking.constants import SCHEDULED, MISSED_VISIT
+
+from unittest.mock import patch
+
+from ..helper import Helper
+from ..models import SubjectVisit
+from ..visit_schedule import visit_schedule1, visit_schedule2
+
+
+class TestDeferredAppointmentStatus(TransactionTestCase):
+
+    helper_cls = Helper
+
+    def setUp(self):
+        import_holidays()
+        self.app_config = django_apps.get_app_config("edc_visit_tracking")
+        self.app_config.defer_appointment_status = True
+        self.subject_identifier = "12345"
+        self.helper = self.helper_cls(subject_identifier=self.subject_identifier)
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        self.helper.consent_and_put_on_schedule()
+        self.appointments = Appointment.objects.all().order_by(
+            "timepoint", "visit_code_sequence"
+        )
+
+    def tearDown(self):
+        self.app_config.defer_appointment_status = False
+
+    def test_applied_on_commit(self):
+        with transaction.atomic():
+            subject_visit = SubjectVisit.objects.create(
+                appointment=self.appointments[0], reason=SCHEDULED
+            )
+            self.assertNotEqual(
+                Appointment.objects.get(pk=self.appointments[0].pk).appt_status,
+                IN_PROGRESS_APPT,
+            )
+            subject_visit.reason = MISSED_VISIT
+            subject_visit.save()
+        self.assertEqual(
+            Appointment.objects.get(pk=self.appointments[0].pk).appt_status,
+            COMPLETE_APPT,
+        )
+
+    def test_one_update_per_status(self):
+        self.app_config.timeline_versions = False
+        try:
+            with transaction.atomic():
+                for appointment in self.appointments[0:3]:
+                    subject_visit = SubjectVisit.objects.create(
+                        appointment=appointment, reason=SCHEDULED
+                    )
+                subject_visit.reason = MISSED_VISIT
+                subject_visit.save()
+                # one query for the visits, one UPDATE per status
+                with self.assertNumQueries(3):
+                    apply_deferred_appointment_status(using="default")
+        finally:
+            self.app_config.timeline_versions = True
+        self.assertEqual(
+            Appointment.objects.filter(appt_status=IN_PROGRESS_APPT).count(), 2
+        )
+        self.assertEqual(
+            Appointment.objects.get(pk=self.appointments[2].pk).appt_status,
+            COMPLETE_APPT,
+        )
+
+    def test_one_callback_per_transaction(self):
+        with patch(
+            "edc_visit_tracking.appointment_status.transaction.on_commit"
+        ) as on_commit:
+            with transaction.atomic():
+                for appointment in self.appointments[0:3]:
+                    SubjectVisit.objects.create(
+                        appointment=appointment, reason=SCHEDULED
+                    )
+        self.assertEqual(on_commit.call_count, 1)
+
+    def test_discarded_on_savepoint_rollback(self):
+        with transaction.atomic():
+            subject_visit = SubjectVisit.objects.create(
+                appointment=self.appointments[0], reason=SCHEDULED
+            )
+            try:
+                with transaction.atomic():
+                    subject_visit.reason = MISSED_VISIT
+                    subject_visit.save()
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(
+            Appointment.objects.get(pk=self.appointments[0].pk).appt_status,
+            IN_PROGRESS_APPT,
+        )
+
+    def test_registered_again_after_savepoint_rollback(self):
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    SubjectVisit.objects.create(
+                        appointment=self.appointments[0], reason=SCHEDULED
+                    )
+                    raise ValueError
+            except ValueError:
+                pass
+            SubjectVisit.objects.create(
+                appointment=self.appointments[0], reason=MISSED_VISIT
+            )
+        self.assertEqual(
+            Appointment.objects.get(pk=self.appointments[0].pk).appt_status,
+            COMPLETE_APPT,
+        )
+
+    def test_not_applied_after_rollback(self):
+        try:
+            with transaction.atomic():
+                SubjectVisit.objects.create(
+                    appointment=self.appointments[0], reason=SCHEDULED
+                )
+                raise ValueError
+        except ValueError:
+            pass
+        with transaction.atomic():
+            SubjectVisit.objects.create(
+                appointment=self.appointments[0], reason=MISSED_VISIT
+            )
+        self.assertEqual(
+            Appointment.objects.get(pk=self.appointments[0].pk).appt_status,
+            COMPLETE_APPT,
+        )
+
+    def test_discarded_on_rollback(self):
+        try:
+            with transaction.atomic():
+                SubjectVisit.objects.create(
+                    appointment=self.appointments[0], reason=SCHEDULED
+                )
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(
+            Appointment.objects.filter(appt_status=IN_PROGRESS_APPT).count(), 0
+        )
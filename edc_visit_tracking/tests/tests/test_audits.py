@@ -0,0 +1,106 @@
+from dateutil.relativedelta import relativedelta
+from django.core.management import call_command
+from django.test import TestCase
+from edc_appointment.models import Appointment
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.audits import (
+    CRF_DATE,
+    SEQUENCE,
+    SUBJECT_HASH,
+    VISIT_REASON,
+    AuditError,
+    AuditReport,
+    get_audit_shards,
+)
+from edc_visit_tracking.constants import MISSED_VISIT, SCHEDULED
+from io import StringIO
+
+from ..helper import Helper
+from ..models import SubjectVisit, CrfOne
+from ..visit_schedule import visit_schedule1, visit_schedule2
+
+
+class TestAudits(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        for subject_identifier in ["12345", "67890"]:
+            self.helper_cls(
+                subject_identifier=subject_identifier
+            ).consent_and_put_on_schedule()
+            for appointment in Appointment.objects.filter(
+                subject_identifier=subject_identifier
+            ).order_by("timepoint", "visit_code_sequence")[0:2]:
+                subject_visit = SubjectVisit.objects.create(
+                    appointment=appointment,
+                    reason=SCHEDULED,
+                    report_datetime=appointment.appt_datetime,
+                )
+                if subject_identifier == "12345" and appointment.timepoint == 0:
+                    CrfOne.objects.create(
+                        subject_visit=subject_visit,
+                        report_datetime=appointment.appt_datetime,
+                    )
+
+    def test_shards(self):
+        site_id = SubjectVisit.objects.all()[0].site_id
+        self.assertEqual(
+            get_audit_shards(SubjectVisit), [(site_id, ["12345", "67890"])]
+        )
+        shards = get_audit_shards(SubjectVisit, by=SUBJECT_HASH, shards=4)
+        self.assertEqual(
+            sorted(s for _, subjects in shards for s in subjects), ["12345", "67890"]
+        )
+        self.assertEqual(
+            shards, get_audit_shards(SubjectVisit, by=SUBJECT_HASH, shards=4)
+        )
+        self.assertRaises(AuditError, get_audit_shards, SubjectVisit, by="visit_code")
+
+    def test_clean(self):
+        report = AuditReport(workers=1)
+        self.assertEqual(report.findings, [])
+        self.assertEqual(report.subjects, 2)
+
+    def test_findings(self):
+        visits = SubjectVisit.objects.filter(subject_identifier="12345").order_by(
+            "report_datetime"
+        )
+        SubjectVisit.objects.filter(pk=visits[1].pk).update(reason=MISSED_VISIT)
+        CrfOne.objects.filter(subject_visit=visits[0]).update(
+            report_datetime=visits[0].report_datetime + relativedelta(days=31)
+        )
+        SubjectVisit.objects.filter(
+            subject_identifier="67890", visit_code="1000"
+        ).delete()
+        for by in [None, SUBJECT_HASH]:
+            with self.subTest(by=by):
+                report = AuditReport(by=by, shards=2, workers=1)
+                self.assertEqual(
+                    [(f.check, f.subject_identifier) for f in report.findings],
+                    [
+                        (CRF_DATE, "12345"),
+                        (SEQUENCE, "67890"),
+                        (VISIT_REASON, "12345"),
+                    ],
+                )
+
+    def test_command(self):
+        SubjectVisit.objects.filter(
+            subject_identifier="67890", visit_code="1000"
+        ).delete()
+        out = StringIO()
+        call_command("audit_visits", "--workers=1", stdout=out, stderr=StringIO())
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0].split(",")[0], "check")
+        self.assertEqual(len(lines), 2)
+        self.assertIn("67890", lines[1])
@@ -0,0 +1,180 @@
+from datetime import timedelta
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.test import TestCase, tag
+from edc_appointment.models import Appointment
+from edc_facility.import_holidays import import_holidays
+from edc_utils import get_utcnow
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.constants import SCHEDULED, CREATED, UPDATED, DELETED
+from edc_visit_tracking.models import ChangeLog, ExportWatermark
+from io import StringIO
+
+from ..helper import Helper
+from ..models import SubjectVisit, CrfOne
+from ..visit_schedule import visit_schedule1, visit_schedule2
+
+
+class TestChangeLog(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        self.subject_identifier = "12345"
+        self.helper = self.helper_cls(subject_identifier=self.subject_identifier)
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        self.helper.consent_and_put_on_schedule()
+        self.appointment = Appointment.objects.all().order_by(
+            "timepoint", "visit_code_sequence"
+        )[0]
+
+    def test_log_create_update_delete(self):
+        subject_visit = SubjectVisit.objects.create(
+            appointment=self.appointment, reason=SCHEDULED
+        )
+        crf_one = CrfOne.objects.create(subject_visit=subject_visit)
+        crf_one.save()
+        crf_one.delete()
+        self.assertEqual(
+            [(obj.label_lower, obj.operation) for obj in ChangeLog.objects.all()],
+            [
+                ("edc_visit_tracking.subjectvisit", CREATED),
+                ("edc_visit_tracking.crfone", CREATED),
+                ("edc_visit_tracking.crfone", UPDATED),
+                ("edc_visit_tracking.crfone", DELETED),
+            ],
+        )
+        self.assertEqual(
+            ChangeLog.objects.last().subject_identifier, self.subject_identifier
+        )
+
+    def test_log_rolled_back_with_change(self):
+        subject_visit = SubjectVisit.objects.create(
+            appointment=self.appointment, reason=SCHEDULED
+        )
+        try:
+            with transaction.atomic():
+                CrfOne.objects.create(subject_visit=subject_visit)
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(ChangeLog.objects.all().count(), 1)
+
+    def test_read_with_cursor(self):
+        subject_visit = SubjectVisit.objects.create(
+            appointment=self.appointment, reason=SCHEDULED
+        )
+        entries, cursor = ChangeLog.objects.read()
+        self.assertEqual(len(entries), 1)
+        entries, cursor = ChangeLog.objects.read(cursor=cursor)
+        self.assertEqual(entries, [])
+        CrfOne.objects.create(subject_visit=subject_visit)
+        entries, next_cursor = ChangeLog.objects.read(
+            cursor=cursor, label_lowers=["edc_visit_tracking.crfone"]
+        )
+        self.assertEqual(len(entries), 1)
+        self.assertGreater(next_cursor, cursor)
+
+    def test_compact(self):
+        subject_visit = SubjectVisit.objects.create(
+            appointment=self.appointment, reason=SCHEDULED
+        )
+        for _ in range(3):
+            subject_visit.save()
+        self.assertEqual(ChangeLog.objects.all().count(), 4)
+        call_command(
+            "compact_change_log",
+            sequence=ChangeLog.objects.last().sequence,
+            stdout=StringIO(),
+        )
+        self.assertEqual(ChangeLog.objects.get().operation, UPDATED)
+
+    def test_compact_requires_sequence_without_watermarks(self):
+        SubjectVisit.objects.create(appointment=self.appointment, reason=SCHEDULED)
+        self.assertRaises(
+            CommandError, call_command, "compact_change_log", stdout=StringIO()
+        )
+        self.assertEqual(ChangeLog.objects.all().count(), 1)
+
+    def test_compact_defaults_to_lowest_watermark(self):
+        subject_visit = SubjectVisit.objects.create(
+            appointment=self.appointment, reason=SCHEDULED
+        )
+        subject_visit.save()
+        sequence = ChangeLog.objects.last().sequence
+        ExportWatermark.objects.create(
+            consumer="fast", label_lower="edc_visit_tracking.subjectvisit"
+        )
+        ExportWatermark.objects.create(
+            consumer="slow", label_lower="edc_visit_tracking.subjectvisit"
+        )
+        ExportWatermark.objects.filter(consumer="fast").update(sequence=sequence)
+        subject_visit.delete()
+        call_command("compact_change_log", stdout=StringIO())
+        self.assertEqual(ChangeLog.objects.all().count(), 3)
+        ExportWatermark.objects.filter(consumer="slow").update(sequence=sequence)
+        call_command("compact_change_log", stdout=StringIO())
+        self.assertEqual(
+            list(ChangeLog.objects.values_list("operation", flat=True)),
+            [UPDATED, DELETED],
+        )
+
+    def test_read_stops_at_gap(self):
+        subject_visit = SubjectVisit.objects.create(
+            appointment=self.appointment, reason=SCHEDULED
+        )
+        _, cursor = ChangeLog.objects.read()
+        for _ in range(3):
+            subject_visit.save()
+        # an entry of a transaction not yet committed
+        in_flight = ChangeLog.objects.order_by("sequence")[2].sequence
+        ChangeLog.objects.filter(sequence=in_flight).delete()
+        entries, next_cursor = ChangeLog.objects.read(cursor=cursor)
+        self.assertEqual(len(entries), 1)
+        entries, next_cursor = ChangeLog.objects.read(cursor=next_cursor)
+        self.assertEqual(entries, [])
+        # old enough to have been rolled back
+        ChangeLog.objects.filter(sequence__gt=in_flight).update(
+            timestamp=get_utcnow() - timedelta(hours=1)
+        )
+        entries, last_cursor = ChangeLog.objects.read(cursor=next_cursor)
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(last_cursor, ChangeLog.objects.last().sequence)
+
+    def test_read_filtered_does_not_stop_at_other_models(self):
+        subject_visit = SubjectVisit.objects.create(
+            appointment=self.appointment, reason=SCHEDULED
+        )
+        CrfOne.objects.create(subject_visit=subject_visit)
+        subject_visit.save()
+        entries, cursor = ChangeLog.objects.read(
+            label_lowers=["edc_visit_tracking.subjectvisit"]
+        )
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(cursor, ChangeLog.objects.last().sequence)
+
+    def test_compact_keeps_last_entries(self):
+        subject_visit = SubjectVisit.objects.create(
+            appointment=self.appointment, reason=SCHEDULED
+        )
+        crf_one = CrfOne.objects.create(subject_visit=subject_visit)
+        for _ in range(2):
+            subject_visit.save()
+            crf_one.save()
+        cursor = ChangeLog.objects.last().sequence
+        self.assertEqual(ChangeLog.objects.compact(cursor), 4)
+        self.assertEqual(
+            list(ChangeLog.objects.values_list("label_lower", "operation")),
+            [
+                ("edc_visit_tracking.subjectvisit", UPDATED),
+                ("edc_visit_tracking.crfone", UPDATED),
+            ],
+        )
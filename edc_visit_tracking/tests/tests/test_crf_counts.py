@@ -0,0 +1,96 @@
+from django.apps import apps as django_apps
+from django.core.management import call_command
+from django.test import TestCase
+from edc_appointment.models import Appointment
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.constants import SCHEDULED
+from edc_visit_tracking.crf_counts import reconcile_visit_crf_counts
+from edc_visit_tracking.models import VisitCrfCount
+from io import StringIO
+
+from ..helper import Helper
+from ..models import SubjectVisit, CrfOne
+from ..visit_schedule import visit_schedule1, visit_schedule2
+
+
+class TestCrfCounts(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        self.app_config = django_apps.get_app_config("edc_visit_tracking")
+        self.app_config.visit_crf_counts = True
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        self.helper_cls(subject_identifier="12345").consent_and_put_on_schedule()
+        self.visits = []
+        for appointment in Appointment.objects.filter(
+            subject_identifier="12345"
+        ).order_by("timepoint", "visit_code_sequence")[0:2]:
+            self.visits.append(
+                SubjectVisit.objects.create(
+                    appointment=appointment,
+                    reason=SCHEDULED,
+                    report_datetime=appointment.appt_datetime,
+                )
+            )
+
+    def tearDown(self):
+        self.app_config.visit_crf_counts = False
+
+    def get_counts(self):
+        return {
+            visit_pk: (obj.crfs, obj.requisitions)
+            for visit_pk, obj in VisitCrfCount.objects.get_many(self.visits).items()
+        }
+
+    def test_counts(self):
+        crf_one = CrfOne.objects.create(subject_visit=self.visits[0])
+        CrfOne.objects.create(subject_visit=self.visits[0])
+        self.assertEqual(self.get_counts(), {self.visits[0].pk: (2, 0)})
+        obj = VisitCrfCount.objects.get(visit_pk=str(self.visits[0].pk))
+        self.assertEqual(obj.subject_identifier, "12345")
+        self.assertEqual(obj.site_id, self.visits[0].site_id)
+        crf_one.f1 = "changed"
+        crf_one.save()
+        self.assertEqual(self.get_counts(), {self.visits[0].pk: (2, 0)})
+        crf_one.subject_visit = self.visits[1]
+        crf_one.save()
+        self.assertEqual(
+            self.get_counts(), {self.visits[0].pk: (1, 0), self.visits[1].pk: (1, 0)},
+        )
+        crf_one.delete()
+        self.assertEqual(self.get_counts(), {self.visits[0].pk: (1, 0)})
+
+    def test_disabled(self):
+        self.app_config.visit_crf_counts = False
+        CrfOne.objects.create(subject_visit=self.visits[0])
+        self.assertEqual(self.get_counts(), {})
+
+    def test_reconcile(self):
+        CrfOne.objects.create(subject_visit=self.visits[0])
+        CrfOne.objects.create(subject_visit=self.visits[1])
+        VisitCrfCount.objects.filter(visit_pk=str(self.visits[0].pk)).update(crfs=5)
+        VisitCrfCount.objects.filter(visit_pk=str(self.visits[1].pk)).delete()
+        VisitCrfCount.objects.create(
+            label_lower="edc_visit_tracking.subjectvisit",
+            visit_pk="stale",
+            subject_identifier="12345",
+            crfs=1,
+        )
+        self.assertEqual(reconcile_visit_crf_counts(), 3)
+        self.assertEqual(
+            self.get_counts(), {self.visits[0].pk: (1, 0), self.visits[1].pk: (1, 0)},
+        )
+        self.assertEqual(VisitCrfCount.objects.count(), 2)
+        self.assertEqual(reconcile_visit_crf_counts(SubjectVisit), 0)
+        out = StringIO()
+        call_command("reconcile_crf_counts", stdout=out)
+        self.assertIn("Repaired 0", out.getvalue())
@@ -0,0 +1,122 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.test.client import RequestFactory
+from edc_appointment.models import Appointment
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.admin_site import edc_visit_tracking_admin
+from edc_visit_tracking.constants import SCHEDULED
+from edc_visit_tracking.crf_registry import (
+    CrfRegistry,
+    CrfRegistryError,
+    site_crfs,
+)
+
+from uuid import UUID
+
+from ..helper import Helper
+from ..models import SubjectVisit, CrfOne, CrfOneInline, OtherModel
+from ..visit_schedule import visit_schedule1, visit_schedule2
+from .test_modeladmin import SubjectVisitModelAdmin  # noqa
+
+
+class TestCrfRegistry(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        self.helper_cls(subject_identifier="12345").consent_and_put_on_schedule()
+        self.visits = []
+        for appointment in Appointment.objects.filter(
+            subject_identifier="12345"
+        ).order_by("timepoint", "visit_code_sequence")[0:2]:
+            self.visits.append(
+                SubjectVisit.objects.create(
+                    appointment=appointment,
+                    reason=SCHEDULED,
+                    report_datetime=appointment.appt_datetime,
+                )
+            )
+        self.crf_one = CrfOne.objects.create(subject_visit=self.visits[0])
+        self.inline = CrfOneInline.objects.create(
+            crf_one=self.crf_one, other_model=OtherModel.objects.create()
+        )
+
+    def test_registry(self):
+        entry = site_crfs.registry.get("edc_visit_tracking.crfone")
+        self.assertEqual(entry.visit_model_cls, SubjectVisit)
+        self.assertEqual(entry.visit_lookup, "subject_visit_id")
+        self.assertFalse(entry.inline)
+        entry = site_crfs.registry.get("edc_visit_tracking.crfoneinline")
+        self.assertEqual(entry.visit_lookup, "crf_one__subject_visit_id")
+        self.assertTrue(entry.inline)
+        self.assertEqual(site_crfs.get_models(SubjectVisit), [CrfOne])
+        self.assertRaises(CrfRegistryError, CrfRegistry().get_models)
+
+    def test_get_crfs(self):
+        with self.assertNumQueries(2):
+            crfs = site_crfs.get_crfs(self.visits[0])
+        self.assertEqual(crfs, {"edc_visit_tracking.crfone": [self.crf_one]})
+        with self.assertNumQueries(1):
+            self.assertEqual(site_crfs.get_crfs(self.visits[1]), {})
+
+    def test_get_crfs_for_visits(self):
+        with self.assertNumQueries(3):
+            crfs = site_crfs.get_crfs_for_visits(self.visits, inline=True)
+        self.assertEqual(
+            crfs,
+            {
+                self.visits[0].pk: {
+                    "edc_visit_tracking.crfone": [self.crf_one],
+                    "edc_visit_tracking.crfoneinline": [self.inline],
+                },
+                self.visits[1].pk: {},
+            },
+        )
+
+    def test_get_dependents(self):
+        with self.assertNumQueries(1):
+            dependents = site_crfs.get_dependents(
+                SubjectVisit, [visit.pk for visit in self.visits]
+            )
+        self.assertEqual(dependents, {self.visits[0].pk: ["edc_visit_tracking.crfone"]})
+        self.assertTrue(site_crfs.has_dependents(self.visits[0]))
+        self.assertFalse(site_crfs.has_dependents(self.visits[1]))
+        self.assertFalse(site_crfs.has_dependents(SubjectVisit()))
+
+    def test_delete_view(self):
+        modeladmin = edc_visit_tracking_admin._registry.get(SubjectVisit)
+        request = RequestFactory().get("/")
+        request.user = User.objects.create_superuser("erik", "erik@example.com", "x")
+        with self.assertNumQueries(1):
+            _, _, _, protected = modeladmin.get_deleted_objects(
+                [self.visits[0]], request
+            )
+        self.assertEqual(protected, [f"crf one: {self.visits[0]}"])
+        _, _, _, protected = modeladmin.get_deleted_objects([self.visits[1]], request)
+        self.assertEqual(protected, [])
+
+    def test_union_size(self):
+        registry = CrfRegistry()
+        registry.populate()
+        registry.union_size = 1
+        keys = registry.get_crf_keys(
+            SubjectVisit, [visit.pk for visit in self.visits], inline=True
+        )
+        self.assertEqual(
+            sorted((label_lower, UUID(pk)) for label_lower, pk, _ in keys),
+            sorted(
+                [
+                    ("edc_visit_tracking.crfone", self.crf_one.pk),
+                    ("edc_visit_tracking.crfoneinline", self.inline.pk),
+                ]
+            ),
+        )
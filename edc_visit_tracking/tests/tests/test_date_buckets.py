@@ -0,0 +1,201 @@
+from dateutil.relativedelta import relativedelta
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.contrib.sites.models import Site
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.db.models import Max, Min
+from django.test import TestCase, tag
+from django.test.client import RequestFactory
+from edc_appointment.models import Appointment
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.constants import SCHEDULED
+from edc_visit_tracking.date_buckets import (
+    DateBucketQuerySet,
+    get_report_date,
+    rebuild_date_buckets,
+    update_date_bucket,
+)
+from edc_visit_tracking.modeladmin_mixins import (
+    CrfModelAdminMixin,
+    DateBucketChangeList,
+)
+from edc_visit_tracking.models import DateBucket
+from io import StringIO
+
+from ..helper import Helper
+from ..models import SubjectVisit, CrfOne
+from ..visit_schedule import visit_schedule1, visit_schedule2
+
+
+class CrfOneModelAdmin(CrfModelAdminMixin, admin.ModelAdmin):
+
+    use_date_buckets = True
+
+
+class TestDateBuckets(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        self.crfs = []
+        for subject_identifier in ["12345", "67890"]:
+            self.helper_cls(
+                subject_identifier=subject_identifier
+            ).consent_and_put_on_schedule()
+            for appointment in Appointment.objects.filter(
+                subject_identifier=subject_identifier
+            ).order_by("timepoint", "visit_code_sequence")[0:2]:
+                subject_visit = SubjectVisit.objects.create(
+                    appointment=appointment,
+                    reason=SCHEDULED,
+                    report_datetime=appointment.appt_datetime,
+                )
+                self.crfs.append(
+                    CrfOne.objects.create(
+                        subject_visit=subject_visit,
+                        report_datetime=subject_visit.report_datetime,
+                    )
+                )
+
+    def get_buckets(self, label_lower):
+        return {
+            (obj.site_id, obj.report_date): obj.count
+            for obj in DateBucket.objects.filter(label_lower=label_lower)
+        }
+
+    def get_expected_buckets(self, model_cls):
+        buckets = {}
+        for obj in model_cls.objects.all():
+            site_id = (
+                obj.site_id if model_cls == SubjectVisit else obj.subject_visit.site_id
+            )
+            key = (site_id, get_report_date(obj.report_datetime))
+            buckets[key] = buckets.get(key, 0) + 1
+        return buckets
+
+    def test_maintained_on_save_and_delete(self):
+        for model_cls in [SubjectVisit, CrfOne]:
+            self.assertEqual(
+                self.get_buckets(model_cls._meta.label_lower),
+                self.get_expected_buckets(model_cls),
+            )
+        crf_one = self.crfs[0]
+        crf_one.report_datetime = crf_one.report_datetime + relativedelta(days=1)
+        crf_one.save()
+        self.crfs[1].delete()
+        self.assertEqual(
+            self.get_buckets("edc_visit_tracking.crfone"),
+            self.get_expected_buckets(CrfOne),
+        )
+
+    def test_rebuild(self):
+        expected = {
+            model_cls: self.get_buckets(model_cls._meta.label_lower)
+            for model_cls in [SubjectVisit, CrfOne]
+        }
+        DateBucket.objects.all().delete()
+        self.assertEqual(rebuild_date_buckets(CrfOne), len(expected[CrfOne]))
+        out = StringIO()
+        call_command("rebuild_date_buckets", stdout=out)
+        self.assertIn("date buckets", out.getvalue())
+        for model_cls, buckets in expected.items():
+            self.assertEqual(self.get_buckets(model_cls._meta.label_lower), buckets)
+
+    def test_null_site_unique(self):
+        report_date = get_report_date(self.crfs[0].report_datetime)
+        update_date_bucket("edc_visit_tracking.othermodel", None, report_date, 1)
+        update_date_bucket("edc_visit_tracking.othermodel", None, report_date, 1)
+        bucket = DateBucket.objects.get(label_lower="edc_visit_tracking.othermodel")
+        self.assertEqual((bucket.site_id, bucket.count), (None, 2))
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                DateBucket.objects.create(
+                    label_lower="edc_visit_tracking.othermodel",
+                    report_date=report_date,
+                    year=report_date.year,
+                    month=report_date.month,
+                    day=report_date.day,
+                )
+
+    def test_site_id_from_request(self):
+        modeladmin = CrfOneModelAdmin(CrfOne, admin.AdminSite())
+        request = RequestFactory().get("/")
+        request.site = Site.objects.get(pk=self.crfs[0].subject_visit.site_id)
+        self.assertEqual(modeladmin.get_date_bucket_site_id(request), request.site.id)
+
+    def test_opt_in(self):
+        class OptOutModelAdmin(CrfModelAdminMixin, admin.ModelAdmin):
+            pass
+
+        modeladmin = OptOutModelAdmin(CrfOne, admin.AdminSite())
+        request = RequestFactory().get("/")
+        request.user = User.objects.create_superuser("erik", "erik@example.com", "x")
+        self.assertNotIsInstance(
+            modeladmin.get_changelist_instance(request), DateBucketChangeList
+        )
+
+    def test_changelist_date_hierarchy(self):
+        modeladmin = CrfOneModelAdmin(CrfOne, admin.AdminSite())
+        user = User.objects.create_superuser("erik", "erik@example.com", "x")
+        request = RequestFactory().get("/")
+        request.user = user
+        changelist = modeladmin.get_changelist_instance(request)
+        self.assertIsInstance(changelist, DateBucketChangeList)
+        queryset = changelist.queryset
+        self.assertIsInstance(queryset, DateBucketQuerySet)
+        table = CrfOne.objects.all()
+        for kind in ["year", "month", "day"]:
+            with self.assertNumQueries(1):
+                dates = queryset.dates("report_datetime", kind)
+            self.assertEqual(
+                [d for d in dates], list(table.dates("report_datetime", kind))
+            )
+        date_range = table.aggregate(
+            first=Min("report_datetime"), last=Max("report_datetime")
+        )
+        self.assertEqual(
+            queryset.aggregate(
+                first=Min("report_datetime"), last=Max("report_datetime")
+            ),
+            {
+                "first": get_report_date(date_range["first"]),
+                "last": get_report_date(date_range["last"]),
+            },
+        )
+        self.assertEqual(len(changelist.result_list), 4)
+
+        report_date = get_report_date(self.crfs[0].report_datetime)
+        request = RequestFactory().get(
+            "/",
+            {
+                "report_datetime__year": report_date.year,
+                "report_datetime__month": report_date.month,
+            },
+        )
+        request.user = user
+        queryset = modeladmin.get_changelist_instance(request).queryset
+        self.assertIsNotNone(queryset.date_buckets)
+        self.assertEqual(
+            list(queryset.dates("report_datetime", "day")),
+            list(
+                table.filter(
+                    report_datetime__year=report_date.year,
+                    report_datetime__month=report_date.month,
+                ).dates("report_datetime", "day")
+            ),
+        )
+
+        request = RequestFactory().get("/", {"q": "12345"})
+        request.user = user
+        queryset = modeladmin.get_changelist_instance(request).queryset
+        self.assertNotIsInstance(queryset, DateBucketQuerySet)
@@ -0,0 +1,83 @@
+from django.test import TestCase, tag
+from edc_appointment.models import Appointment
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.constants import SCHEDULED
+from edc_visit_tracking.digests import MerkleTree, get_merkle_tree
+from edc_visit_tracking.models import SubjectDigest, TimelineDigest
+
+from ..helper import Helper
+from ..models import SubjectVisit, CrfOne
+from ..visit_schedule import visit_schedule1, visit_schedule2
+
+
+class TestDigests(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        self.subject_identifier = "12345"
+        self.helper = self.helper_cls(subject_identifier=self.subject_identifier)
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        self.helper.consent_and_put_on_schedule()
+        appointment = Appointment.objects.all().order_by(
+            "timepoint", "visit_code_sequence"
+        )[0]
+        self.subject_visit = SubjectVisit.objects.create(
+            appointment=appointment, reason=SCHEDULED
+        )
+
+    def test_digests_on_save(self):
+        self.assertEqual(TimelineDigest.objects.all().count(), 1)
+        subject_digest = SubjectDigest.objects.get(
+            subject_identifier=self.subject_identifier
+        )
+        crf_one = CrfOne.objects.create(subject_visit=self.subject_visit, f1="a")
+        self.assertEqual(TimelineDigest.objects.all().count(), 2)
+        digest = SubjectDigest.objects.get(
+            subject_identifier=self.subject_identifier
+        ).digest
+        self.assertNotEqual(digest, subject_digest.digest)
+        crf_one.f1 = "b"
+        crf_one.save()
+        self.assertNotEqual(
+            digest,
+            SubjectDigest.objects.get(
+                subject_identifier=self.subject_identifier
+            ).digest,
+        )
+        crf_one.delete()
+        self.assertEqual(
+            subject_digest.digest,
+            SubjectDigest.objects.get(
+                subject_identifier=self.subject_identifier
+            ).digest,
+        )
+
+    def test_digest_ignores_audit_fields(self):
+        digest = TimelineDigest.objects.get().digest
+        self.subject_visit.save()
+        self.assertEqual(digest, TimelineDigest.objects.get().digest)
+
+    def test_merkle_tree_diff(self):
+        subject_digests = [(str(i), f"digest{i}") for i in range(100)]
+        tree = MerkleTree(subject_digests, depth=4)
+        self.assertEqual(tree.diff(MerkleTree(subject_digests, depth=4)), [])
+        other_digests = subject_digests[:50] + [("50", "changed")]
+        other_digests += subject_digests[51:99] + [("new", "digest")]
+        other = MerkleTree(other_digests, depth=4)
+        self.assertNotEqual(tree.root, other.root)
+        self.assertEqual(tree.diff(other), ["50", "99", "new"])
+
+    def test_get_merkle_tree(self):
+        tree = get_merkle_tree(site_id=self.subject_visit.site_id)
+        self.assertEqual(
+            tree.diff(MerkleTree()), [self.subject_identifier],
+        )
@@ -0,0 +1,144 @@
+import csv
+import json
+
+from django.contrib.auth.models import Permission, User
+from django.test import TestCase, tag
+from django.test.client import RequestFactory
+from edc_appointment.models import Appointment
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.admin_site import edc_visit_tracking_admin
+from edc_visit_tracking.constants import SCHEDULED, UNSCHEDULED
+from io import StringIO
+
+from ..helper import Helper
+from ..models import SubjectVisit, CrfOne
+from ..visit_schedule import visit_schedule1, visit_schedule2
+from .test_modeladmin import CrfOneModelAdmin, SubjectVisitModelAdmin  # noqa
+
+
+class TestExport(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        for subject_identifier in ["12345", "67890"]:
+            self.helper_cls(
+                subject_identifier=subject_identifier
+            ).consent_and_put_on_schedule()
+            for appointment in Appointment.objects.filter(
+                subject_identifier=subject_identifier
+            ).order_by("timepoint", "visit_code_sequence")[0:2]:
+                subject_visit = SubjectVisit.objects.create(
+                    appointment=appointment, reason=SCHEDULED
+                )
+                CrfOne.objects.create(
+                    subject_visit=subject_visit, f1="blah", f4="secret"
+                )
+        self.user = User.objects.create_superuser("erik", "erik@example.com", "x")
+
+    def get_request(self, **data):
+        request = RequestFactory().get("/", data)
+        request.user = self.user
+        return request
+
+    def test_export_as_csv_action(self):
+        modeladmin = edc_visit_tracking_admin._registry.get(CrfOne)
+        request = self.get_request()
+        self.assertIn("export_as_csv", modeladmin.get_actions(request))
+        response = modeladmin.export_as_csv(request, CrfOne.objects.all())
+        with self.assertNumQueries(1):
+            content = b"".join(response.streaming_content).decode()
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(len(rows), 4)
+        for row in rows:
+            crf_one = CrfOne.objects.get(pk=row.get("id"))
+            self.assertEqual(
+                row.get("subject_identifier"), crf_one.subject_visit.subject_identifier
+            )
+            self.assertEqual(row.get("visit_code"), crf_one.subject_visit.visit_code)
+            self.assertEqual(
+                row.get("visit_reason"), crf_one.subject_visit.get_reason_display()
+            )
+            self.assertNotEqual(row.get("visit_reason"), SCHEDULED)
+            self.assertEqual(row.get("f1"), "blah")
+            self.assertNotIn("f4", row)
+        self.assertNotIn("secret", content)
+
+    def test_actions_by_permission(self):
+        user = User.objects.create_user("view", "view@example.com", "x")
+        user.is_staff = True
+        user.save()
+        user.user_permissions.add(
+            Permission.objects.get(
+                codename="view_subjectvisit",
+                content_type__app_label="edc_visit_tracking",
+            )
+        )
+        modeladmin = edc_visit_tracking_admin._registry.get(SubjectVisit)
+        request = RequestFactory().get("/")
+        request.user = User.objects.get(pk=user.pk)
+        actions = modeladmin.get_actions(request)
+        self.assertIn("export_as_csv", actions)
+        self.assertIn("export_as_ndjson", actions)
+        self.assertNotIn("mark_as_missed", actions)
+        request.user = self.user
+        self.assertIn("mark_as_missed", modeladmin.get_actions(request))
+
+    def test_export_visit_reason(self):
+        subject_visit = SubjectVisit.objects.all()[0]
+        SubjectVisit.objects.filter(pk=subject_visit.pk).update(
+            reason=UNSCHEDULED, reason_unscheduled="patient_unwell_outpatient"
+        )
+        subject_visit.refresh_from_db()
+        modeladmin = edc_visit_tracking_admin._registry.get(SubjectVisit)
+        response = modeladmin.export_as_ndjson(
+            self.get_request(), SubjectVisit.objects.all()
+        )
+        rows = {
+            row.get("id"): row
+            for row in (
+                json.loads(line)
+                for line in b"".join(response.streaming_content).decode().splitlines()
+            )
+        }
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(
+            rows.get(str(subject_visit.pk)).get("visit_reason"),
+            modeladmin.visit_reason(subject_visit),
+        )
+
+    def test_export_crf_visit_reason(self):
+        subject_visit = SubjectVisit.objects.all()[0]
+        SubjectVisit.objects.filter(pk=subject_visit.pk).update(
+            reason=UNSCHEDULED, reason_unscheduled="patient_unwell_outpatient"
+        )
+        subject_visit.refresh_from_db()
+        modeladmin = edc_visit_tracking_admin._registry.get(CrfOne)
+        response = modeladmin.export_as_ndjson(
+            self.get_request(), CrfOne.objects.filter(subject_visit=subject_visit)
+        )
+        row = json.loads(b"".join(response.streaming_content).decode())
+        self.assertEqual(
+            row.get("visit_reason"),
+            edc_visit_tracking_admin._registry.get(SubjectVisit).visit_reason(
+                subject_visit
+            ),
+        )
+
+    def test_export_view_applies_filters(self):
+        modeladmin = edc_visit_tracking_admin._registry.get(SubjectVisit)
+        response = modeladmin.export_view(self.get_request(_format="ndjson", q="12345"))
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        for line in lines:
+            self.assertEqual(json.loads(line).get("subject_identifier"), "12345")
@@ -9,7 +9,7 @@ from edc_visit_tracking.constants import MISSED_VISIT, UNSCHEDULED, SCHEDULED
 from edc_visit_tracking.form_validators import VisitFormValidator
 
 from ..helper import Helper
-from ..models import SubjectVisit
+from ..models import SubjectVisit, CrfOne
 from ..visit_schedule import visit_schedule1, visit_schedule2
 
 
@@ -40,6 +40,20 @@ class TestSubjectVisitFormValidator(TestCase):
             pass
         self.assertIn("reason", form_validator._errors)
 
+    def test_appointment_has_visit(self):
+        subject_visit = SubjectVisit.objects.create(
+            appointment=self.appointment, reason=SCHEDULED
+        )
+        cleaned_data = {"appointment": self.appointment, "reason": SCHEDULED}
+        form_validator = VisitFormValidator(cleaned_data=cleaned_data)
+        self.assertRaises(forms.ValidationError, form_validator.validate)
+        self.assertIn("appointment", form_validator._errors)
+        form_validator = VisitFormValidator(
+            cleaned_data=cleaned_data, instance=subject_visit
+        )
+        form_validator.validate()
+        self.assertNotIn("appointment", form_validator._errors)
+
     def test_visit_code_reason_with_visit_code_sequence_1(self):
         SubjectVisit.objects.create(appointment=self.appointment)
 
@@ -99,6 +113,29 @@ class TestSubjectVisitFormValidator(TestCase):
             pass
         self.assertIn("reason_missed", form_validator._errors)
 
+    def test_reason_missed_with_crfs(self):
+        subject_visit = SubjectVisit.objects.create(
+            appointment=self.appointment, reason=SCHEDULED
+        )
+        cleaned_data = {
+            "appointment": self.appointment,
+            "reason": MISSED_VISIT,
+            "reason_missed": "timepoint",
+        }
+        form_validator = VisitFormValidator(
+            cleaned_data=cleaned_data, instance=subject_visit
+        )
+        form_validator.validate_visit_code_sequence_and_reason()
+        CrfOne.objects.create(subject_visit=subject_visit)
+        form_validator = VisitFormValidator(
+            cleaned_data=cleaned_data, instance=subject_visit
+        )
+        with self.assertNumQueries(1):
+            self.assertRaises(
+                forms.ValidationError,
+                form_validator.validate_visit_code_sequence_and_reason,
+            )
+
     def test_reason_unscheduled(self):
         SubjectVisit.objects.create(appointment=self.appointment)
 
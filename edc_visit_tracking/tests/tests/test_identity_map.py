@@ -0,0 +1,119 @@
+from django.http import HttpResponse
+from django.test import TestCase, tag
+from django.test.client import RequestFactory
+from edc_appointment.constants import IN_PROGRESS_APPT
+from edc_appointment.models import Appointment
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.constants import SCHEDULED
+from edc_visit_tracking.appointment_status import update_appointment_status
+from edc_visit_tracking.identity_map import (
+    IdentityMapMiddleware,
+    add_object,
+    get_identity_map,
+    get_object,
+    identity_map,
+)
+from edc_visit_tracking.visit_sequence import VisitSequence
+
+from ..helper import Helper
+from ..models import CrfOne, SubjectVisit
+from ..visit_schedule import visit_schedule1, visit_schedule2
+
+
+class TestIdentityMap(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        self.subject_identifier = "12345"
+        self.helper = self.helper_cls(subject_identifier=self.subject_identifier)
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        self.helper.consent_and_put_on_schedule()
+        self.appointments = Appointment.objects.all().order_by(
+            "timepoint", "visit_code_sequence"
+        )
+        self.subject_visit = SubjectVisit.objects.create(
+            appointment=self.appointments[0], reason=SCHEDULED
+        )
+
+    def test_previous_visit_loaded_once(self):
+        appointment = self.appointments[1]
+        with identity_map():
+            self.assertEqual(
+                VisitSequence(appointment=appointment).previous_visit,
+                self.subject_visit,
+            )
+            with self.assertNumQueries(0):
+                self.assertEqual(
+                    VisitSequence(appointment=appointment).previous_visit,
+                    self.subject_visit,
+                )
+        self.assertIsNone(get_identity_map())
+
+    def test_natural_key_loaded_once(self):
+        natural_key = self.subject_visit.natural_key()
+        with identity_map():
+            SubjectVisit.objects.get_by_natural_key(*natural_key)
+            with self.assertNumQueries(0):
+                SubjectVisit.objects.get_by_natural_key(*natural_key)
+
+    def test_evicted_on_save(self):
+        natural_key = self.subject_visit.natural_key()
+        with identity_map():
+            subject_visit = SubjectVisit.objects.get_by_natural_key(*natural_key)
+            subject_visit.comments = "changed"
+            subject_visit.save()
+            self.assertEqual(
+                SubjectVisit.objects.get_by_natural_key(*natural_key).comments,
+                "changed",
+            )
+            self.assertIsNot(
+                SubjectVisit.objects.get_by_natural_key(*natural_key), subject_visit
+            )
+
+    def test_crf_natural_key_loaded_once(self):
+        crf_one = CrfOne.objects.create(subject_visit=self.subject_visit)
+        natural_key = self.subject_visit.natural_key()
+        with identity_map():
+            CrfOne.objects.get_by_natural_key(*natural_key)
+            with self.assertNumQueries(0):
+                self.assertEqual(
+                    CrfOne.objects.get_by_natural_key(*natural_key), crf_one
+                )
+
+    def test_evicted_on_upsert(self):
+        natural_key = self.subject_visit.natural_key()
+        with identity_map():
+            SubjectVisit.objects.get_by_natural_key(*natural_key)
+            SubjectVisit.objects.upsert_many({natural_key: dict(comments="upserted")})
+            self.assertEqual(
+                SubjectVisit.objects.get_by_natural_key(*natural_key).comments,
+                "upserted",
+            )
+
+    def test_evicted_on_deferred_appointment_status(self):
+        appointment = self.appointments[1]
+        with identity_map():
+            add_object(appointment)
+            update_appointment_status(Appointment, [appointment.pk], IN_PROGRESS_APPT)
+            self.assertEqual(
+                get_object(Appointment, pk=appointment.pk).appt_status,
+                IN_PROGRESS_APPT,
+            )
+
+    def test_middleware(self):
+        def get_response(request):
+            self.assertIsNotNone(get_identity_map())
+            return HttpResponse()
+
+        middleware = IdentityMapMiddleware(get_response)
+        middleware(RequestFactory().get("/"))
+        self.assertIsNone(get_identity_map())
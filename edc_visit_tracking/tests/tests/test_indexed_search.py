@@ -0,0 +1,112 @@
+import re
+
+from django.contrib import admin
+from django.test import TestCase, tag
+from django.test.client import RequestFactory
+from edc_appointment.models import Appointment
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.constants import SCHEDULED
+from edc_visit_tracking.modeladmin_mixins import (
+    CrfModelAdminMixin,
+    VisitModelAdminMixin,
+)
+
+from ..helper import Helper
+from ..models import SubjectVisit, CrfOne
+from ..visit_schedule import visit_schedule1, visit_schedule2
+
+
+class SubjectVisitModelAdmin(VisitModelAdminMixin, admin.ModelAdmin):
+
+    use_indexed_search = True
+    subject_identifier_prefix_pattern = re.compile(r"^\d{3,}$")
+
+
+class CrfOneModelAdmin(CrfModelAdminMixin, admin.ModelAdmin):
+
+    use_indexed_search = True
+    subject_identifier_prefix_pattern = re.compile(r"^\d{3,}$")
+
+
+class TestIndexedSearch(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        for subject_identifier in ["12345", "67890"]:
+            self.helper_cls(
+                subject_identifier=subject_identifier
+            ).consent_and_put_on_schedule()
+            for appointment in Appointment.objects.filter(
+                subject_identifier=subject_identifier
+            ).order_by("timepoint", "visit_code_sequence")[0:2]:
+                subject_visit = SubjectVisit.objects.create(
+                    appointment=appointment, reason=SCHEDULED
+                )
+                CrfOne.objects.create(subject_visit=subject_visit)
+        self.request = RequestFactory().get("/")
+        self.visit_admin = SubjectVisitModelAdmin(SubjectVisit, admin.AdminSite())
+        self.crf_admin = CrfOneModelAdmin(CrfOne, admin.AdminSite())
+
+    def search(self, modeladmin, search_term):
+        queryset, _ = modeladmin.get_search_results(
+            self.request, modeladmin.model.objects.all(), search_term
+        )
+        return queryset
+
+    def test_subject_identifier_prefix(self):
+        queryset = self.search(self.visit_admin, "123")
+        self.assertIn("123%", str(queryset.query))
+        self.assertNotIn("%123%", str(queryset.query))
+        self.assertEqual(
+            set(queryset), set(SubjectVisit.objects.filter(subject_identifier="12345"))
+        )
+        queryset = self.search(self.crf_admin, "123")
+        self.assertEqual(
+            set(queryset),
+            set(CrfOne.objects.filter(subject_visit__subject_identifier="12345")),
+        )
+
+    def test_visit_code(self):
+        visit_code = SubjectVisit.objects.order_by("visit_code")[0].visit_code
+        subject_visits = SubjectVisit.objects.filter(
+            visit_code=visit_code, subject_identifier="67890"
+        )
+        self.assertEqual(subject_visits.count(), 1)
+        self.assertEqual(
+            set(self.search(self.visit_admin, f"{visit_code}.0 678")),
+            set(subject_visits),
+        )
+        self.assertEqual(
+            set(self.search(self.crf_admin, f"{visit_code}.0 678")),
+            set(CrfOne.objects.filter(subject_visit__in=subject_visits)),
+        )
+
+    def test_pk(self):
+        subject_visit = SubjectVisit.objects.all()[0]
+        self.assertEqual(
+            list(self.search(self.visit_admin, str(subject_visit.pk))), [subject_visit]
+        )
+        self.assertEqual(
+            set(self.search(self.crf_admin, str(subject_visit.pk))),
+            set(CrfOne.objects.filter(subject_visit=subject_visit)),
+        )
+
+    def test_free_text_falls_back(self):
+        queryset = self.search(self.visit_admin, SCHEDULED)
+        self.assertIn(f"%{SCHEDULED}%", str(queryset.query))
+        self.assertEqual(queryset.count(), 4)
+
+    def test_opt_in(self):
+        self.visit_admin.use_indexed_search = False
+        queryset = self.search(self.visit_admin, "123")
+        self.assertIn("%123%", str(queryset.query))
@@ -0,0 +1,155 @@
+from dateutil.relativedelta import relativedelta
+from django import forms
+from django.test import TestCase, TransactionTestCase
+from edc_appointment.models import Appointment
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.constants import SCHEDULED
+from edc_visit_tracking.ingestion import NON_FIELD_ERRORS, CrfIngestionPipeline
+from edc_visit_tracking.modelform_mixins import VisitTrackingModelFormMixin
+from unittest.mock import patch
+
+from ..helper import Helper
+from ..models import SubjectVisit, CrfOne
+from ..visit_schedule import visit_schedule1, visit_schedule2
+
+
+class CrfOneForm(VisitTrackingModelFormMixin, forms.ModelForm):
+    def clean_f2(self):
+        if self.cleaned_data.get("f2") == "bad":
+            raise forms.ValidationError("Invalid.")
+        return self.cleaned_data.get("f2")
+
+    class Meta:
+        model = CrfOne
+        fields = "__all__"
+
+
+class TestIngestion(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        self.visits = []
+        for subject_identifier in ["12345", "67890"]:
+            self.helper_cls(
+                subject_identifier=subject_identifier
+            ).consent_and_put_on_schedule()
+            appointment = Appointment.objects.filter(
+                subject_identifier=subject_identifier
+            ).order_by("timepoint", "visit_code_sequence")[0]
+            self.visits.append(
+                SubjectVisit.objects.create(
+                    appointment=appointment,
+                    reason=SCHEDULED,
+                    report_datetime=appointment.appt_datetime,
+                )
+            )
+
+    def get_record(self, visit, **values):
+        return dict(
+            visit=list(visit.natural_key()),
+            report_datetime=visit.report_datetime,
+            **values,
+        )
+
+    def test_ingest(self):
+        records = [
+            self.get_record(self.visits[0], f1="a"),
+            self.get_record(self.visits[1], f1="b"),
+        ]
+        report = CrfIngestionPipeline(CrfOne, batch_size=1).ingest(records)
+        self.assertEqual((report.records, report.created, report.errors), (2, 2, []))
+        self.assertEqual(
+            sorted(CrfOne.objects.values_list("f1", flat=True)), ["a", "b"]
+        )
+        self.assertGreater(report.records_per_second, 0)
+        records[0].update(f1="changed")
+        report = CrfIngestionPipeline(CrfOne).ingest(iter(records))
+        self.assertEqual((report.updated, report.unchanged), (1, 1))
+
+    def test_errors(self):
+        records = [
+            self.get_record(self.visits[0], f1="a"),
+            dict(f1="no visit"),
+            dict(visit=["99999", "visit_schedule1", "schedule1", "1000", 0]),
+            self.get_record(self.visits[1], f1="b"),
+        ]
+        records[3].update(
+            report_datetime=self.visits[1].report_datetime + relativedelta(days=31)
+        )
+        report = CrfIngestionPipeline(CrfOne).ingest(records)
+        self.assertEqual(report.created, 1)
+        self.assertEqual(
+            [(error.index, list(error.errors)) for error in report.errors],
+            [(1, [NON_FIELD_ERRORS]), (2, ["subject_visit"]), (3, ["report_datetime"])],
+        )
+
+    def test_string_datetimes(self):
+        records = [
+            self.get_record(self.visits[0], f1="a"),
+            self.get_record(self.visits[1], f1="b"),
+        ]
+        records[0].update(report_datetime=self.visits[0].report_datetime.isoformat())
+        records[1].update(report_datetime="not a datetime")
+        report = CrfIngestionPipeline(CrfOne).ingest(records)
+        self.assertEqual(report.created, 1)
+        self.assertEqual(
+            CrfOne.objects.get(f1="a").report_datetime, self.visits[0].report_datetime,
+        )
+        self.assertEqual(
+            [(error.index, list(error.errors)) for error in report.errors],
+            [(1, ["report_datetime"])],
+        )
+
+
+class TestThreadedIngestion(TransactionTestCase):
+
+    """Form validation threads use their own connections and only
+    see committed rows.
+    """
+
+    helper_cls = Helper
+
+    def setUp(self):
+        import_holidays()
+        TestIngestion.setUp(self)
+
+    get_record = TestIngestion.get_record
+
+    def test_form(self):
+        records = [
+            self.get_record(self.visits[0], f1="a", f2="bad", f3="c"),
+            self.get_record(self.visits[1], f1="b", f2="good", f3="c"),
+        ]
+        report = CrfIngestionPipeline(CrfOne, form_cls=CrfOneForm, workers=2).ingest(
+            records
+        )
+        self.assertEqual(
+            [(error.index, error.errors) for error in report.errors],
+            [(0, {"f2": ["Invalid."]})],
+        )
+        self.assertEqual(list(CrfOne.objects.values_list("f2", flat=True)), ["good"])
+
+    def test_closes_connections_once_per_chunk(self):
+        records = [
+            self.get_record(self.visits[0], f1="a", f2="good", f3="c"),
+            self.get_record(self.visits[1], f1="b", f2="good", f3="c"),
+            self.get_record(self.visits[1], f1="c", f2="good", f3="c"),
+        ]
+        with patch(
+            "edc_visit_tracking.ingestion.close_old_connections"
+        ) as close_old_connections:
+            report = CrfIngestionPipeline(
+                CrfOne, form_cls=CrfOneForm, workers=2
+            ).ingest(records)
+        self.assertEqual(report.errors, [])
+        self.assertEqual(close_old_connections.call_count, 2)
@@ -0,0 +1,73 @@
+import pkgutil
+
+from importlib import import_module
+
+from django.apps import apps as django_apps
+from django.contrib.sites.models import Site
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.graph import MigrationGraph
+from django.db.migrations.questioner import MigrationQuestioner
+from django.db.migrations.state import ModelState, ProjectState
+from django.test import TestCase, tag
+from edc_visit_tracking.apps import AppConfig
+
+DERIVED_TABLE_FLAGS = [
+    "timeline_digests",
+    "change_log",
+    "timeline_versions",
+    "date_buckets",
+    "visit_rollups",
+    "vital_status",
+]
+
+
+class TestMigrations(TestCase):
+    def get_models(self):
+        """Returns the bookkeeping models, not the test models.
+        """
+        return [
+            model_cls
+            for model_cls in django_apps.get_app_config(
+                "edc_visit_tracking"
+            ).get_models()
+            if model_cls.__module__ == "edc_visit_tracking.models"
+        ]
+
+    def get_migrations(self):
+        """Returns the migrations of the app in order.
+        """
+        package = import_module("edc_visit_tracking.migrations")
+        names = sorted(name for _, name, _ in pkgutil.iter_modules(package.__path__))
+        return [
+            import_module(f"{package.__name__}.{name}").Migration(
+                name, "edc_visit_tracking"
+            )
+            for name in names
+        ]
+
+    def test_migrations_match_models(self):
+        from_state = ProjectState()
+        from_state.add_model(ModelState.from_model(Site))
+        previous = None
+        for migration in self.get_migrations():
+            if previous:
+                self.assertIn(
+                    ("edc_visit_tracking", previous.name), migration.dependencies
+                )
+            from_state = migration.mutate_state(from_state, preserve=False)
+            previous = migration
+        to_state = ProjectState()
+        to_state.add_model(ModelState.from_model(Site))
+        for model_cls in self.get_models():
+            to_state.add_model(ModelState.from_model(model_cls))
+        changes = MigrationAutodetector(
+            from_state,
+            to_state,
+            MigrationQuestioner(specified_apps={"edc_visit_tracking"}),
+        ).changes(graph=MigrationGraph())
+        self.assertEqual(changes, {})
+
+    def test_derived_tables_opt_in(self):
+        for flag in DERIVED_TABLE_FLAGS:
+            with self.subTest(flag=flag):
+                self.assertFalse(getattr(AppConfig, flag))
@@ -0,0 +1,182 @@
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.test import TestCase
+from django.test.client import RequestFactory
+from edc_appointment.constants import COMPLETE_APPT
+from edc_appointment.models import Appointment
+from edc_constants.constants import NO, OTHER
+from edc_facility.import_holidays import import_holidays
+from edc_metadata.constants import KEYED, REQUIRED
+from edc_metadata.models import CrfMetadata
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.admin_site import edc_visit_tracking_admin
+from edc_visit_tracking.constants import MISSED_VISIT, SCHEDULED, UPDATED
+from edc_visit_tracking.missed_visits import MissedVisitError, mark_visits_missed
+from edc_visit_tracking.models import ChangeLog
+from edc_visit_tracking.timeline_version import get_timeline_version
+
+from ..helper import Helper
+from ..models import SubjectVisit, CrfOne
+from ..visit_schedule import visit_schedule1, visit_schedule2
+from .test_modeladmin import SubjectVisitModelAdmin  # noqa
+
+DERIVED_TABLE_FLAGS = [
+    "timeline_digests",
+    "change_log",
+    "timeline_versions",
+    "date_buckets",
+    "visit_rollups",
+    "vital_status",
+    "visit_crf_counts",
+]
+
+
+class TestMissedVisits(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        for subject_identifier in ["12345", "67890"]:
+            self.helper_cls(
+                subject_identifier=subject_identifier
+            ).consent_and_put_on_schedule()
+            for appointment in Appointment.objects.filter(
+                subject_identifier=subject_identifier
+            ).order_by("timepoint", "visit_code_sequence")[0:2]:
+                SubjectVisit.objects.create(appointment=appointment, reason=SCHEDULED)
+
+    def create_metadata(self, subject_visit, entry_status):
+        return CrfMetadata.objects.create(
+            subject_identifier=subject_visit.subject_identifier,
+            visit_schedule_name=subject_visit.visit_schedule_name,
+            schedule_name=subject_visit.schedule_name,
+            visit_code=subject_visit.visit_code,
+            visit_code_sequence=subject_visit.visit_code_sequence,
+            model="edc_visit_tracking.crfone",
+            show_order=1,
+            entry_status=entry_status,
+        )
+
+    def test_marks_missed(self):
+        keyed_visit, required_visit = SubjectVisit.objects.filter(
+            subject_identifier="12345"
+        ).order_by("visit_code")
+        self.create_metadata(keyed_visit, KEYED)
+        CrfOne.objects.create(subject_visit=keyed_visit)
+        self.create_metadata(required_visit, REQUIRED)
+        result = mark_visits_missed(
+            SubjectVisit.objects.all(), reason_missed="timepoint"
+        )
+        self.assertEqual(result.updated, 3)
+        self.assertEqual(
+            result.errors,
+            {keyed_visit.pk: "Invalid. Some data has already been submitted"},
+        )
+        for subject_visit in SubjectVisit.objects.exclude(pk=keyed_visit.pk):
+            self.assertEqual(subject_visit.reason, MISSED_VISIT)
+            self.assertEqual(subject_visit.reason_missed, "timepoint")
+            self.assertEqual(subject_visit.require_crfs, NO)
+            self.assertEqual(subject_visit.appointment.appt_status, COMPLETE_APPT)
+        self.assertEqual(SubjectVisit.objects.get(pk=keyed_visit.pk).reason, SCHEDULED)
+        self.assertEqual(CrfMetadata.objects.filter(entry_status=REQUIRED).count(), 0)
+        self.assertEqual(CrfMetadata.objects.filter(entry_status=KEYED).count(), 1)
+
+        result = mark_visits_missed(
+            SubjectVisit.objects.exclude(pk=keyed_visit.pk), reason_missed="timepoint"
+        )
+        self.assertEqual((result.updated, result.unchanged), (0, 3))
+
+    def test_fixed_number_of_queries(self):
+        app_config = django_apps.get_app_config("edc_visit_tracking")
+        flags = DERIVED_TABLE_FLAGS
+        enabled = {flag: getattr(app_config, flag) for flag in flags}
+        for flag in flags:
+            setattr(app_config, flag, False)
+        try:
+            with self.assertNumQueries(8):
+                mark_visits_missed(
+                    SubjectVisit.objects.all(), reason_missed="timepoint"
+                )
+        finally:
+            for flag, value in enabled.items():
+                setattr(app_config, flag, value)
+
+    def test_refreshes_derived_tables(self):
+        app_config = django_apps.get_app_config("edc_visit_tracking")
+        change_log = app_config.change_log
+        app_config.change_log = True
+        try:
+            version = get_timeline_version("12345")
+            mark_visits_missed(
+                SubjectVisit.objects.filter(subject_identifier="12345"),
+                reason_missed="timepoint",
+            )
+            self.assertGreater(get_timeline_version("12345"), version)
+            self.assertEqual(
+                ChangeLog.objects.filter(
+                    subject_identifier="12345", operation=UPDATED
+                ).count(),
+                2,
+            )
+        finally:
+            app_config.change_log = change_log
+
+    def test_reason_missed_required(self):
+        self.assertRaises(
+            MissedVisitError, mark_visits_missed, SubjectVisit.objects.all()
+        )
+        self.assertRaises(
+            MissedVisitError,
+            mark_visits_missed,
+            SubjectVisit.objects.all(),
+            reason_missed=OTHER,
+        )
+
+    def get_admin_request(self, data):
+        request = RequestFactory().post("/", data=data)
+        request.user = User.objects.create_superuser("erik", "erik@example.com", "x")
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        return request
+
+    def test_admin_action_asks_for_reason_missed(self):
+        modeladmin = edc_visit_tracking_admin._registry.get(SubjectVisit)
+        request = self.get_admin_request({"action": "mark_as_missed"})
+        self.assertIn("mark_as_missed", modeladmin.get_actions(request))
+        response = modeladmin.mark_as_missed(request, SubjectVisit.objects.all())
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("reason_missed", response.context_data["form"].fields)
+        self.assertIn('name="reason_missed"', response.render().rendered_content)
+        self.assertEqual(SubjectVisit.objects.filter(reason=MISSED_VISIT).count(), 0)
+
+    def test_admin_action_other_requires_specify(self):
+        modeladmin = edc_visit_tracking_admin._registry.get(SubjectVisit)
+        request = self.get_admin_request(
+            {"action": "mark_as_missed", "apply": "yes", "reason_missed": OTHER}
+        )
+        response = modeladmin.mark_as_missed(request, SubjectVisit.objects.all())
+        self.assertIn("reason_missed_other", response.context_data["form"].errors)
+        self.assertEqual(SubjectVisit.objects.filter(reason=MISSED_VISIT).count(), 0)
+
+    def test_admin_action(self):
+        modeladmin = edc_visit_tracking_admin._registry.get(SubjectVisit)
+        request = self.get_admin_request(
+            {"action": "mark_as_missed", "apply": "yes", "reason_missed": "timepoint"}
+        )
+        response = modeladmin.mark_as_missed(request, SubjectVisit.objects.all())
+        self.assertIsNone(response)
+        self.assertEqual(
+            SubjectVisit.objects.filter(
+                reason=MISSED_VISIT, reason_missed="timepoint"
+            ).count(),
+            SubjectVisit.objects.all().count(),
+        )
@@ -0,0 +1,147 @@
+from django.contrib import admin
+from django.contrib.admin.templatetags.admin_list import paginator_number
+from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test import TestCase, tag
+from django.test.client import RequestFactory
+from django.utils.html import escape
+from edc_appointment.models import Appointment
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.constants import SCHEDULED
+from edc_visit_tracking.modeladmin_mixins import (
+    EstimatedCountChangeList,
+    VisitModelAdminMixin,
+)
+from edc_visit_tracking.paginator import EstimatedCountPaginator, get_estimated_count
+
+from ..helper import Helper
+from ..models import SubjectVisit
+from ..visit_schedule import visit_schedule1, visit_schedule2
+
+
+class SubjectVisitModelAdmin(VisitModelAdminMixin, admin.ModelAdmin):
+
+    use_estimated_count = True
+    list_per_page = 2
+
+
+class TestPaginator(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        for subject_identifier in ["12345", "67890"]:
+            self.helper_cls(
+                subject_identifier=subject_identifier
+            ).consent_and_put_on_schedule()
+            for appointment in Appointment.objects.filter(
+                subject_identifier=subject_identifier
+            ).order_by("timepoint", "visit_code_sequence")[0:3]:
+                SubjectVisit.objects.create(appointment=appointment, reason=SCHEDULED)
+
+    def test_estimated_count(self):
+        queryset = SubjectVisit.objects.all()
+        self.assertIsNone(get_estimated_count(queryset))
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.assertEqual(get_estimated_count(queryset), 6)
+        self.assertIsNone(
+            get_estimated_count(queryset.filter(subject_identifier="12345"))
+        )
+        paginator = EstimatedCountPaginator(queryset, 2, min_estimated_count=0)
+        with self.assertNumQueries(2):
+            self.assertEqual(paginator.count, 6)
+        paginator = EstimatedCountPaginator(queryset, 2)
+        self.assertIsNone(paginator.estimated_count)
+        self.assertEqual(paginator.count, 6)
+
+    def test_keyset_page(self):
+        queryset = SubjectVisit.objects.all().order_by(
+            *SubjectVisit._meta.ordering, "-pk"
+        )
+        paginator = EstimatedCountPaginator(queryset, 2, keyset_offset=0)
+        self.assertEqual(
+            paginator.keyset_fields,
+            [
+                ("subject_identifier", False),
+                ("visit_schedule_name", False),
+                ("schedule_name", False),
+                ("visit_code", False),
+                ("visit_code_sequence", False),
+                ("report_datetime", False),
+                ("id", True),
+            ],
+        )
+        cursor = None
+        for number in Paginator(queryset, 2).page_range:
+            paginator = EstimatedCountPaginator(
+                queryset, 2, keyset_offset=0, cursor=cursor
+            )
+            object_list = paginator.page(number).object_list
+            if cursor:
+                self.assertIn(">", str(object_list.query))
+            self.assertEqual(
+                list(object_list),
+                list(Paginator(queryset, 2).page(number).object_list),
+            )
+            cursor = paginator.get_cursor(number, object_list)
+        self.assertIsNone(cursor)
+
+    def test_keyset_page_without_cursor(self):
+        queryset = SubjectVisit.objects.all()
+        cursor = EstimatedCountPaginator(queryset, 2).get_cursor(
+            1, Paginator(queryset, 2).page(1).object_list
+        )
+        for cursor in [None, cursor, "bad"]:
+            paginator = EstimatedCountPaginator(
+                queryset, 2, keyset_offset=0, cursor=cursor
+            )
+            object_list = paginator.page(3).object_list
+            self.assertIn("OFFSET", str(object_list.query))
+            self.assertEqual(
+                list(object_list), list(Paginator(queryset, 2).page(3).object_list)
+            )
+
+    def test_keyset_fields_adds_pk(self):
+        paginator = EstimatedCountPaginator(SubjectVisit.objects.all(), 2)
+        self.assertEqual(paginator.keyset_fields[-1], ("id", False))
+        self.assertEqual(
+            paginator.object_list.query.order_by, (*SubjectVisit._meta.ordering, "id"),
+        )
+
+    def test_changelist(self):
+        modeladmin = SubjectVisitModelAdmin(SubjectVisit, admin.AdminSite())
+        request = RequestFactory().get("/", {"p": 1})
+        request.user = User.objects.create_superuser("erik", "erik@example.com", "x")
+        changelist = modeladmin.get_changelist_instance(request)
+        self.assertIsInstance(changelist, EstimatedCountChangeList)
+        self.assertIsInstance(changelist.paginator, EstimatedCountPaginator)
+        self.assertEqual(changelist.result_count, 6)
+        self.assertIsNone(changelist.full_result_count)
+        self.assertEqual(len(changelist.result_list), 2)
+        query_string = changelist.get_next_page_query_string()
+        self.assertIn("cursor=", query_string)
+        self.assertIn(escape(query_string), paginator_number(changelist, 2))
+        self.assertNotIn("cursor=", paginator_number(changelist, 0))
+        self.assertNotIn("cursor=", changelist.get_query_string({"o": "1"}))
+        modeladmin.estimated_count_paginator = type(
+            "Paginator", (EstimatedCountPaginator,), {"keyset_offset": 0}
+        )
+        request = RequestFactory().get(f"/{query_string}")
+        request.user = User.objects.get(username="erik")
+        changelist = modeladmin.get_changelist_instance(request)
+        self.assertIsNotNone(changelist.paginator.cursor)
+        self.assertEqual(
+            list(changelist.result_list),
+            list(Paginator(changelist.queryset, 2).page(3).object_list),
+        )
@@ -0,0 +1,53 @@
+from django.test import TestCase, tag
+from edc_appointment.models import Appointment
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.constants import SCHEDULED
+
+from ..helper import Helper
+from ..models import SubjectVisit, CrfOne
+from ..visit_schedule import visit_schedule1, visit_schedule2
+
+
+class TestPreviousInstance(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        self.crfs = {}
+        for subject_identifier in ["12345", "67890"]:
+            self.helper_cls(
+                subject_identifier=subject_identifier
+            ).consent_and_put_on_schedule()
+            self.crfs[subject_identifier] = []
+            for appointment in Appointment.objects.filter(
+                subject_identifier=subject_identifier
+            ).order_by("timepoint", "visit_code_sequence")[0:3]:
+                subject_visit = SubjectVisit.objects.create(
+                    appointment=appointment, reason=SCHEDULED
+                )
+                self.crfs[subject_identifier].append(
+                    CrfOne.objects.create(subject_visit=subject_visit)
+                )
+
+    def test_previous_instance(self):
+        crfs = self.crfs["12345"]
+        self.assertIsNone(CrfOne.objects.previous_instance(crfs[0]))
+        self.assertEqual(CrfOne.objects.previous_instance(crfs[1]), crfs[0])
+        self.assertEqual(CrfOne.objects.previous_instance(crfs[2]), crfs[1])
+
+    def test_previous_instances(self):
+        with self.assertNumQueries(2):
+            previous_instances = CrfOne.objects.previous_instances(CrfOne.objects.all())
+        for crfs in self.crfs.values():
+            self.assertIsNone(previous_instances[crfs[0].pk])
+            self.assertEqual(previous_instances[crfs[1].pk], crfs[0])
+            self.assertEqual(previous_instances[crfs[2].pk], crfs[1])
@@ -0,0 +1,91 @@
+from django.test import TestCase
+from unittest import skipIf
+from edc_appointment.models import Appointment
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.constants import LOST_VISIT, MISSED_VISIT, SCHEDULED
+from edc_visit_tracking.retention import (
+    ATTENDED,
+    LOST,
+    MISSED,
+    NOT_REPORTED,
+    RetentionReport,
+    get_retention_counts,
+    np,
+)
+
+from ..helper import Helper
+from ..models import SubjectVisit
+from ..visit_schedule import visit_schedule1, visit_schedule2
+
+
+@skipIf(np is None, "numpy is not installed")
+class TestRetention(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        for subject_identifier in ["12345", "67890", "54321"]:
+            self.helper_cls(
+                subject_identifier=subject_identifier
+            ).consent_and_put_on_schedule()
+            for appointment in Appointment.objects.filter(
+                subject_identifier=subject_identifier
+            ).order_by("timepoint", "visit_code_sequence")[0:2]:
+                SubjectVisit.objects.create(
+                    appointment=appointment,
+                    reason=SCHEDULED,
+                    report_datetime=appointment.appt_datetime,
+                )
+        SubjectVisit.objects.filter(
+            subject_identifier="67890", visit_code="2000"
+        ).update(reason=MISSED_VISIT)
+        SubjectVisit.objects.filter(
+            subject_identifier="54321", visit_code="2000"
+        ).update(reason=LOST_VISIT)
+
+    def test_curves(self):
+        with self.assertNumQueries(1):
+            report = RetentionReport()
+        self.assertEqual(report.visit_codes, ["1000", "2000"])
+        curves = report.get_curves()[None]
+        self.assertEqual(curves.enrolled, 3)
+        self.assertEqual(curves.attended.tolist(), [3, 1])
+        self.assertEqual(curves.missed.tolist(), [0, 1])
+        self.assertEqual(curves.lost.tolist(), [0, 1])
+        self.assertEqual(curves.attended_fraction.tolist(), [1.0, 1 / 3])
+
+    def test_by_site(self):
+        site_id = SubjectVisit.objects.all()[0].site_id
+        curves = RetentionReport().get_curves(by_site=True)
+        self.assertEqual(list(curves), [site_id])
+        self.assertEqual(curves[site_id].attended.tolist(), [3, 1])
+
+    def test_lost_is_cumulative(self):
+        status = np.array(
+            [
+                [ATTENDED, LOST, NOT_REPORTED],
+                [ATTENDED, MISSED, ATTENDED],
+                [ATTENDED, ATTENDED, ATTENDED],
+            ],
+            dtype=np.int8,
+        )
+        enrolled, attended, missed, lost = get_retention_counts(
+            status, np.array([0, 1, 1]), 2
+        )
+        self.assertEqual(enrolled.tolist(), [1, 2])
+        self.assertEqual(attended.tolist(), [[1, 0, 0], [2, 1, 2]])
+        self.assertEqual(missed.tolist(), [[0, 0, 0], [0, 1, 0]])
+        self.assertEqual(lost.tolist(), [[0, 1, 1], [0, 0, 0]])
+
+    def test_empty(self):
+        report = RetentionReport(SubjectVisit.objects.none())
+        self.assertEqual(report.get_curves(), {})
@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+from edc_appointment.models import Appointment
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.constants import MISSED_VISIT, SCHEDULED
+from edc_visit_tracking.date_buckets import get_report_date
+from edc_visit_tracking.snapshots import (
+    SnapshotError,
+    load_visit_snapshot,
+    np,
+    write_visit_snapshot,
+)
+from io import StringIO
+from unittest import skipIf
+
+from ..helper import Helper
+from ..models import SubjectVisit
+from ..visit_schedule import visit_schedule1, visit_schedule2
+
+
+@skipIf(np is None, "numpy is not installed")
+class TestSnapshots(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        for subject_identifier in ["67890", "12345"]:
+            self.helper_cls(
+                subject_identifier=subject_identifier
+            ).consent_and_put_on_schedule()
+            for appointment in Appointment.objects.filter(
+                subject_identifier=subject_identifier
+            ).order_by("timepoint", "visit_code_sequence")[0:2]:
+                SubjectVisit.objects.create(
+                    appointment=appointment,
+                    reason=SCHEDULED,
+                    report_datetime=appointment.appt_datetime,
+                )
+        SubjectVisit.objects.filter(
+            subject_identifier="67890", visit_code="2000"
+        ).update(reason=MISSED_VISIT, survival_status=None)
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "snapshot")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_round_trip(self):
+        written = write_visit_snapshot(self.path, SubjectVisit.objects.all(), 3)
+        self.assertEqual(written, 4)
+        snapshot = load_visit_snapshot(self.path)
+        self.assertEqual(len(snapshot), 4)
+        self.assertIsInstance(snapshot["visit_code"], np.memmap)
+        self.assertFalse(snapshot["visit_code"].flags.writeable)
+        subject_visits = SubjectVisit.objects.order_by(
+            "subject_identifier", "appointment__timepoint"
+        )
+        self.assertEqual(
+            list(snapshot.decode("subject_identifier")),
+            [obj.subject_identifier for obj in subject_visits],
+        )
+        self.assertEqual(
+            list(snapshot.decode("visit_code")),
+            [obj.visit_code for obj in subject_visits],
+        )
+        self.assertEqual(
+            list(snapshot.decode("survival_status")),
+            [obj.survival_status for obj in subject_visits],
+        )
+        self.assertEqual(
+            [d.item() for d in snapshot.get_dates("report_date")],
+            [get_report_date(obj.report_datetime) for obj in subject_visits],
+        )
+        self.assertTrue(np.isnat(snapshot.get_dates("last_alive_date")).all())
+        self.assertEqual(
+            list(snapshot["site_id"]), [obj.site_id for obj in subject_visits]
+        )
+        missed = snapshot["reason"] == snapshot.get_code("reason", MISSED_VISIT)
+        self.assertEqual(list(snapshot.decode("subject_identifier")[missed]), ["67890"])
+        self.assertIsNone(snapshot.get_code("reason", "blah"))
+
+    def test_path_exists(self):
+        write_visit_snapshot(self.path, SubjectVisit.objects.all())
+        self.assertRaises(
+            SnapshotError, write_visit_snapshot, self.path, SubjectVisit.objects.all()
+        )
+
+    def test_empty(self):
+        write_visit_snapshot(self.path, SubjectVisit.objects.none())
+        snapshot = load_visit_snapshot(self.path)
+        self.assertEqual(len(snapshot), 0)
+        self.assertEqual(len(snapshot.decode("visit_code")), 0)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("export_visit_snapshot", self.path, stdout=out)
+        self.assertIn("Wrote 4 visits", out.getvalue())
+        self.assertEqual(len(load_visit_snapshot(self.path)), 4)
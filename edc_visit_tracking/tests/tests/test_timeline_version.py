@@ -0,0 +1,105 @@
+from django.http import HttpResponse
+from django.test import TestCase, tag
+from django.test.client import RequestFactory
+from edc_appointment.constants import IN_PROGRESS_APPT
+from edc_appointment.models import Appointment
+from edc_facility.import_holidays import import_holidays
+from edc_metadata.models import CrfMetadata
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.appointment_status import update_appointment_status
+from edc_visit_tracking.constants import SCHEDULED
+from edc_visit_tracking.timeline_version import (
+    get_timeline_version,
+    timeline_condition,
+)
+
+from ..helper import Helper
+from ..models import SubjectVisit, CrfOne
+from ..visit_schedule import visit_schedule1, visit_schedule2
+
+
+@timeline_condition()
+def visits_view(request, subject_identifier=None):
+    return HttpResponse(subject_identifier)
+
+
+class TestTimelineVersion(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        self.subject_identifier = "12345"
+        self.helper = self.helper_cls(subject_identifier=self.subject_identifier)
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        self.helper.consent_and_put_on_schedule()
+        appointment = Appointment.objects.all().order_by(
+            "timepoint", "visit_code_sequence"
+        )[0]
+        self.subject_visit = SubjectVisit.objects.create(
+            appointment=appointment, reason=SCHEDULED
+        )
+
+    def test_bumped_on_save_and_delete(self):
+        version, modified = get_timeline_version(self.subject_identifier)
+        self.assertGreater(version, 0)
+        self.assertIsNotNone(modified)
+        crf_one = CrfOne.objects.create(subject_visit=self.subject_visit)
+        self.assertEqual(get_timeline_version(self.subject_identifier)[0], version + 1)
+        crf_one.delete()
+        self.assertEqual(get_timeline_version(self.subject_identifier)[0], version + 2)
+        self.assertEqual(get_timeline_version("99999"), (0, None))
+
+    def test_bumped_on_appointment_save(self):
+        version, _ = get_timeline_version(self.subject_identifier)
+        appointment = Appointment.objects.get(pk=self.subject_visit.appointment.pk)
+        appointment.save()
+        self.assertEqual(get_timeline_version(self.subject_identifier)[0], version + 1)
+
+    def test_bumped_on_metadata_save(self):
+        version, _ = get_timeline_version(self.subject_identifier)
+        crf_metadata = CrfMetadata.objects.create(
+            subject_identifier=self.subject_identifier,
+            visit_schedule_name=self.subject_visit.visit_schedule_name,
+            schedule_name=self.subject_visit.schedule_name,
+            visit_code=self.subject_visit.visit_code,
+            model="edc_visit_tracking.crfone",
+            show_order=1,
+        )
+        self.assertEqual(get_timeline_version(self.subject_identifier)[0], version + 1)
+        crf_metadata.delete()
+        self.assertEqual(get_timeline_version(self.subject_identifier)[0], version + 2)
+
+    def test_bumped_on_deferred_appointment_status(self):
+        appointment = Appointment.objects.all().order_by("timepoint")[1]
+        version, _ = get_timeline_version(self.subject_identifier)
+        update_appointment_status(Appointment, [appointment.pk], IN_PROGRESS_APPT)
+        self.assertEqual(get_timeline_version(self.subject_identifier)[0], version + 1)
+        update_appointment_status(Appointment, [appointment.pk], IN_PROGRESS_APPT)
+        self.assertEqual(get_timeline_version(self.subject_identifier)[0], version + 1)
+
+    def test_conditional_response(self):
+        factory = RequestFactory()
+        response = visits_view(
+            factory.get("/"), subject_identifier=self.subject_identifier
+        )
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        with self.assertNumQueries(1):
+            response = visits_view(
+                factory.get("/", HTTP_IF_NONE_MATCH=etag),
+                subject_identifier=self.subject_identifier,
+            )
+        self.assertEqual(response.status_code, 304)
+        CrfOne.objects.create(subject_visit=self.subject_visit)
+        response = visits_view(
+            factory.get("/", HTTP_IF_NONE_MATCH=etag),
+            subject_identifier=self.subject_identifier,
+        )
+        self.assertEqual(response.status_code, 200)
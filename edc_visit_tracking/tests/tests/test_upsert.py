@@ -0,0 +1,240 @@
+from unittest import mock
+
+from dateutil.relativedelta import relativedelta
+from django.test import TestCase, tag
+from edc_appointment.constants import COMPLETE_APPT, IN_PROGRESS_APPT
+from edc_appointment.models import Appointment
+from edc_constants.constants import NO
+from edc_facility.import_holidays import import_holidays
+from edc_utils import get_utcnow
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.constants import CREATED, MISSED_VISIT, SCHEDULED, UPDATED
+from edc_visit_tracking.model_mixins.previous_visit_model_mixin import (
+    PreviousVisitError,
+)
+from edc_visit_tracking.managers import NATURAL_KEY_FIELDS, UpsertError
+from edc_visit_tracking.models import ChangeLog, DateBucket, VisitRollup
+from edc_visit_tracking.timeline_version import get_timeline_version
+
+from ..helper import Helper
+from ..models import SubjectVisit, CrfOne
+from ..visit_schedule import visit_schedule1, visit_schedule2
+
+
+class TestUpsert(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        self.subject_identifier = "12345"
+        self.helper = self.helper_cls(subject_identifier=self.subject_identifier)
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        self.helper.consent_and_put_on_schedule()
+        self.appointments = Appointment.objects.all().order_by(
+            "timepoint", "visit_code_sequence"
+        )
+        self.report_datetime = get_utcnow()
+
+    def natural_key(self, appointment):
+        return (
+            appointment.subject_identifier,
+            appointment.visit_schedule_name,
+            appointment.schedule_name,
+            appointment.visit_code,
+            appointment.visit_code_sequence,
+        )
+
+    def test_visit_upsert_creates(self):
+        batch = {
+            self.natural_key(self.appointments[0]): dict(
+                reason=SCHEDULED, report_datetime=self.report_datetime
+            )
+        }
+        result = SubjectVisit.objects.upsert_many(batch)
+        self.assertEqual(result.created, 1)
+        subject_visit = SubjectVisit.objects.get(appointment=self.appointments[0])
+        self.assertEqual(
+            subject_visit.natural_key(), self.natural_key(self.appointments[0])
+        )
+
+    def test_visit_upsert_skips_unchanged(self):
+        key = list(self.natural_key(self.appointments[0]))
+        batch = [(key, dict(reason=SCHEDULED, report_datetime=self.report_datetime))]
+        SubjectVisit.objects.upsert_many(batch)
+        with self.assertNumQueries(1):
+            result = SubjectVisit.objects.upsert_many(batch)
+        self.assertEqual(result.unchanged, 1)
+        self.assertEqual(result.created + result.updated, 0)
+
+    def test_visit_upsert_updates_changed(self):
+        key = self.natural_key(self.appointments[0])
+        SubjectVisit.objects.upsert_many(
+            {key: dict(reason=SCHEDULED, report_datetime=self.report_datetime)}
+        )
+        result = SubjectVisit.objects.upsert_many(
+            {key: dict(reason=MISSED_VISIT, report_datetime=self.report_datetime)}
+        )
+        self.assertEqual(result.updated, 1)
+        subject_visit = SubjectVisit.objects.get(appointment=self.appointments[0])
+        self.assertEqual(subject_visit.reason, MISSED_VISIT)
+        self.assertEqual(subject_visit.require_crfs, NO)
+
+    def test_visit_upsert_without_appointment_raises(self):
+        key = ("99999",) + self.natural_key(self.appointments[0])[1:]
+        self.assertRaises(
+            UpsertError,
+            SubjectVisit.objects.upsert_many,
+            {key: dict(reason=SCHEDULED)},
+        )
+
+    def test_crf_upsert(self):
+        subject_visit = SubjectVisit.objects.create(
+            appointment=self.appointments[0], reason=SCHEDULED
+        )
+        key = subject_visit.natural_key()
+        result = CrfOne.objects.upsert_many({key: dict(f1="a", f2="b")})
+        self.assertEqual(result.created, 1)
+        result = CrfOne.objects.upsert_many({key: dict(f1="a", f2="b")})
+        self.assertEqual(result.unchanged, 1)
+        result = CrfOne.objects.upsert_many({key: dict(f1="a", f2="c")})
+        self.assertEqual(result.updated, 1)
+        self.assertEqual(CrfOne.objects.get(subject_visit=subject_visit).f2, "c")
+
+    def test_crf_upsert_without_visit_raises(self):
+        key = self.natural_key(self.appointments[0])
+        self.assertRaises(UpsertError, CrfOne.objects.upsert_many, {key: dict(f1="a")})
+
+    def test_visit_upsert_sets_site(self):
+        SubjectVisit.objects.upsert_many(
+            {
+                self.natural_key(self.appointments[0]): dict(
+                    reason=SCHEDULED, report_datetime=self.report_datetime
+                )
+            }
+        )
+        subject_visit = SubjectVisit.objects.get(appointment=self.appointments[0])
+        self.assertIsNotNone(subject_visit.site_id)
+        self.assertEqual(subject_visit.site_id, self.appointments[0].site_id)
+
+    def test_visit_upsert_does_not_count_conflicts_as_created(self):
+        SubjectVisit.objects.create(
+            appointment=self.appointments[0],
+            reason=SCHEDULED,
+            report_datetime=self.report_datetime,
+        )
+        # a row inserted by another writer after `existing` was read
+        obj = SubjectVisit(
+            appointment=self.appointments[0],
+            reason=SCHEDULED,
+            report_datetime=self.report_datetime,
+            **dict(zip(NATURAL_KEY_FIELDS, self.natural_key(self.appointments[0]))),
+        )
+        created = SubjectVisit.objects._write([obj], {})
+        self.assertEqual(created, 0)
+        self.assertEqual(
+            SubjectVisit.objects.filter(appointment=self.appointments[0]).count(), 1
+        )
+
+    def test_visit_upsert_sets_appointment_status(self):
+        key = self.natural_key(self.appointments[0])
+        SubjectVisit.objects.upsert_many(
+            {key: dict(reason=SCHEDULED, report_datetime=self.report_datetime)}
+        )
+        self.assertEqual(
+            Appointment.objects.get(pk=self.appointments[0].pk).appt_status,
+            IN_PROGRESS_APPT,
+        )
+        SubjectVisit.objects.upsert_many(
+            {key: dict(reason=MISSED_VISIT, report_datetime=self.report_datetime)}
+        )
+        self.assertEqual(
+            Appointment.objects.get(pk=self.appointments[0].pk).appt_status,
+            COMPLETE_APPT,
+        )
+
+    def test_visit_upsert_enforces_sequence(self):
+        key = self.natural_key(self.appointments[1])
+        self.assertRaises(
+            PreviousVisitError,
+            SubjectVisit.objects.upsert_many,
+            {key: dict(reason=SCHEDULED, report_datetime=self.report_datetime)},
+        )
+        self.assertFalse(SubjectVisit.objects.exists())
+
+    def test_visit_upsert_saves_in_sequence(self):
+        batch = {
+            self.natural_key(appointment): dict(
+                reason=SCHEDULED,
+                report_datetime=self.report_datetime + relativedelta(days=index),
+            )
+            for index, appointment in reversed(list(enumerate(self.appointments[0:3])))
+        }
+        result = SubjectVisit.objects.upsert_many(batch)
+        self.assertEqual(result.created, 3)
+
+    def test_upsert_sends_metadata_signals(self):
+        key = self.natural_key(self.appointments[0])
+        # edc_metadata's post_save receivers call these on the
+        # visit and CRF models of a project
+        with mock.patch.object(
+            SubjectVisit, "reference_creator_cls", create=True
+        ) as reference_creator_cls:
+            SubjectVisit.objects.upsert_many(
+                {key: dict(reason=SCHEDULED, report_datetime=self.report_datetime)}
+            )
+        subject_visit = SubjectVisit.objects.get(appointment=self.appointments[0])
+        reference_creator_cls.assert_called_once_with(model_obj=subject_visit)
+        with mock.patch.object(
+            CrfOne, "update_reference_on_save", create=True
+        ) as update_reference_on_save:
+            CrfOne.objects.upsert_many(
+                {key: dict(f1="a", report_datetime=self.report_datetime)}
+            )
+            CrfOne.objects.upsert_many(
+                {key: dict(f1="b", report_datetime=self.report_datetime)}
+            )
+        self.assertEqual(update_reference_on_save.call_count, 2)
+
+    def test_upsert_refreshes_derived_tables(self):
+        key = self.natural_key(self.appointments[0])
+        version, _ = get_timeline_version(self.subject_identifier)
+        SubjectVisit.objects.upsert_many(
+            {key: dict(reason=SCHEDULED, report_datetime=self.report_datetime)}
+        )
+        subject_visit = SubjectVisit.objects.get(appointment=self.appointments[0])
+        CrfOne.objects.upsert_many(
+            {key: dict(f1="a", report_datetime=self.report_datetime)}
+        )
+        crf_one = CrfOne.objects.get(subject_visit=subject_visit)
+        self.assertEqual(
+            list(
+                ChangeLog.objects.order_by("sequence").values_list(
+                    "object_pk", "operation"
+                )
+            ),
+            [(str(subject_visit.pk), CREATED), (str(crf_one.pk), CREATED)],
+        )
+        # the visit, its appointment and the CRF
+        self.assertEqual(get_timeline_version(self.subject_identifier)[0], version + 3)
+        self.assertEqual(
+            DateBucket.objects.get(label_lower="edc_visit_tracking.subjectvisit").count,
+            1,
+        )
+        SubjectVisit.objects.upsert_many(
+            {key: dict(reason=MISSED_VISIT, report_datetime=self.report_datetime)}
+        )
+        self.assertEqual(
+            ChangeLog.objects.order_by("sequence").last().operation, UPDATED
+        )
+        self.assertEqual(
+            list(VisitRollup.objects.values_list("reason", "count")),
+            [(MISSED_VISIT, 1)],
+        )
+        self.assertEqual(get_timeline_version(self.subject_identifier)[0], version + 5)
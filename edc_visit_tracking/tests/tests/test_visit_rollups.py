@@ -0,0 +1,136 @@
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase
+from edc_appointment.models import Appointment
+from edc_constants.constants import DEAD
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.constants import LOST_VISIT, MISSED_VISIT, SCHEDULED
+from edc_visit_tracking.missed_visits import mark_visits_missed
+from edc_visit_tracking.models import VisitRollup
+from edc_utils import get_utcnow
+from edc_visit_tracking.visit_rollups import (
+    get_visit_rollup_key,
+    rebuild_visit_rollups,
+    update_visit_rollup,
+)
+from io import StringIO
+
+from ..helper import Helper
+from ..models import SubjectVisit
+from ..visit_schedule import visit_schedule1, visit_schedule2
+
+
+class TestVisitRollups(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        for subject_identifier in ["12345", "67890"]:
+            self.helper_cls(
+                subject_identifier=subject_identifier
+            ).consent_and_put_on_schedule()
+            for appointment in Appointment.objects.filter(
+                subject_identifier=subject_identifier
+            ).order_by("timepoint", "visit_code_sequence")[0:2]:
+                SubjectVisit.objects.create(
+                    appointment=appointment,
+                    reason=SCHEDULED,
+                    report_datetime=appointment.appt_datetime,
+                )
+
+    def get_expected(self, *fields):
+        return {
+            tuple(row.get(f) for f in fields): row.get("total")
+            for row in SubjectVisit.objects.order_by()
+            .values(*fields)
+            .annotate(total=Count("pk"))
+        }
+
+    def get_totals(self, *fields):
+        return {
+            tuple(row.get(f) for f in fields): row.get("total")
+            for row in VisitRollup.objects.totals(*fields)
+        }
+
+    def assert_rollups_match(self):
+        self.assertEqual(
+            self.get_totals("reason", "survival_status"),
+            self.get_expected("reason", "survival_status"),
+        )
+        self.assertEqual(
+            self.get_totals("site", "schedule_name"),
+            self.get_expected("site", "schedule_name"),
+        )
+
+    def test_rollups_on_create(self):
+        self.assertEqual(self.get_totals("reason"), {(SCHEDULED,): 4})
+        self.assert_rollups_match()
+
+    def test_rollups_on_change(self):
+        subject_visit = SubjectVisit.objects.all()[0]
+        subject_visit.reason = LOST_VISIT
+        subject_visit.survival_status = DEAD
+        subject_visit.save()
+        self.assertEqual(self.get_totals("reason"), {(LOST_VISIT,): 1, (SCHEDULED,): 3})
+        self.assert_rollups_match()
+        subject_visit.reason = SCHEDULED
+        subject_visit.save()
+        self.assertEqual(
+            VisitRollup.objects.filter(reason=LOST_VISIT, count__lte=0).count(), 0
+        )
+        self.assert_rollups_match()
+
+    def test_rollups_on_delete(self):
+        SubjectVisit.objects.filter(subject_identifier="12345").order_by(
+            "-report_datetime"
+        )[0].delete()
+        self.assertEqual(self.get_totals("reason"), {(SCHEDULED,): 3})
+        self.assert_rollups_match()
+
+    def test_rollups_on_mark_missed(self):
+        mark_visits_missed(
+            SubjectVisit.objects.filter(subject_identifier="12345"),
+            reason_missed="timepoint",
+        )
+        self.assertEqual(
+            self.get_totals("reason"), {(MISSED_VISIT,): 2, (SCHEDULED,): 2}
+        )
+        self.assert_rollups_match()
+
+    def test_null_site_unique(self):
+        key = get_visit_rollup_key(
+            None, "visit_schedule1", "schedule1", get_utcnow(), SCHEDULED, None
+        )
+        update_visit_rollup("edc_visit_tracking.othervisit", key, 1)
+        update_visit_rollup("edc_visit_tracking.othervisit", key, 1)
+        rollup = VisitRollup.objects.get(label_lower="edc_visit_tracking.othervisit")
+        self.assertEqual((rollup.site_id, rollup.count), (None, 2))
+
+    def test_rebuild(self):
+        expected = list(VisitRollup.objects.values_list().order_by("id"))
+        VisitRollup.objects.all().delete()
+        self.assertEqual(rebuild_visit_rollups(), len(expected))
+        self.assertEqual(
+            [row[1:] for row in VisitRollup.objects.values_list().order_by("id")],
+            [row[1:] for row in expected],
+        )
+
+    def test_rebuild_command(self):
+        VisitRollup.objects.all().delete()
+        out = StringIO()
+        call_command(
+            "rebuild_visit_rollups",
+            "--model=edc_visit_tracking.subjectvisit",
+            stdout=out,
+        )
+        self.assertIn("Created", out.getvalue())
+        self.assert_rollups_match()
@@ -0,0 +1,159 @@
+from dateutil.relativedelta import relativedelta
+from django.core.management import call_command
+from django.test import TestCase
+from edc_appointment.models import Appointment
+from edc_constants.constants import ALIVE, DEAD, UNKNOWN
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.constants import MISSED_VISIT, SCHEDULED
+from edc_visit_tracking.date_buckets import get_report_date
+from edc_visit_tracking.models import SubjectVitalStatus
+from edc_visit_tracking.vital_status import rebuild_vital_status
+from io import StringIO
+
+from ..helper import Helper
+from ..models import SubjectVisit
+from ..visit_schedule import visit_schedule1, visit_schedule2
+
+
+class TestVitalStatus(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        for subject_identifier in ["12345", "67890"]:
+            self.helper_cls(
+                subject_identifier=subject_identifier
+            ).consent_and_put_on_schedule()
+            for appointment in Appointment.objects.filter(
+                subject_identifier=subject_identifier
+            ).order_by("timepoint", "visit_code_sequence")[0:2]:
+                SubjectVisit.objects.create(
+                    appointment=appointment,
+                    reason=SCHEDULED,
+                    report_datetime=appointment.appt_datetime,
+                )
+        self.first_visit, self.last_visit = SubjectVisit.objects.filter(
+            subject_identifier="12345"
+        ).order_by("report_datetime")
+
+    def get_vital_status(self):
+        return SubjectVitalStatus.objects.get(subject_identifier="12345")
+
+    def test_created(self):
+        vital_status = self.get_vital_status()
+        self.assertEqual(vital_status.survival_status, ALIVE)
+        self.assertEqual(
+            vital_status.survival_status_datetime, self.last_visit.report_datetime
+        )
+        self.assertEqual(
+            vital_status.last_alive_date,
+            get_report_date(self.last_visit.report_datetime),
+        )
+        self.assertEqual(vital_status.site_id, self.last_visit.site_id)
+
+    def test_latest_status_wins(self):
+        self.last_visit.survival_status = DEAD
+        self.last_visit.save()
+        vital_status = self.get_vital_status()
+        self.assertEqual(vital_status.survival_status, DEAD)
+        self.assertEqual(
+            vital_status.last_alive_date,
+            get_report_date(self.first_visit.report_datetime),
+        )
+
+    def test_out_of_order_edit(self):
+        self.last_visit.survival_status = UNKNOWN
+        self.last_visit.save()
+        last_alive_date = get_report_date(
+            self.last_visit.report_datetime
+        ) + relativedelta(days=3)
+        self.first_visit.last_alive_date = last_alive_date
+        self.first_visit.save()
+        vital_status = self.get_vital_status()
+        self.assertEqual(vital_status.survival_status, UNKNOWN)
+        self.assertEqual(vital_status.last_alive_date, last_alive_date)
+
+    def test_missed_visit_not_alive(self):
+        self.last_visit.reason = MISSED_VISIT
+        self.last_visit.reason_missed = "timepoint"
+        self.last_visit.save()
+        vital_status = self.get_vital_status()
+        self.assertEqual(vital_status.survival_status, ALIVE)
+        self.assertEqual(
+            vital_status.survival_status_datetime, self.first_visit.report_datetime
+        )
+        self.assertEqual(
+            vital_status.last_alive_date,
+            get_report_date(self.first_visit.report_datetime),
+        )
+
+    def test_missed_visit_dead(self):
+        self.last_visit.reason = MISSED_VISIT
+        self.last_visit.reason_missed = "timepoint"
+        self.last_visit.survival_status = DEAD
+        self.last_visit.save()
+        self.assertEqual(self.get_vital_status().survival_status, DEAD)
+
+    def test_delete(self):
+        self.last_visit.survival_status = DEAD
+        self.last_visit.save()
+        self.last_visit.delete()
+        vital_status = self.get_vital_status()
+        self.assertEqual(vital_status.survival_status, ALIVE)
+        self.assertEqual(
+            vital_status.survival_status_datetime, self.first_visit.report_datetime
+        )
+
+    def test_get_many(self):
+        with self.assertNumQueries(1):
+            vital_statuses = SubjectVitalStatus.objects.get_many(["12345", "67890"])
+        self.assertEqual(list(sorted(vital_statuses)), ["12345", "67890"])
+
+    def test_rebuild(self):
+        expected = list(
+            SubjectVitalStatus.objects.values_list(
+                "subject_identifier",
+                "site",
+                "survival_status",
+                "survival_status_datetime",
+                "last_alive_date",
+            ).order_by("subject_identifier")
+        )
+        SubjectVitalStatus.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_vital_status", stdout=out)
+        self.assertIn("2 subjects", out.getvalue())
+        SubjectVitalStatus.objects.create(
+            label_lower="edc_visit_tracking.othervisit", subject_identifier="12345"
+        )
+        self.assertEqual(rebuild_vital_status(), 2)
+        self.assertEqual(
+            list(
+                SubjectVitalStatus.objects.filter(
+                    label_lower=SubjectVisit._meta.label_lower
+                )
+                .values_list(
+                    "subject_identifier",
+                    "site",
+                    "survival_status",
+                    "survival_status_datetime",
+                    "last_alive_date",
+                )
+                .order_by("subject_identifier")
+            ),
+            expected,
+        )
+        self.assertTrue(
+            SubjectVitalStatus.objects.filter(
+                label_lower="edc_visit_tracking.othervisit"
+            ).exists()
+        )
@@ -0,0 +1,165 @@
+import json
+import os
+import shutil
+import tempfile
+
+from datetime import timedelta
+from django.apps import apps as django_apps
+from django.core.management import call_command
+from django.db.models import Max
+from django.test import TestCase
+from edc_appointment.models import Appointment
+from edc_facility.import_holidays import import_holidays
+from edc_utils import get_utcnow
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.constants import DELETED, SCHEDULED
+from edc_visit_tracking.models import ChangeLog, ExportWatermark
+from edc_visit_tracking.watermark_exports import (
+    UPSERT,
+    WatermarkExporter,
+    WatermarkExportError,
+)
+from io import StringIO
+
+from ..helper import Helper
+from ..models import SubjectVisit, CrfOne
+from ..visit_schedule import visit_schedule1, visit_schedule2
+
+
+class TestWatermarkExports(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        self.crfs = []
+        for subject_identifier in ["12345", "67890"]:
+            self.helper_cls(
+                subject_identifier=subject_identifier
+            ).consent_and_put_on_schedule()
+            for appointment in Appointment.objects.filter(
+                subject_identifier=subject_identifier
+            ).order_by("timepoint", "visit_code_sequence")[0:2]:
+                subject_visit = SubjectVisit.objects.create(
+                    appointment=appointment, reason=SCHEDULED
+                )
+                self.crfs.append(
+                    CrfOne.objects.create(subject_visit=subject_visit, f1="blah")
+                )
+
+    def get_exporter(self, batch_size=None):
+        return WatermarkExporter("warehouse", CrfOne, batch_size=batch_size)
+
+    def export(self, exporter=None):
+        rows, tombstones = [], []
+        for batch in exporter or self.get_exporter():
+            rows.extend(batch.rows)
+            tombstones.extend(batch.tombstones)
+        return rows, tombstones
+
+    def test_incremental(self):
+        rows, tombstones = self.export(self.get_exporter(batch_size=3))
+        self.assertEqual(
+            sorted(row.get("id") for row in rows), sorted(obj.id for obj in self.crfs)
+        )
+        self.assertEqual(tombstones, [])
+        self.assertEqual(self.export(), ([], []))
+        self.crfs[0].f1 = "changed"
+        self.crfs[0].save()
+        deleted_pk = str(self.crfs[1].id)
+        self.crfs[1].delete()
+        rows, tombstones = self.export()
+        self.assertEqual([row.get("f1") for row in rows], ["changed"])
+        self.assertEqual(
+            [tombstone.get("object_pk") for tombstone in tombstones], [deleted_pk],
+        )
+        self.assertEqual(self.export(), ([], []))
+
+    def test_exports_upsert_many(self):
+        self.export()
+        CrfOne.objects.upsert_many(
+            {self.crfs[0].subject_visit.natural_key(): {"f1": "upserted"}}
+        )
+        rows, _ = self.export()
+        self.assertEqual([row.get("f1") for row in rows], ["upserted"])
+
+    def test_resumes_after_failure(self):
+        exporter = self.get_exporter(batch_size=3)
+        batches = iter(exporter)
+        first = next(batches)
+        # consumer fails before asking for the next batch
+        del batches
+        rows, _ = self.export(self.get_exporter(batch_size=3))
+        self.assertEqual(len(rows), 4)
+        self.assertTrue(first.rows)
+        self.assertEqual(rows[: len(first.rows)], first.rows)
+
+    def test_holds_back_at_open_transaction(self):
+        self.export()
+        self.crfs[0].f1 = "first"
+        self.crfs[0].save()
+        self.crfs[1].f1 = "second"
+        self.crfs[1].save()
+        # the entry of the first save belongs to a transaction
+        # that has not yet committed
+        in_flight = ChangeLog.objects.filter(object_pk=str(self.crfs[0].id)).aggregate(
+            Max("sequence")
+        )["sequence__max"]
+        ChangeLog.objects.filter(sequence=in_flight).delete()
+        self.assertEqual(self.export(), ([], []))
+        ChangeLog.objects.filter(sequence__gt=in_flight).update(
+            timestamp=get_utcnow() - timedelta(hours=1)
+        )
+        rows, _ = self.export()
+        self.assertEqual([row.get("f1") for row in rows], ["second"])
+
+    def test_requires_change_log(self):
+        app_config = django_apps.get_app_config("edc_visit_tracking")
+        app_config.change_log = False
+        try:
+            self.assertRaises(WatermarkExportError, self.get_exporter)
+        finally:
+            app_config.change_log = True
+
+    def test_command(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "changes.ndjson")
+            ExportWatermark.objects.all().delete()
+            call_command(
+                "export_changes",
+                "--consumer=warehouse",
+                f"--output={path}",
+                stderr=StringIO(),
+            )
+            deleted_pk = str(self.crfs[1].id)
+            self.crfs[1].delete()
+            out = StringIO()
+            call_command(
+                "export_changes",
+                "--consumer=warehouse",
+                "--model=edc_visit_tracking.crfone",
+                stdout=out,
+                stderr=StringIO(),
+            )
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+            self.assertEqual(
+                sorted(set(line.get("model") for line in lines)),
+                ["edc_visit_tracking.crfone", "edc_visit_tracking.subjectvisit"],
+            )
+            self.assertEqual(set(line.get("op") for line in lines), {UPSERT})
+            lines = [json.loads(line) for line in out.getvalue().splitlines()]
+            self.assertEqual(
+                [(line.get("op"), line.get("pk")) for line in lines],
+                [(DELETED, deleted_pk)],
+            )
+        finally:
+            shutil.rmtree(tmpdir)
@@ -0,0 +1,111 @@
+from dateutil.relativedelta import relativedelta
+from django.test import TestCase
+from unittest import skipIf
+from edc_appointment.models import Appointment
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from edc_visit_tracking.constants import SCHEDULED
+from edc_visit_tracking.date_buckets import get_report_date
+from edc_visit_tracking.window_deviations import (
+    WindowDeviationReport,
+    WindowDeviationReportError,
+    np,
+)
+from edc_visit_tracking.working_days import (
+    clear_working_day_calendars,
+    get_working_day_calendar,
+)
+
+from ..helper import Helper
+from ..models import SubjectVisit
+from ..visit_schedule import visit_schedule1, visit_schedule2
+
+
+@skipIf(np is None, "numpy is not installed")
+class TestWindowDeviations(TestCase):
+
+    helper_cls = Helper
+
+    @classmethod
+    def setUpClass(cls):
+        import_holidays()
+        return super().setUpClass()
+
+    def setUp(self):
+        clear_working_day_calendars()
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        for days, subject_identifier in [(2, "12345"), (0, "67890")]:
+            self.helper_cls(
+                subject_identifier=subject_identifier
+            ).consent_and_put_on_schedule()
+            for appointment in Appointment.objects.filter(
+                subject_identifier=subject_identifier
+            ).order_by("timepoint", "visit_code_sequence")[0:2]:
+                SubjectVisit.objects.create(
+                    appointment=appointment,
+                    reason=SCHEDULED,
+                    report_datetime=appointment.appt_datetime
+                    + relativedelta(days=days),
+                )
+
+    def tearDown(self):
+        clear_working_day_calendars()
+
+    def test_one_query(self):
+        with self.assertNumQueries(1):
+            report = WindowDeviationReport()
+        self.assertEqual(sorted(report.deviations.tolist()), [0, 0, 2, 2])
+
+    def test_percentiles(self):
+        report = WindowDeviationReport(percentiles=[50, 100])
+        table = report.get_percentiles()
+        self.assertEqual([row.get("visit_code") for row in table], ["1000", "2000"])
+        for row in table:
+            self.assertEqual(row.get("n"), 2)
+            self.assertEqual(row.get("mean"), 1.0)
+            self.assertEqual((row.get("min"), row.get("max")), (0, 2))
+            self.assertEqual(row.get("p100"), 2.0)
+        site_id = SubjectVisit.objects.all()[0].site_id
+        table = report.get_percentiles(by=["visit_code", "site_id"])
+        self.assertEqual(
+            [(row.get("visit_code"), row.get("site_id")) for row in table],
+            [("1000", site_id), ("2000", site_id)],
+        )
+
+    def test_histograms(self):
+        report = WindowDeviationReport(
+            queryset=SubjectVisit.objects.filter(subject_identifier="12345")
+        )
+        histograms = report.get_histograms(by=[])
+        counts, bin_edges = histograms[()]
+        self.assertEqual(counts.tolist(), [2])
+        self.assertEqual(bin_edges.tolist(), [2, 3])
+        histograms = WindowDeviationReport().get_histograms()
+        for counts, bin_edges in histograms.values():
+            self.assertEqual(counts.tolist(), [1, 0, 1])
+            self.assertEqual(bin_edges.tolist(), [0, 1, 2, 3])
+
+    def test_working_days(self):
+        calendar = get_working_day_calendar()
+        expected = sorted(
+            calendar.working_days_between(
+                get_report_date(subject_visit.appointment.appt_datetime),
+                get_report_date(subject_visit.report_datetime),
+            )
+            for subject_visit in SubjectVisit.objects.all()
+        )
+        report = WindowDeviationReport(working_days=True)
+        self.assertEqual(sorted(report.deviations.tolist()), expected)
+
+    def test_invalid_group_by(self):
+        report = WindowDeviationReport()
+        self.assertRaises(
+            WindowDeviationReportError, report.get_percentiles, by=["reason"]
+        )
+
+    def test_empty(self):
+        report = WindowDeviationReport(queryset=SubjectVisit.objects.none())
+        self.assertEqual(report.get_percentiles(), [])
+        self.assertEqual(report.get_histograms(), {})
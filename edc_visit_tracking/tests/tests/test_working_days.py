@@ -0,0 +1,189 @@
+from datetime import date
+from dateutil.relativedelta import relativedelta, FR, MO, TU, WE, TH
+from django.test import TestCase
+from edc_facility.models import Holiday
+from edc_utils import get_utcnow
+from edc_visit_tracking.crf_date_validator import (
+    CrfDateValidator,
+    CrfReportDateAllowanceError,
+)
+from edc_visit_tracking.working_days import (
+    WorkingDayCalendar,
+    WorkingDayCalendarError,
+    add_working_days,
+    clear_working_day_calendars,
+    get_working_day_calendar,
+    working_days_between,
+)
+
+
+class TestWorkingDayCalendar(TestCase):
+    def setUp(self):
+        # 2019-12-02 is a Monday, 2019-12-25 and 2019-12-26 are holidays
+        self.calendar = WorkingDayCalendar(
+            weekdays=[MO.weekday, TU.weekday, WE.weekday, TH.weekday, FR.weekday],
+            holidays=[date(2019, 12, 25), date(2019, 12, 26)],
+            start_date=date(2019, 12, 1),
+            end_date=date(2020, 1, 31),
+        )
+
+    def test_is_working_day(self):
+        self.assertTrue(self.calendar.is_working_day(date(2019, 12, 2)))
+        self.assertFalse(self.calendar.is_working_day(date(2019, 12, 7)))
+        self.assertFalse(self.calendar.is_working_day(date(2019, 12, 25)))
+        self.assertEqual(
+            list(
+                self.calendar.is_working_day(
+                    [date(2019, 12, 24), date(2019, 12, 26), date(2019, 12, 27)]
+                )
+            ),
+            [True, False, True],
+        )
+
+    def test_working_days_between(self):
+        self.assertEqual(
+            self.calendar.working_days_between(date(2019, 12, 2), date(2019, 12, 9)), 5
+        )
+        self.assertEqual(
+            self.calendar.working_days_between(date(2019, 12, 24), date(2019, 12, 31)),
+            3,
+        )
+        self.assertEqual(
+            list(
+                self.calendar.working_days_between(
+                    [date(2019, 12, 2), date(2019, 12, 24)],
+                    [date(2019, 12, 9), date(2019, 12, 31)],
+                )
+            ),
+            [5, 3],
+        )
+
+    def test_add_working_days(self):
+        self.assertEqual(
+            self.calendar.add_working_days(date(2019, 12, 6), 1), date(2019, 12, 9)
+        )
+        self.assertEqual(
+            self.calendar.add_working_days(date(2019, 12, 24), 1), date(2019, 12, 27)
+        )
+        self.assertEqual(
+            self.calendar.add_working_days(date(2019, 12, 7), 0), date(2019, 12, 7)
+        )
+        dates = self.calendar.add_working_days(
+            [date(2019, 12, 6), date(2019, 12, 24)], 1
+        )
+        self.assertEqual(
+            [d.item() if hasattr(d, "item") else d for d in dates],
+            [date(2019, 12, 9), date(2019, 12, 27)],
+        )
+        # the result of a vectorized call can be passed back in
+        self.assertEqual(list(self.calendar.working_days_between(dates, dates)), [0, 0])
+
+    def test_out_of_range(self):
+        self.assertRaises(
+            WorkingDayCalendarError, self.calendar.is_working_day, date(2020, 2, 1)
+        )
+        self.assertRaises(
+            WorkingDayCalendarError,
+            self.calendar.add_working_days,
+            date(2020, 1, 31),
+            1,
+        )
+
+
+class TestFacilityWorkingDays(TestCase):
+    def setUp(self):
+        clear_working_day_calendars()
+        today = get_utcnow().date()
+        self.monday = today - relativedelta(weeks=4, weekday=MO(-1))
+        Holiday.objects.create(
+            country="botswana", local_date=self.monday, name="Public Holiday"
+        )
+
+    def tearDown(self):
+        clear_working_day_calendars()
+
+    def test_facility_calendar(self):
+        calendar = get_working_day_calendar()
+        self.assertIs(calendar, get_working_day_calendar("default"))
+        self.assertFalse(calendar.is_working_day(self.monday))
+        self.assertTrue(calendar.is_working_day(self.monday + relativedelta(days=1)))
+        self.assertEqual(
+            add_working_days([self.monday - relativedelta(days=3)], 1)[0],
+            self.monday + relativedelta(days=1),
+        )
+        self.assertEqual(
+            working_days_between(
+                [self.monday - relativedelta(days=3)],
+                [self.monday + relativedelta(days=1)],
+            )[0],
+            1,
+        )
+
+    def test_crf_date_validator_working_days(self):
+        friday = get_utcnow().replace(
+            year=self.monday.year, month=self.monday.month, day=self.monday.day, hour=12
+        ) - relativedelta(days=3)
+        # monday is a holiday, tuesday is the first working day
+        CrfDateValidator(
+            report_datetime=friday + relativedelta(days=4),
+            visit_report_datetime=friday,
+            report_datetime_allowance=1,
+            report_datetime_allowance_working_days=True,
+        )
+        self.assertRaises(
+            CrfReportDateAllowanceError,
+            CrfDateValidator,
+            report_datetime=friday + relativedelta(days=5),
+            visit_report_datetime=friday,
+            report_datetime_allowance=1,
+            report_datetime_allowance_working_days=True,
+        )
+        self.assertRaises(
+            CrfReportDateAllowanceError,
+            CrfDateValidator,
+            report_datetime=friday + relativedelta(days=4),
+            visit_report_datetime=friday,
+            report_datetime_allowance=1,
+        )
+
+    def test_crf_date_validator_calendar_days_overrides_class(self):
+        class MyCrfDateValidator(CrfDateValidator):
+            report_datetime_allowance_working_days = True
+
+        friday = get_utcnow().replace(
+            year=self.monday.year, month=self.monday.month, day=self.monday.day, hour=12
+        ) - relativedelta(days=3)
+        MyCrfDateValidator(
+            report_datetime=friday + relativedelta(days=4),
+            visit_report_datetime=friday,
+            report_datetime_allowance=1,
+        )
+        self.assertRaises(
+            CrfReportDateAllowanceError,
+            MyCrfDateValidator,
+            report_datetime=friday + relativedelta(days=4),
+            visit_report_datetime=friday,
+            report_datetime_allowance=1,
+            report_datetime_allowance_working_days=False,
+        )
+
+    def test_crf_date_validator_out_of_calendar(self):
+        report_datetime = get_utcnow()
+        self.assertRaises(
+            CrfReportDateAllowanceError,
+            CrfDateValidator,
+            report_datetime=report_datetime,
+            visit_report_datetime=report_datetime,
+            report_datetime_allowance=100000,
+            report_datetime_allowance_working_days=True,
+        )
+
+    def test_holiday_change_clears_calendar(self):
+        tuesday = self.monday + relativedelta(days=1)
+        self.assertTrue(get_working_day_calendar().is_working_day(tuesday))
+        holiday = Holiday.objects.create(
+            country="botswana", local_date=tuesday, name="Public Holiday"
+        )
+        self.assertFalse(get_working_day_calendar().is_working_day(tuesday))
+        holiday.delete()
+        self.assertTrue(get_working_day_calendar().is_working_day(tuesday))
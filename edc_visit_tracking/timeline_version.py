@@ -0,0 +1,126 @@
+from functools import lru_cache
+
+from django.apps import apps as django_apps
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.views.decorators.http import condition
+from edc_utils import get_utcnow
+
+
+def bump_timeline_version(subject_identifier):
+    """Increments the subject's timeline version.
+    """
+    model_cls = django_apps.get_model("edc_visit_tracking.subjecttimelineversion")
+    opts = dict(version=F("version") + 1, modified=get_utcnow())
+    if not model_cls.objects.filter(subject_identifier=subject_identifier).update(
+        **opts
+    ):
+        try:
+            with transaction.atomic():
+                model_cls.objects.create(
+                    subject_identifier=subject_identifier,
+                    version=1,
+                    modified=opts.get("modified"),
+                )
+        except IntegrityError:
+            model_cls.objects.filter(subject_identifier=subject_identifier).update(
+                **opts
+            )
+
+
+METADATA_MODELS = ["edc_metadata.crfmetadata", "edc_metadata.requisitionmetadata"]
+
+
+@lru_cache(maxsize=None)
+def get_timeline_models():
+    """Returns the label_lowers of the appointment and metadata
+    models; their writes change a subject's timeline too.
+    """
+    from .model_mixins import VisitModelMixin
+
+    label_lowers = set(METADATA_MODELS)
+    for model_cls in django_apps.get_models():
+        if issubclass(model_cls, VisitModelMixin):
+            label_lowers.add(
+                model_cls._meta.get_field("appointment").related_model._meta.label_lower
+            )
+    return frozenset(label_lowers)
+
+
+def has_related_timeline_version(model_cls):
+    """Returns True if writes to `model_cls`, an appointment or
+    metadata model, bump the timeline version.
+
+    Visits and CRFs bump it with the derived tables.
+    """
+    app_config = django_apps.get_app_config("edc_visit_tracking")
+    return bool(
+        app_config.timeline_versions
+        and model_cls._meta.label_lower in get_timeline_models()
+    )
+
+
+def bump_related_timeline_version(model_cls, get_subject_identifier):
+    """Bumps the subject's timeline version for a write to an
+    appointment or metadata model, if enabled.
+
+    `get_subject_identifier` is a callable, only called for
+    these models.
+    """
+    if has_related_timeline_version(model_cls):
+        bump_timeline_version(get_subject_identifier())
+
+
+def get_timeline_version(subject_identifier):
+    """Returns a tuple of (version, modified) for the subject's
+    timeline or (0, None).
+    """
+    model_cls = django_apps.get_model("edc_visit_tracking.subjecttimelineversion")
+    try:
+        obj = model_cls.objects.get(subject_identifier=subject_identifier)
+    except model_cls.DoesNotExist:
+        return 0, None
+    return obj.version, obj.modified
+
+
+def get_request_timeline_version(request, subject_identifier):
+    """Returns the timeline version, read once per request.
+    """
+    versions = request.__dict__.setdefault("_timeline_versions", {})
+    if subject_identifier not in versions:
+        versions[subject_identifier] = get_timeline_version(subject_identifier)
+    return versions[subject_identifier]
+
+
+def get_timeline_etag(request, subject_identifier):
+    version, _ = get_request_timeline_version(request, subject_identifier)
+    return f"{subject_identifier}:{version}"
+
+
+def get_timeline_last_modified(request, subject_identifier):
+    _, modified = get_request_timeline_version(request, subject_identifier)
+    return modified
+
+
+def timeline_condition(subject_identifier_kwarg=None):
+    """A view decorator that answers conditional GET/HEAD with
+    304 if the subject's timeline version has not changed.
+
+    The subject identifier is taken from the view kwarg
+    `subject_identifier_kwarg` (default: "subject_identifier").
+
+    For example:
+
+        @timeline_condition()
+        def visits(request, subject_identifier):
+            ...
+    """
+    subject_identifier_kwarg = subject_identifier_kwarg or "subject_identifier"
+
+    def etag_func(request, *args, **kwargs):
+        return get_timeline_etag(request, kwargs.get(subject_identifier_kwarg))
+
+    def last_modified_func(request, *args, **kwargs):
+        return get_timeline_last_modified(request, kwargs.get(subject_identifier_kwarg))
+
+    return condition(etag_func=etag_func, last_modified_func=last_modified_func)
@@ -0,0 +1,42 @@
+import hashlib
+import json
+
+from datetime import datetime
+from decimal import Decimal
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+
+def get_row_hash(model_cls, values):
+    """Returns a stable sha256 hex digest for a dict of
+    {field name or attname: value} of `model_cls`.
+
+    Values are coerced with the model field's `to_python` so
+    that, for example, a datetime string and the datetime
+    stored in the DB hash the same.
+    """
+    normalized = []
+    for name in sorted(values):
+        value = model_cls._meta.get_field(name).to_python(values[name])
+        if isinstance(value, datetime) and timezone.is_aware(value):
+            value = value.astimezone(timezone.utc)
+        elif isinstance(value, Decimal):
+            value = value.normalize()
+        normalized.append([name, value])
+    return hashlib.sha256(
+        json.dumps(normalized, cls=DjangoJSONEncoder).encode()
+    ).hexdigest()
+
+
+def get_related_visit(instance):
+    """Returns the visit model instance for a visit or CRF
+    model instance.
+
+    Note: on a visit model instance, `visit` is the schedule's
+    `Visit` object, not the instance.
+    """
+    from .model_mixins import VisitModelMixin
+
+    if isinstance(instance, VisitModelMixin):
+        return instance
+    return instance.visit
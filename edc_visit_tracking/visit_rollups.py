@@ -0,0 +1,154 @@
+from collections import Counter
+
+from django.apps import apps as django_apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from .date_buckets import DATE_BUCKET_FIELD, get_report_date, get_site_lookup
+
+VISIT_ROLLUP_KEY_FIELDS = [
+    "site_id",
+    "visit_schedule_name",
+    "schedule_name",
+    "year",
+    "month",
+    "reason",
+    "survival_status",
+]
+
+
+def get_visit_rollup_models():
+    """Returns a list of the visit model classes.
+    """
+    from .model_mixins import VisitModelMixin
+
+    return [
+        model_cls
+        for model_cls in django_apps.get_models()
+        if issubclass(model_cls, VisitModelMixin) and not model_cls._meta.proxy
+    ]
+
+
+def get_visit_rollup_key(
+    site_id,
+    visit_schedule_name,
+    schedule_name,
+    report_datetime,
+    reason,
+    survival_status,
+):
+    """Returns a rollup key as a tuple of the values of
+    VISIT_ROLLUP_KEY_FIELDS.
+    """
+    report_date = get_report_date(report_datetime)
+    return (
+        site_id,
+        visit_schedule_name,
+        schedule_name,
+        report_date.year,
+        report_date.month,
+        reason,
+        survival_status or "",
+    )
+
+
+def get_instance_visit_rollup_key(instance):
+    """Returns the rollup key of a visit instance.
+    """
+    return get_visit_rollup_key(
+        getattr(instance, "site_id", None),
+        instance.visit_schedule_name,
+        instance.schedule_name,
+        getattr(instance, DATE_BUCKET_FIELD),
+        instance.reason,
+        instance.survival_status,
+    )
+
+
+def update_visit_rollup(label_lower, key, delta, using=None):
+    """Adds `delta` to the count of the rollup of `key`.
+
+    Empty rollups are deleted.
+    """
+    model_cls = django_apps.get_model("edc_visit_tracking.visitrollup")
+    manager = model_cls.objects.db_manager(using)
+    opts = dict(zip(VISIT_ROLLUP_KEY_FIELDS, key), label_lower=label_lower)
+    site_id = opts.pop("site_id")
+    opts.update(site_key=site_id or 0)
+    if not manager.filter(**opts).update(count=F("count") + delta) and delta > 0:
+        try:
+            with transaction.atomic(using=using):
+                manager.create(site_id=site_id, count=delta, **opts)
+        except IntegrityError:
+            manager.filter(**opts).update(count=F("count") + delta)
+    if delta < 0:
+        manager.filter(count__lte=0, **opts).delete()
+
+
+def update_visit_rollups(label_lower, deltas, using=None):
+    """Applies a Counter of {key: delta}, skipping keys that
+    net to zero.
+    """
+    for key, delta in deltas.items():
+        if delta:
+            update_visit_rollup(label_lower, key, delta, using=using)
+
+
+def rebuild_visit_rollups(model_cls=None, using=None):
+    """Rebuilds the rollups of `model_cls` or of all visit
+    models from their tables.
+
+    Returns the number of rollups created.
+    """
+    visit_rollup_model_cls = django_apps.get_model("edc_visit_tracking.visitrollup")
+    created = 0
+    for model_cls in [model_cls] if model_cls else get_visit_rollup_models():
+        label_lower = model_cls._meta.label_lower
+        site_lookup = get_site_lookup(model_cls)
+        fields = [
+            "visit_schedule_name",
+            "schedule_name",
+            "rollup_year",
+            "rollup_month",
+            "reason",
+            "survival_status",
+        ]
+        rows = (
+            model_cls._base_manager.using(using)
+            .annotate(
+                rollup_year=ExtractYear(DATE_BUCKET_FIELD),
+                rollup_month=ExtractMonth(DATE_BUCKET_FIELD),
+            )
+            .values(*(fields + ([site_lookup] if site_lookup else [])))
+            .annotate(rollup_count=Count("pk"))
+            .order_by()
+        )
+        counts = Counter()
+        for row in rows:
+            key = (
+                row.get(site_lookup) if site_lookup else None,
+                row.get("visit_schedule_name"),
+                row.get("schedule_name"),
+                row.get("rollup_year"),
+                row.get("rollup_month"),
+                row.get("reason"),
+                row.get("survival_status") or "",
+            )
+            counts[key] += row.get("rollup_count")
+        objs = [
+            visit_rollup_model_cls(
+                label_lower=label_lower,
+                site_key=key[0] or 0,
+                count=count,
+                **dict(zip(VISIT_ROLLUP_KEY_FIELDS, key)),
+            )
+            for key, count in counts.items()
+        ]
+        with transaction.atomic(using=using):
+            visit_rollup_model_cls.objects.using(using).filter(
+                label_lower=label_lower
+            ).delete()
+            visit_rollup_model_cls.objects.using(using).bulk_create(objs)
+        created += len(objs)
+    return created
@@ -1,5 +1,7 @@
 from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
 
+from .identity_map import get_object
+
 
 class VisitSequenceError(Exception):
     pass
@@ -76,7 +78,7 @@ class VisitSequence:
             visit_code=self.previous_visit_code,
         )
         try:
-            previous_appointment = self.appointment_model_cls.objects.get(**opts)
+            previous_appointment = get_object(self.appointment_model_cls, **opts)
         except ObjectDoesNotExist as e:
             if self.previous_visit_code:
                 raise VisitSequenceError(
@@ -89,8 +91,8 @@ class VisitSequence:
             if self.visit_code_sequence:
                 opts.update(visit_code_sequence=self.visit_code_sequence - 1)
                 try:
-                    previous_appointment = self.appointment_model_cls.objects.get(
-                        **opts
+                    previous_appointment = get_object(
+                        self.appointment_model_cls, **opts
                     )
                 except ObjectDoesNotExist:
                     raise VisitSequenceError(
@@ -118,6 +120,7 @@ class VisitSequence:
     def previous_visit(self):
         """Returns the previous visit model instance if it exists.
         """
-        if self.previous_appointment:
-            return self.model_cls.objects.get(appointment=self.previous_appointment)
+        previous_appointment = self.previous_appointment
+        if previous_appointment:
+            return get_object(self.model_cls, appointment=previous_appointment)
         return None
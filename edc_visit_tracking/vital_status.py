@@ -0,0 +1,135 @@
+from django.apps import apps as django_apps
+from django.db import transaction
+from edc_constants.constants import ALIVE
+from edc_utils import get_utcnow
+
+from .constants import FOLLOW_UP_REASONS
+from .date_buckets import get_report_date, get_site_lookup
+
+VITAL_STATUS_FIELDS = [
+    "subject_identifier",
+    "report_datetime",
+    "reason",
+    "survival_status",
+    "last_alive_date",
+]
+
+
+def get_vital_status_rows(visit_model_cls, using=None, **lookups):
+    """Returns a tuple of (queryset, site_lookup) where queryset
+    is a values_list of the visits' vital status fields and site
+    ordered by subject and report_datetime.
+    """
+    site_lookup = get_site_lookup(visit_model_cls)
+    return (
+        (
+            visit_model_cls._base_manager.using(using)
+            .filter(**lookups)
+            .order_by("subject_identifier", "report_datetime")
+            .values_list(*VITAL_STATUS_FIELDS, site_lookup or "pk")
+        ),
+        site_lookup,
+    )
+
+
+def get_vital_status_values(rows, site_lookup=None):
+    """Returns a dict of {subject_identifier: values} folded from
+    visit rows ordered by subject and report_datetime.
+
+    The survival status is that of the latest visit with one. The
+    last known alive date is the latest of `last_alive_date` and
+    the report date of visits with survival status ALIVE so that
+    edits to earlier visits are accounted for.
+
+    `survival_status` defaults to ALIVE, so ALIVE only counts for
+    visits attended by the subject, i.e. with a reason in
+    FOLLOW_UP_REASONS, and not for missed, deferred or lost
+    visits.
+    """
+    vital_statuses = {}
+    for (
+        subject_identifier,
+        report_datetime,
+        reason,
+        survival_status,
+        last_alive_date,
+        site_id,
+    ) in rows:
+        values = vital_statuses.setdefault(
+            subject_identifier,
+            dict(
+                site_id=None,
+                survival_status=None,
+                survival_status_datetime=None,
+                last_alive_date=None,
+            ),
+        )
+        values.update(site_id=site_id if site_lookup else None)
+        if survival_status == ALIVE and reason not in FOLLOW_UP_REASONS:
+            survival_status = None
+        if survival_status:
+            values.update(
+                survival_status=survival_status,
+                survival_status_datetime=report_datetime,
+            )
+        for alive_date in [
+            last_alive_date,
+            get_report_date(report_datetime) if survival_status == ALIVE else None,
+        ]:
+            if alive_date and (
+                not values.get("last_alive_date")
+                or alive_date > values.get("last_alive_date")
+            ):
+                values.update(last_alive_date=alive_date)
+    return vital_statuses
+
+
+def update_subject_vital_status(visit_model_cls, subject_identifier, using=None):
+    """Recomputes the subject's vital status from the subject's
+    visits or deletes it if the subject has none.
+    """
+    model_cls = django_apps.get_model("edc_visit_tracking.subjectvitalstatus")
+    rows, site_lookup = get_vital_status_rows(
+        visit_model_cls, using=using, subject_identifier=subject_identifier
+    )
+    values = get_vital_status_values(rows, site_lookup).get(subject_identifier)
+    manager = model_cls.objects.db_manager(using)
+    opts = dict(
+        label_lower=visit_model_cls._meta.label_lower,
+        subject_identifier=subject_identifier,
+    )
+    if values:
+        manager.update_or_create(defaults=dict(modified=get_utcnow(), **values), **opts)
+    else:
+        manager.filter(**opts).delete()
+
+
+def rebuild_vital_status(visit_model_cls=None, using=None):
+    """Rebuilds the vital status of all subjects from the
+    visits of `visit_model_cls`, defaults to the
+    SUBJECT_VISIT_MODEL. Rows of other visit models are kept.
+
+    Returns the number of subjects.
+    """
+    from .models import get_visit_tracking_model
+
+    model_cls = django_apps.get_model("edc_visit_tracking.subjectvitalstatus")
+    visit_model_cls = visit_model_cls or get_visit_tracking_model()
+    label_lower = visit_model_cls._meta.label_lower
+    rows, site_lookup = get_vital_status_rows(visit_model_cls, using=using)
+    modified = get_utcnow()
+    objs = [
+        model_cls(
+            label_lower=label_lower,
+            subject_identifier=subject_identifier,
+            modified=modified,
+            **values,
+        )
+        for subject_identifier, values in get_vital_status_values(
+            rows.iterator(), site_lookup
+        ).items()
+    ]
+    with transaction.atomic(using=using):
+        model_cls.objects.using(using).filter(label_lower=label_lower).delete()
+        model_cls.objects.using(using).bulk_create(objs)
+    return len(objs)
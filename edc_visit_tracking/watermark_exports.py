@@ -0,0 +1,145 @@
+import json
+
+from collections import OrderedDict, namedtuple
+from django.apps import apps as django_apps
+from django.core.serializers.json import DjangoJSONEncoder
+from edc_utils import get_utcnow
+
+from .constants import DELETED
+
+UPSERT = "upsert"
+
+ExportBatch = namedtuple("ExportBatch", "label_lower rows tombstones")
+
+
+class WatermarkExportError(Exception):
+    pass
+
+
+class WatermarkExporter:
+
+    """Exports the rows of a visit or CRF model changed since the
+    consumer's last run, and tombstones for deleted rows.
+
+    Changes are read from the change log after the sequence of
+    the consumer's `ExportWatermark`, see `ChangeLogManager.read`.
+    The read holds back at gaps in the sequence left by open
+    transactions, so a long transaction, e.g. a bulk import, is
+    not skipped. Created and updated rows are exported as they
+    are when the batch is read, deletes as tombstones. Requires
+    AppConfig.change_log; rows written before it was turned on
+    are not exported.
+
+    Iterate to get `ExportBatch`es. The watermark is saved when
+    the next batch is requested. If the consumer fails while
+    handling a batch, the next run starts again with that batch.
+    Delivery is at least once.
+    """
+
+    batch_size = 1000
+
+    def __init__(self, consumer, model_cls, batch_size=None, gap_timeout=None):
+        if not django_apps.get_app_config("edc_visit_tracking").change_log:
+            raise WatermarkExportError(
+                "Watermark exports read the change log. " "See AppConfig.change_log."
+            )
+        self.consumer = consumer
+        self.model_cls = model_cls
+        self.label_lower = model_cls._meta.label_lower
+        self.batch_size = batch_size or self.batch_size
+        self.gap_timeout = gap_timeout
+        self.fields = [f.attname for f in model_cls._meta.concrete_fields]
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(consumer={self.consumer}, "
+            f"model_cls={self.label_lower})"
+        )
+
+    def __iter__(self):
+        change_log_model_cls = django_apps.get_model("edc_visit_tracking.changelog")
+        watermark = self.get_watermark()
+        while True:
+            entries, cursor = change_log_model_cls.objects.read(
+                cursor=watermark.sequence,
+                limit=self.batch_size,
+                label_lowers=[self.label_lower],
+                gap_timeout=self.gap_timeout,
+            )
+            if cursor == watermark.sequence:
+                break
+            rows = self.get_rows(entries)
+            tombstones = self.get_tombstones(entries)
+            if rows or tombstones:
+                yield ExportBatch(self.label_lower, rows, tombstones)
+            self.save_watermark(watermark, cursor)
+
+    def get_watermark(self):
+        model_cls = django_apps.get_model("edc_visit_tracking.exportwatermark")
+        watermark, _ = model_cls.objects.get_or_create(
+            consumer=self.consumer, label_lower=self.label_lower
+        )
+        return watermark
+
+    def get_rows(self, entries):
+        """Returns a list of dicts of the created or updated rows
+        of the entries in the order last changed.
+
+        Rows deleted since are left to their tombstones.
+        """
+        object_pks = OrderedDict()
+        for entry in entries:
+            if entry.operation != DELETED:
+                object_pks.pop(entry.object_pk, None)
+                object_pks.update({entry.object_pk: None})
+        if not object_pks:
+            return []
+        pk_attname = self.model_cls._meta.pk.attname
+        rows = {
+            str(row.get(pk_attname)): row
+            for row in self.model_cls._base_manager.filter(
+                pk__in=list(object_pks)
+            ).values(*self.fields)
+        }
+        return [rows[pk] for pk in object_pks if pk in rows]
+
+    def get_tombstones(self, entries):
+        """Returns a list of dicts of the DELETED entries.
+        """
+        return [
+            dict(
+                sequence=entry.sequence,
+                object_pk=entry.object_pk,
+                natural_key=entry.natural_key,
+                subject_identifier=entry.subject_identifier,
+                timestamp=entry.timestamp,
+            )
+            for entry in entries
+            if entry.operation == DELETED
+        ]
+
+    def save_watermark(self, watermark, sequence):
+        watermark.sequence = sequence
+        watermark.updated = get_utcnow()
+        watermark.save()
+
+
+def iter_ndjson(batch):
+    """Yields NDJSON lines for a batch, tombstones first so that
+    a delete followed by a re-create applies in order.
+    """
+    for tombstone in batch.tombstones:
+        yield json.dumps(
+            dict(
+                model=batch.label_lower,
+                op=DELETED,
+                pk=tombstone.get("object_pk"),
+                natural_key=json.loads(tombstone.get("natural_key")),
+                timestamp=tombstone.get("timestamp"),
+            ),
+            cls=DjangoJSONEncoder,
+        ) + "\n"
+    for row in batch.rows:
+        yield json.dumps(
+            dict(model=batch.label_lower, op=UPSERT, data=row), cls=DjangoJSONEncoder
+        ) + "\n"
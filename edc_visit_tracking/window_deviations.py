@@ -0,0 +1,170 @@
+from collections import OrderedDict
+from django.db.models.functions import TruncDate
+
+from .date_buckets import get_site_lookup
+from .working_days import get_working_day_calendar
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+GROUP_FIELDS = ["visit_code", "site_id"]
+
+
+class WindowDeviationReportError(Exception):
+    pass
+
+
+class WindowDeviationReport:
+
+    """A report of the deviation, in days, of each visit's
+    `report_datetime` from its appointment's `appt_datetime`.
+
+    The local dates of both are fetched for all visits in
+    `queryset` in one projected query and the deviations are
+    computed with numpy. If `working_days` is True, deviations
+    are counted in working days of the facility, see
+    `working_days.py`.
+
+    For example:
+
+        report = WindowDeviationReport(working_days=True)
+        report.get_percentiles(by=["visit_code", "site_id"])
+        report.get_histograms(by=["visit_code"])
+
+    Requires numpy.
+    """
+
+    percentiles = [5, 25, 50, 75, 95]
+
+    def __init__(
+        self, queryset=None, working_days=None, facility_name=None, percentiles=None
+    ):
+        if np is None:
+            raise WindowDeviationReportError(
+                "numpy is required for the window deviation report."
+            )
+        if queryset is None:
+            from .models import get_visit_tracking_model
+
+            queryset = get_visit_tracking_model()._default_manager.all()
+        self.queryset = queryset
+        self.working_days = working_days
+        self.facility_name = facility_name
+        self.percentiles = percentiles or self.percentiles
+        self.visit_codes, self.site_ids, self.deviations = self.get_deviations()
+
+    def get_rows(self):
+        """Returns a list of (visit_code, appt_date, report_date,
+        site_id) for the queryset.
+        """
+        site_lookup = get_site_lookup(self.queryset.model)
+        return list(
+            self.queryset.annotate(
+                deviation_appt_date=TruncDate("appointment__appt_datetime"),
+                deviation_report_date=TruncDate("report_datetime"),
+            )
+            .order_by()
+            .values_list(
+                "visit_code",
+                "deviation_appt_date",
+                "deviation_report_date",
+                *([site_lookup] if site_lookup else []),
+            )
+            .iterator()
+        )
+
+    def get_deviations(self):
+        """Returns a tuple of arrays (visit_codes, site_ids,
+        deviations).
+        """
+        rows = self.get_rows()
+        if not rows:
+            return (
+                np.array([], dtype=object),
+                np.array([], dtype=object),
+                np.array([], dtype=np.int64),
+            )
+        columns = list(zip(*rows))
+        appt_dates = np.array(columns[1], dtype="datetime64[D]")
+        report_dates = np.array(columns[2], dtype="datetime64[D]")
+        if self.working_days:
+            deviations = get_working_day_calendar(
+                self.facility_name
+            ).working_days_between(appt_dates, report_dates)
+        else:
+            deviations = (report_dates - appt_dates).astype(np.int64)
+        return (
+            np.array(columns[0], dtype=object),
+            np.array(
+                columns[3] if len(columns) > 3 else [None] * len(rows), dtype=object
+            ),
+            np.asarray(deviations, dtype=np.int64),
+        )
+
+    def get_groups(self, by=None):
+        """Returns an ordered dict of {key: deviations array} where
+        key is a tuple of the values of the `by` fields.
+        """
+        by = list(by or [])
+        if not len(self.deviations):
+            return OrderedDict()
+        columns = {"visit_code": self.visit_codes, "site_id": self.site_ids}
+        if [f for f in by if f not in columns]:
+            raise WindowDeviationReportError(
+                f"Invalid group by. Expected any of {GROUP_FIELDS}. Got {by}."
+            )
+        group_index = np.zeros(len(self.deviations), dtype=np.int64)
+        for field in by:
+            values, inverse = np.unique(columns[field].astype(str), return_inverse=True)
+            group_index = group_index * len(values) + inverse
+        _, group_index, counts = np.unique(
+            group_index, return_inverse=True, return_counts=True
+        )
+        order = np.argsort(group_index, kind="stable")
+        groups = OrderedDict()
+        first_rows = order[np.concatenate([[0], np.cumsum(counts)[:-1]])]
+        for group_deviations, first_row in zip(
+            np.split(self.deviations[order], np.cumsum(counts)[:-1]), first_rows
+        ):
+            key = tuple(columns[field][first_row] for field in by)
+            groups[key] = group_deviations
+        return groups
+
+    def get_percentiles(self, by=None):
+        """Returns a list of dicts, one per group, of the group
+        fields, n, mean, min, max and the percentiles as "p50",
+        etc.
+        """
+        by = GROUP_FIELDS[:1] if by is None else by
+        table = []
+        for key, deviations in self.get_groups(by).items():
+            row = OrderedDict(zip(by, key))
+            row.update(
+                n=len(deviations),
+                mean=float(deviations.mean()),
+                min=int(deviations.min()),
+                max=int(deviations.max()),
+            )
+            for percentile, value in zip(
+                self.percentiles, np.percentile(deviations, self.percentiles)
+            ):
+                row.update({f"p{percentile}": float(value)})
+            table.append(row)
+        return table
+
+    def get_histograms(self, by=None, bins=None):
+        """Returns an ordered dict of {key: (counts, bin_edges)}
+        per group.
+
+        `bins` defaults to one bin per day over the range of all
+        deviations so that histograms of groups line up.
+        """
+        by = GROUP_FIELDS[:1] if by is None else by
+        if bins is None and len(self.deviations):
+            bins = np.arange(self.deviations.min(), self.deviations.max() + 2)
+        return OrderedDict(
+            (key, np.histogram(deviations, bins=bins))
+            for key, deviations in self.get_groups(by).items()
+        )
@@ -0,0 +1,220 @@
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from dateutil.relativedelta import relativedelta
+from django.apps import apps as django_apps
+from functools import lru_cache
+
+from .date_buckets import get_report_date
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+class WorkingDayCalendarError(Exception):
+    pass
+
+
+def to_date(value):
+    """Returns the local date of a datetime or the date.
+    """
+    if isinstance(value, datetime):
+        return get_report_date(value)
+    return value
+
+
+class WorkingDayCalendar:
+
+    """A calendar of working days, clinic weekdays that are not
+    holidays, between `start_date` and `end_date`.
+
+    Days are stored as offsets from `start_date` with a running
+    count of working days so that "is a working day" and
+    "working days between" are array lookups and "nth working
+    day after" is a binary search.
+
+    Methods accept a date or datetime, or a sequence of them. For
+    a sequence the result is a numpy array if numpy is installed,
+    otherwise a list. With numpy, a datetime64 array is converted
+    without a Python loop.
+
+    Use `get_working_day_calendar` to get the calendar of a
+    facility.
+    """
+
+    def __init__(self, weekdays=None, holidays=None, start_date=None, end_date=None):
+        self.weekdays = set(range(0, 5) if weekdays is None else weekdays)
+        self.start_date = start_date
+        self.end_date = end_date
+        self.days = (end_date - start_date).days + 1
+        holiday_offsets = set(
+            (d - start_date).days for d in holidays or [] if start_date <= d <= end_date
+        )
+        first_weekday = start_date.weekday()
+        is_working_day = [
+            (first_weekday + offset) % 7 in self.weekdays
+            and offset not in holiday_offsets
+            for offset in range(0, self.days)
+        ]
+        if np is not None:
+            self.is_working_day_array = np.array(is_working_day, dtype=bool)
+            self.working_day_counts = np.cumsum(
+                self.is_working_day_array, dtype=np.int32
+            )
+        else:
+            self.is_working_day_array = bytearray(is_working_day)
+            self.working_day_counts = array("l")
+            count = 0
+            for value in is_working_day:
+                count += value
+                self.working_day_counts.append(count)
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(weekdays={sorted(self.weekdays)}, "
+            f"start_date={self.start_date}, end_date={self.end_date})"
+        )
+
+    def get_offset(self, value):
+        offset = (to_date(value) - self.start_date).days
+        if not 0 <= offset < self.days:
+            raise WorkingDayCalendarError(
+                f"Date is out of range for calendar. Got {value}. See {repr(self)}."
+            )
+        return offset
+
+    def get_offsets(self, values):
+        if np is not None and getattr(values, "dtype", None) is not None:
+            offsets = (
+                np.asarray(values, dtype="datetime64[D]")
+                - np.datetime64(self.start_date, "D")
+            ).astype(np.int32)
+            if ((offsets < 0) | (offsets >= self.days)).any():
+                raise WorkingDayCalendarError(
+                    f"Date is out of range for calendar. See {repr(self)}."
+                )
+            return offsets
+        offsets = [self.get_offset(value) for value in values]
+        return np.array(offsets, dtype=np.int32) if np is not None else offsets
+
+    def is_working_day(self, value):
+        """Returns True if the date is a working day.
+        """
+        if isinstance(value, (date, datetime)):
+            return bool(self.is_working_day_array[self.get_offset(value)])
+        offsets = self.get_offsets(value)
+        if np is not None:
+            return self.is_working_day_array[offsets]
+        return [bool(self.is_working_day_array[offset]) for offset in offsets]
+
+    def working_days_between(self, start, end):
+        """Returns the number of working days after `start` up to
+        and including `end`, negative if `end` is before `start`.
+        """
+        if isinstance(start, (date, datetime)):
+            return int(
+                self.working_day_counts[self.get_offset(end)]
+                - self.working_day_counts[self.get_offset(start)]
+            )
+        starts, ends = self.get_offsets(start), self.get_offsets(end)
+        if np is not None:
+            return self.working_day_counts[ends] - self.working_day_counts[starts]
+        return [
+            self.working_day_counts[e] - self.working_day_counts[s]
+            for s, e in zip(starts, ends)
+        ]
+
+    def add_working_days(self, value, n):
+        """Returns the date of the nth working day after `value`,
+        or `value` if n is 0.
+
+        For a sequence the result is a numpy datetime64[D] array if
+        numpy is installed, otherwise a list of dates.
+        """
+        if n < 0:
+            raise WorkingDayCalendarError(f"Expected n >= 0. Got {n}.")
+        if isinstance(value, (date, datetime)):
+            result = self.add_working_days([value], n)[0]
+            return result.item() if np is not None else result
+        offsets = self.get_offsets(value)
+        if np is not None:
+            if n:
+                offsets = np.searchsorted(
+                    self.working_day_counts, self.working_day_counts[offsets] + n
+                )
+            if (offsets >= self.days).any():
+                raise WorkingDayCalendarError(
+                    f"Result is out of range for calendar. See {repr(self)}."
+                )
+            return np.datetime64(self.start_date, "D") + offsets
+        dates = []
+        for offset in offsets:
+            if n:
+                offset = bisect_left(
+                    self.working_day_counts, self.working_day_counts[offset] + n
+                )
+            if offset >= self.days:
+                raise WorkingDayCalendarError(
+                    f"Result is out of range for calendar. See {repr(self)}."
+                )
+            dates.append(self.start_date + timedelta(days=offset))
+        return dates
+
+
+def get_working_day_calendar(facility_name=None):
+    """Returns the cached calendar of the edc_facility facility,
+    defaults to "default".
+    """
+    return load_working_day_calendar(facility_name or "default")
+
+
+def clear_working_day_calendars():
+    """Clears the cached calendars.
+
+    Called by signals when a holiday is saved or deleted. Call
+    it after writes that send no signals, e.g. `bulk_create` by
+    edc_facility's `import_holidays`. Other processes keep their
+    calendars until restarted or cleared.
+    """
+    load_working_day_calendar.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def load_working_day_calendar(facility_name):
+    """Returns a calendar for the clinic weekdays of the
+    facility and its country's holidays.
+
+    The calendar covers the protocol's study period plus
+    AppConfig.working_days_margin years on each side.
+    """
+    facility = django_apps.get_app_config("edc_facility").get_facility(facility_name)
+    holiday_model_cls = django_apps.get_model("edc_facility.holiday")
+    holidays = holiday_model_cls.objects.filter(
+        country=facility.holidays.country
+    ).values_list("local_date", flat=True)
+    protocol = django_apps.get_app_config("edc_protocol")
+    margin = relativedelta(
+        years=django_apps.get_app_config("edc_visit_tracking").working_days_margin
+    )
+    return WorkingDayCalendar(
+        weekdays=facility.weekdays,
+        holidays=list(holidays),
+        start_date=to_date(protocol.study_open_datetime - margin),
+        end_date=to_date(protocol.study_close_datetime + margin),
+    )
+
+
+def add_working_days(values, n, facility_name=None):
+    """Returns the nth working day after each date in `values`
+    for the facility, e.g. the window closing dates of a cohort.
+    """
+    return get_working_day_calendar(facility_name).add_working_days(values, n)
+
+
+def working_days_between(starts, ends, facility_name=None):
+    """Returns the working days between each pair of dates for
+    the facility.
+    """
+    return get_working_day_calendar(facility_name).working_days_between(starts, ends)
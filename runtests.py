@@ -38,7 +38,7 @@ DEFAULT_SETTINGS = DefaultTestSettings(
         'edc_visit_schedule.apps.AppConfig',
         'edc_visit_tracking.apps.EdcFacilityAppConfig',
         'edc_visit_tracking.apps.EdcMetadataAppConfig',
-        'edc_visit_tracking.apps.AppConfig',
+        'edc_visit_tracking.apps.EdcVisitTrackingAppConfig',
     ],
     add_dashboard_middleware=True,
 ).settings
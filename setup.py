@@ -45,6 +45,11 @@ setup(
         'edc-identifier',
         'edc-visit-schedule',
     ],
+    extras_require={
+        # vectorized working days, window deviations, snapshots
+        # and retention curves
+        'numpy': ['numpy'],
+    },
     classifiers=[
         'Environment :: Web Environment',
         'Framework :: Django',